@@ -0,0 +1,190 @@
+import asyncio
+import time
+from server import Server
+from protocol import HEADER, FrameBuffer
+from channels import StreamChannel
+from logs import get_logger
+
+log = get_logger("server")
+
+# The most bytes taken from a client's stream at once. Every frame that arrived with them is
+# handled before the stream is read again.
+READ_SIZE = 65536
+# Requests are a few bytes, so each connection's buffer starts small; it grows for larger frames.
+FRAME_BUFFER_SIZE = 256
+
+class AsyncServer(Server):
+    """
+    A server that drives every client connection from a single asyncio event loop.
+
+    It shares game management with the threaded Server (add_player, handle_message, cleanup_game)
+    so the "get"/"reset"/move messages behave exactly the same, but instead of one thread
+    per connection each client is a coroutine doing non-blocking reads and writes.
+
+    ...
+
+    Methods
+    -------
+    handle_client(reader, writer):
+        Serves a single client connection until it disconnects.
+    serve():
+        Accepts connections on the server socket and serves them forever.
+    reap_waiting_async(interval):
+        Periodically disconnects players who waited too long for an opponent.
+    run_timers_async():
+        Fires the idle, move and heartbeat timers that are due, forever.
+    run_server():
+        Runs the event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Streams may only be written from the event loop, so spectators are pushed to from there
+        # too, and the transports queue what does not fit; see StreamChannel.
+        super().__init__(*args, fanout=False, **kwargs)
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves a single client connection until it disconnects.
+
+        This is the coroutine counterpart of Server.threaded_client. It assigns the player to a game,
+        sends the player number, then handles each framed message with respond.
+
+        The stream is read a chunk at a time into a FrameBuffer, so a frame costs no await of its
+        own, and replies are left to the transport, which sends them as soon as it can. The writer
+        is only drained once the transport holds more than its high-water mark, so a client that
+        stops reading is still paused before its replies pile up.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            The stream to read client messages from.
+        writer : asyncio.StreamWriter
+            The stream to write responses to.
+
+        Returns
+        -------
+        None
+        """
+        self.socket_options.apply(writer.get_extra_info("socket"))
+        log.info("connected", peer=writer.get_extra_info("peername"))
+        game_id, p = self.add_player()
+        metrics = self.metrics
+        channel = StreamChannel(writer, metrics, self.push_queue)
+        idle = self.open_channel(channel, game_id, p)
+        channel.send(str.encode(str(p)))
+        frames = FrameBuffer(FRAME_BUFFER_SIZE)
+        transport = writer.transport
+        _, high_water = transport.get_write_buffer_limits()
+
+        while True:
+            try:
+                if metrics is not None:
+                    start = time.perf_counter()
+                frame = frames.next_frame()
+                while frame is None:
+                    data = await reader.read(READ_SIZE)
+                    if not data:
+                        break
+                    frames.feed(data)
+                    frame = frames.next_frame()
+
+                if channel.rooms is None and game_id not in self.games:
+                    break
+
+                if frame is None:
+                    break
+
+                if idle is not None:
+                    self.timers.touch(idle, self.idle_timeout)
+                if metrics is not None:
+                    received = time.perf_counter()
+                    metrics.observe("recv", received - start)
+                    metrics.increment("messages_in")
+                    metrics.increment("bytes_in", HEADER.size + len(frame))
+                payload = self.handle_message(channel, game_id, p, str(frame, "utf-8"))
+                if metrics is not None:
+                    handled = time.perf_counter()
+                    metrics.observe("handle", handled - received)
+                if payload is not None:
+                    channel.send(payload)
+                if transport.get_write_buffer_size() > high_water:
+                    await writer.drain()
+                if metrics is not None:
+                    metrics.observe("send", time.perf_counter() - handled)
+
+            except Exception as e:
+                log.warning("client_error", game=game_id, player=p, error=e)
+                break
+
+        if idle is not None:
+            idle.cancel()
+        self.cleanup_game(channel, game_id, p)
+
+    async def serve(self):
+        """
+        Accepts connections on the server socket and serves them forever.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        # start_server listens on the socket again, with its own backlog unless given ours.
+        server = await asyncio.start_server(self.handle_client, sock=self.s, backlog=self.socket_options.backlog)
+        if self.matchmaker.wait_timeout is not None:
+            asyncio.create_task(self.reap_waiting_async())
+        if self.uses_timers():
+            asyncio.create_task(self.run_timers_async())
+        async with server:
+            await server.serve_forever()
+
+    async def reap_waiting_async(self, interval=1.0):
+        """
+        Calls expire_waiting every interval seconds on the event loop.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between checks.
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.expire_waiting()
+
+    async def run_timers_async(self):
+        """
+        Advances the timer wheel every tick on the event loop, so timer callbacks never race the
+        client coroutines.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            await asyncio.sleep(self.timers.tick)
+            self.timers.advance()
+
+    def run_server(self):
+        """
+        Runs the server on a single asyncio event loop.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        asyncio.run(self.serve())
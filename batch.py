@@ -0,0 +1,112 @@
+from collections import namedtuple
+from rules import CLASSIC
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it rounds are resolved with plain Python lists.
+    np = None
+
+BatchResult = namedtuple("BatchResult", ["winners", "ties", "wins", "tie_counts"])
+BatchResult.__doc__ = """The outcome of a batch of rounds.
+
+Attributes
+----------
+winners : sequence
+    For each round, 0 or 1 for the winning player, or -1 for a tie, as returned by Game.winner.
+ties : sequence
+    For each round, whether it was a tie.
+wins : sequence
+    Wins per player. Indexed by seat (0 or 1) unless player IDs were given, then by player ID.
+tie_counts : sequence
+    Ties per player, indexed the same way as wins.
+"""
+
+
+def resolve_rounds(moves0, moves1, players0=None, players1=None, rules=CLASSIC, use_numpy=None):
+    """
+    Resolves many rounds at once.
+
+    Each round's outcome is a single lookup into the rule set's outcome table, the same one
+    Game.winner uses, and the win and tie tallies are counted from the resulting winners. With NumPy the lookups and
+    tallies run as array operations over all rounds at once.
+
+    Parameters
+    ----------
+    moves0 : sequence of int
+        Player 0's move code in each round, as numbered by the rule set.
+    moves1 : sequence of int
+        Player 1's move code in each round.
+    players0 : sequence of int, optional
+        The ID of player 0 in each round. If given together with players1, tallies are kept per
+        player ID instead of per seat.
+    players1 : sequence of int, optional
+        The ID of player 1 in each round.
+    rules : RuleSet
+        The variant the rounds were played in, default is the classic game.
+    use_numpy : bool, optional
+        Force the NumPy or the pure Python implementation. Default is NumPy when installed.
+
+    Returns
+    -------
+    BatchResult
+        The winners, ties and tallies, as NumPy arrays or as lists depending on the implementation.
+
+    Raises
+    ------
+    ValueError
+        If the move arrays differ in length or contain a code that is not a move.
+    """
+    if len(moves0) != len(moves1):
+        raise ValueError("Both players need a move for every round")
+    if (players0 is None) != (players1 is None):
+        raise ValueError("Give player IDs for both seats or for neither")
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        if np is None:
+            raise ImportError("NumPy is not installed")
+        return _resolve_numpy(moves0, moves1, players0, players1, rules)
+    return _resolve_python(moves0, moves1, players0, players1, rules)
+
+
+def _resolve_numpy(moves0, moves1, players0, players1, rules):
+    moves0 = np.asarray(moves0, dtype=np.intp)
+    moves1 = np.asarray(moves1, dtype=np.intp)
+    if len(moves0) and (min(moves0.min(), moves1.min()) < 1 or max(moves0.max(), moves1.max()) > len(rules)):
+        raise ValueError("Move codes must be between 1 and %d" % len(rules))
+    winners = np.asarray(rules.table, dtype=np.int8)[moves0 * rules.stride + moves1]
+    ties = winners == -1
+    if players0 is None:
+        wins = np.bincount(winners[~ties], minlength=2)
+        tie_counts = np.array([ties.sum(), ties.sum()])
+    else:
+        players0 = np.asarray(players0, dtype=np.intp)
+        players1 = np.asarray(players1, dtype=np.intp)
+        size = int(max(players0.max(), players1.max())) + 1 if len(players0) else 0
+        wins = (np.bincount(players0[winners == 0], minlength=size)
+                + np.bincount(players1[winners == 1], minlength=size))
+        tie_counts = (np.bincount(players0[ties], minlength=size)
+                      + np.bincount(players1[ties], minlength=size))
+    return BatchResult(winners, ties, wins, tie_counts)
+
+
+def _resolve_python(moves0, moves1, players0, players1, rules):
+    codes = set(range(1, len(rules) + 1))
+    if not codes.issuperset(moves0) or not codes.issuperset(moves1):
+        raise ValueError("Move codes must be between 1 and %d" % len(rules))
+    table, stride = rules.table, rules.stride
+    winners = [table[m0 * stride + m1] for m0, m1 in zip(moves0, moves1)]
+    ties = [winner == -1 for winner in winners]
+    if players0 is None:
+        tied = winners.count(-1)
+        return BatchResult(winners, ties, [winners.count(0), winners.count(1)], [tied, tied])
+    size = max(max(players0, default=-1), max(players1, default=-1)) + 1
+    wins = [0] * size
+    tie_counts = [0] * size
+    for winner, first, second in zip(winners, players0, players1):
+        if winner == -1:
+            tie_counts[first] += 1
+            tie_counts[second] += 1
+        else:
+            wins[second if winner else first] += 1
+    return BatchResult(winners, ties, wins, tie_counts)
@@ -0,0 +1,61 @@
+"""
+Compares resolving many finished rounds with Game.winner one game at a time against the batch resolver.
+
+Usage:
+    python benchmarks/bench_batch.py [--rounds 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+from game import Game
+from move import Move
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    moves0 = [rng.randint(1, 3) for _ in range(args.rounds)]
+    moves1 = [rng.randint(1, 3) for _ in range(args.rounds)]
+    games = []
+    for m0, m1 in zip(moves0, moves1):
+        game = Game(len(games))
+        game.play(0, Move.from_code(m0).label)
+        game.play(1, Move.from_code(m1).label)
+        games.append(game)
+
+    start = time.perf_counter()
+    wins = [0, 0]
+    ties = 0
+    for game in games:
+        winner = game.winner()
+        if winner == -1:
+            ties += 1
+        else:
+            wins[winner] += 1
+    baseline = time.perf_counter() - start
+    print(f"Game.winner loop: {args.rounds / baseline:,.0f} rounds/s")
+
+    variants = [("pure Python", False)]
+    if batch.np is not None:
+        variants.append(("NumPy", True))
+    else:
+        print("NumPy is not installed, skipping the vectorized resolver")
+    for name, use_numpy in variants:
+        start = time.perf_counter()
+        result = batch.resolve_rounds(moves0, moves1, use_numpy=use_numpy)
+        elapsed = time.perf_counter() - start
+        assert list(result.wins) == wins and int(result.tie_counts[0]) == ties
+        print(f"batch ({name}): {args.rounds / elapsed:,.0f} rounds/s, {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
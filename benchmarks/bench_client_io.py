@@ -0,0 +1,141 @@
+"""
+Measures how long the client's frames spend on the network, with the network on the frame's thread or on its own.
+
+A client runs frames at 60 a second against a server reached through a proxy that delays
+every chunk by half the round-trip time, while an opponent bot moves. "blocking" asks for the
+game with a "get" round trip every frame, as the client once did; "background" reads the newest
+game a BackgroundNetwork received and queues its moves and resets to it. Both move as soon as
+they see a new round and reset as soon as it is over. Reports the network time per frame and
+the rounds played, for each round-trip time.
+
+Usage:
+    python benchmarks/bench_client_io.py [--rtt 0 20 50] [--frames 300]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadgen import spawn_server
+from network import BackgroundNetwork, Network
+
+
+async def _pipe(reader, writer, delay):
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        await asyncio.sleep(delay)
+        writer.write(data)
+    writer.close()
+
+
+def _proxy(port, delay, ready):
+    async def forward(reader, writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.gather(_pipe(reader, upstream_writer, delay), _pipe(upstream_reader, writer, delay))
+
+    async def serve():
+        server = await asyncio.start_server(forward, "127.0.0.1", 0)
+        ready.append(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def start_proxy(port, rtt):
+    ready = []
+    threading.Thread(target=_proxy, args=(port, rtt / 2, ready), daemon=True).start()
+    while not ready:
+        time.sleep(0.01)
+    return ready[0]
+
+
+def _opponent(port, stop):
+    network = Network("localhost", port)
+    while not stop.is_set():
+        game = network.send("get")
+        if game is None:
+            break
+        if game.connected() and not game.p2Went:
+            network.send("Rock")
+        time.sleep(0.005)
+
+
+def _blocking(network):
+    def frame():
+        game = network.send("get")
+        if game.bothWent():
+            network.send("reset")
+            return 1
+        if game.connected() and not game.p1Went:
+            network.send("Paper")
+        return 0
+    return frame
+
+
+def _background(network):
+    background = BackgroundNetwork(network)
+    background.start()
+
+    def frame():
+        game = background.game
+        if background.next_round() is not None:
+            background.post("reset")
+            return 1
+        if game.connected() and not game.p1Went and not game.bothWent():
+            background.post("Paper")
+        return 0
+    return frame, background
+
+
+def run(port, rtt, mode, frames):
+    proxy = start_proxy(port, rtt)
+    network = Network("localhost", proxy)
+    stop = threading.Event()
+    threading.Thread(target=_opponent, args=(port, stop), daemon=True).start()
+    background = None
+    if mode == "blocking":
+        frame = _blocking(network)
+    else:
+        frame, background = _background(network)
+    times, rounds = [], 0
+    for _ in range(frames):
+        start = time.perf_counter()
+        rounds += frame()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        time.sleep(max(0.0, 1 / 60 - elapsed))
+    stop.set()
+    if background is not None:
+        background.close()
+    return times, rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rtt", type=float, nargs="+", default=[0, 20, 50], help="Round-trip times in milliseconds")
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    for rtt in args.rtt:
+        for mode in ("blocking", "background"):
+            # A fresh server for every run, so both clients start from a new game.
+            process, port = spawn_server("threaded")
+            try:
+                times, rounds = run(port, rtt / 1000, mode, args.frames)
+            finally:
+                process.terminate()
+                process.join()
+            times.sort()
+            print(f"rtt {rtt:5.1f}ms  {mode:10}  frame network p50 {times[len(times) // 2] * 1000:7.3f}ms  "
+                  f"p99 {times[int(len(times) * 0.99)] * 1000:7.3f}ms  max {times[-1] * 1000:7.3f}ms  "
+                  f"rounds {rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Measures the players' latency while many spectators watch their game, some of them too slow to keep up.
+
+Two players take turns moving and resetting through blocking Network clients, while spectators
+on multi-room connections watch the game. Fast spectators read every update; slow ones never
+read and have a tiny receive buffer, so their sockets fill up and the server has to queue, coalesce and drop their updates.
+Reports the players' round-trip latency percentiles, the updates a fast spectator received,
+and the server's CPU time.
+
+Usage:
+    python benchmarks/bench_fanout.py [--spectators 0 1000] [--slow 0.1] [--rounds 1000] [--mode threaded]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadgen import spawn_server
+from network import Network
+from protocol import JOINED, ROOM, decode_joined, encode_frame, read_frame
+
+
+def _cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def _spectator(port, game_id, slow, received, index):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if slow:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    await read_frame(reader)
+    writer.write(encode_frame(b"rooms"))
+    frame = await read_frame(reader)
+    while frame is not None and frame[0] != JOINED:
+        frame = await read_frame(reader)
+    own, _ = decode_joined(frame)
+    writer.write(encode_frame(b"leave:%d" % own) + encode_frame(b"watch:%d" % game_id))
+    while not slow:
+        frame = await read_frame(reader)
+        if frame is None:
+            break
+        if frame[0] == ROOM and int.from_bytes(frame[1:5], "big") == game_id:
+            received[index] += 1
+    await asyncio.Event().wait()
+
+
+async def _watch(port, game_id, spectators, slow_count, ready, stop):
+    received = [0] * spectators
+    watchers = [asyncio.ensure_future(_spectator(port, game_id, i < slow_count, received, i))
+                for i in range(spectators)]
+    await asyncio.sleep(0.5 + spectators / 2000)
+    ready.set()
+    while not stop.is_set():
+        await asyncio.sleep(0.05)
+    for watcher in watchers:
+        watcher.cancel()
+    return received[slow_count:]
+
+
+def _watch_process(port, game_id, spectators, slow_count, ready, stop, results):
+    fast = asyncio.run(_watch(port, game_id, spectators, slow_count, ready, stop))
+    results.put(max(fast, default=0))
+
+
+def run(port, spectators, slow, rounds):
+    n0 = Network("localhost", port)
+    n1 = Network("localhost", port)
+    game_id = n0.send("get").id
+    # The spectators run in a process of their own, so reading their updates does not slow the players down.
+    ready, stop, results = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Queue()
+    watcher = multiprocessing.Process(target=_watch_process,
+                                      args=(port, game_id, spectators, int(spectators * slow), ready, stop, results))
+    watcher.start()
+    ready.wait(60)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for network, message in ((n0, "Rock"), (n1, "Paper"), (n0, "reset")):
+            sent = time.perf_counter()
+            network.send(message)
+            latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+    time.sleep(0.2)
+    stop.set()
+    updates = results.get(timeout=30)
+    watcher.join()
+    n0.client.close()
+    n1.client.close()
+    return latencies, elapsed, updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spectators", type=int, nargs="+", default=[0, 1000])
+    parser.add_argument("--slow", type=float, default=0.1, help="Share of the spectators that never read")
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--mode", choices=["threaded", "asyncio", "pool"], default="threaded")
+    args = parser.parse_args()
+
+    for spectators in args.spectators:
+        process, port = spawn_server(args.mode)
+        try:
+            cpu = _cpu_seconds(process.pid)
+            latencies, elapsed, updates = run(port, spectators, args.slow, args.rounds)
+            cpu = _cpu_seconds(process.pid) - cpu
+        finally:
+            process.terminate()
+            process.join()
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(f"{spectators:6} spectators  player p50 {statistics.median(latencies) * 1000:6.2f}ms  "
+              f"p99 {p99 * 1000:6.2f}ms  {len(latencies) / elapsed:7.0f} req/s  "
+              f"fast spectator got {updates} updates  server cpu {cpu:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
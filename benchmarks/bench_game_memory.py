@@ -0,0 +1,48 @@
+"""
+Measures the memory taken by live games.
+
+Creates the given number of games, each mid-round with both players' moves recorded, and
+reports the bytes per game as seen by tracemalloc, along with the size of a pickled game.
+
+Usage:
+    python benchmarks/bench_game_memory.py [--games 100000]
+"""
+import argparse
+import gc
+import os
+import pickle
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import Game
+
+
+def make_game(game_id):
+    game = Game(game_id)
+    game.set_ready()
+    game.play(0, "Rock")
+    game.play(1, "Paper")
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=100000)
+    args = parser.parse_args()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [make_game(i) for i in range(args.games)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # The list holding the games is counted too, but it is only one pointer per game.
+    print(f"{args.games} games: {(after - before) / args.games:.0f} bytes per game "
+          f"({(after - before) / 2 ** 20:.1f} MiB), pickled game {len(pickle.dumps(games[-1]))} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures leaderboard updates and queries with many players.
+
+Compares the incremental index against rebuilding a heap of every player's score on each top-N
+query, which is what the leaderboard used to do.
+
+Usage:
+    python benchmarks/bench_leaderboard.py [--players 1000000] [--updates 200000] [--queries 1000]
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from improvements.leaderboard import Leaderboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--updates", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [f"player{i}" for i in range(args.players)]
+    leaderboard = Leaderboard()
+
+    start = time.perf_counter()
+    for name in names:
+        leaderboard.add_score(name, rng.randrange(1000))
+    elapsed = time.perf_counter() - start
+    print(f"{args.players} players added in {elapsed:.2f}s")
+
+    start = time.perf_counter()
+    for _ in range(args.updates):
+        leaderboard.add_score(names[rng.randrange(args.players)], rng.randrange(1, 4))
+    elapsed = time.perf_counter() - start
+    print(f"add_score: {elapsed / args.updates * 1e6:.2f}us per update")
+
+    start = time.perf_counter()
+    for _ in range(args.queries):
+        leaderboard.get_top_scores(args.top)
+    elapsed = time.perf_counter() - start
+    print(f"get_top_scores({args.top}): {elapsed / args.queries * 1e6:.2f}us per query")
+
+    start = time.perf_counter()
+    for _ in range(args.queries):
+        leaderboard.get_rank(names[rng.randrange(args.players)])
+    elapsed = time.perf_counter() - start
+    print(f"get_rank: {elapsed / args.queries * 1e6:.2f}us per query")
+
+    rebuilds = max(1, args.queries // 100)
+    start = time.perf_counter()
+    for _ in range(rebuilds):
+        heapq.nlargest(args.top, ((score, name) for name, score in leaderboard.scores.items()))
+    elapsed = time.perf_counter() - start
+    print(f"heap rebuilt per query: {elapsed / rebuilds * 1e6:,.0f}us per query")
+
+
+if __name__ == "__main__":
+    main()
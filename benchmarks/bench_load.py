@@ -0,0 +1,42 @@
+"""
+Plays full games with headless bots against each serving mode and reports per-message latencies.
+
+Each mode is started in a child process and loaded with loadgen.run_load, so the numbers can be
+compared between runs to catch performance regressions.
+
+Usage:
+    python benchmarks/bench_load.py [--players 1000] [--rounds 10] [--think-time 0] [--modes threaded asyncio pool]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadgen import run_load, spawn_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--modes", nargs="+", choices=["threaded", "asyncio", "pool"],
+                        default=["threaded", "asyncio", "pool"])
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        process, port = spawn_server(mode)
+        try:
+            report = asyncio.run(run_load("localhost", port, args.players, args.rounds, args.think_time))
+        finally:
+            process.terminate()
+            process.join()
+        print(f"{mode}: {args.players} players x {args.rounds} rounds")
+        print(report.format())
+        print()
+
+
+if __name__ == "__main__":
+    main()
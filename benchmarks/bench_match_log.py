@@ -0,0 +1,73 @@
+"""
+Measures match log appends and how long a restart takes to rebuild the leaderboard from the log.
+
+The large log is generated directly in the record format, then ScoreKeeper.restore is timed on it,
+which is what the server does on startup.
+
+Usage:
+    python benchmarks/bench_match_log.py [--records 10000000] [--players 10000] [--appends 200000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matchlog import NAME_SIZE, RECORD, MatchLog, names_path
+from scores import ScoreKeeper
+
+
+def generate(path, records, players, chunk=100000):
+    rng = random.Random(0)
+    with open(names_path(path), "wb") as f:
+        for i in range(players):
+            raw = f"player{i}".encode()
+            f.write(NAME_SIZE.pack(len(raw)) + raw)
+    with open(path, "wb") as f:
+        for start in range(0, records, chunk):
+            f.write(b"".join(
+                RECORD.pack(1.7e9 + i, i // 10, rng.randrange(players), rng.randrange(players),
+                            rng.randint(1, 3), rng.randint(1, 3), rng.randint(-1, 1))
+                for i in range(start, min(start + chunk, records))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000000)
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--appends", type=int, default=200000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "appends.log")
+        log = MatchLog(path)
+        start = time.perf_counter()
+        for i in range(args.appends):
+            log.append(i, (f"player{i % args.players}", f"player{(i + 1) % args.players}"), (1, 3), 0)
+        log.close()
+        elapsed = time.perf_counter() - start
+        print(f"MatchLog.append: {args.appends / elapsed:,.0f} records/s including fsyncs")
+
+        path = os.path.join(directory, "matches.log")
+        start = time.perf_counter()
+        generate(path, args.records, args.players)
+        print(f"Generated {args.records:,} records ({os.path.getsize(path) / 2 ** 20:.0f} MiB) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        keeper = ScoreKeeper.restore(path)
+        elapsed = time.perf_counter() - start
+        keeper.log.close()
+        print(f"Leaderboard rebuilt from {args.records:,} records in {elapsed:.2f}s "
+              f"({args.records / elapsed:,.0f} records/s), top: {keeper.top(1)}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
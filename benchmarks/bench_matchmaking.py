@@ -0,0 +1,39 @@
+"""
+Measures how many joins per second the matchmaker can pair.
+
+Some of the players left waiting are cancelled straight away, to include the cost of skipping
+abandoned tickets.
+
+Usage:
+    python benchmarks/bench_matchmaking.py [--joins 1000000] [--buckets 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matchmaking import Matchmaker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--joins", type=int, default=1000000)
+    parser.add_argument("--buckets", type=int, default=1)
+    args = parser.parse_args()
+
+    matchmaker = Matchmaker()
+    start = time.perf_counter()
+    paired = 0
+    for i in range(args.joins):
+        game_id, p = matchmaker.join(i % args.buckets)
+        paired += p
+        if i % 7 == 0 and p == 0:
+            matchmaker.cancel(game_id)
+    elapsed = time.perf_counter() - start
+    print(f"{args.joins} joins in {elapsed:.2f}s: {args.joins / elapsed:,.0f} joins/s, {paired} games filled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Measures what recording metrics costs the server, by loading it with metrics off and on.
+
+Each configuration is started in a child process and played by loadgen bots; the per-message
+latencies and throughput of the two runs should be within noise of each other.
+
+Usage:
+    python benchmarks/bench_metrics.py [--players 200] [--rounds 20] [--mode threaded]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadgen import run_load, spawn_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--mode", choices=["threaded", "asyncio"], default="threaded")
+    args = parser.parse_args()
+
+    for metrics in (False, True):
+        process, port = spawn_server(args.mode, metrics)
+        try:
+            report = asyncio.run(run_load("localhost", port, args.players, args.rounds))
+        finally:
+            process.terminate()
+            process.join()
+        print(f"{args.mode}, metrics {'on' if metrics else 'off'}: {args.players} players x {args.rounds} rounds")
+        print(report.format())
+        print()
+
+
+if __name__ == "__main__":
+    main()
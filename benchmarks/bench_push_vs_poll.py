@@ -0,0 +1,86 @@
+"""
+Compares message volume of 60 Hz polling against server-pushed updates.
+
+Connects a number of idle players (every game waiting or with nobody moving) and counts the
+frames exchanged with the server over a fixed period in each mode.
+
+Usage:
+    python benchmarks/bench_push_vs_poll.py [--players 100] [--seconds 3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_server import AsyncServer
+from protocol import encode_frame, read_frame
+
+GET = encode_frame(b"get")
+SUBSCRIBE = encode_frame(b"subscribe")
+
+
+async def _poller(port, seconds, counts):
+    reader, writer = await asyncio.open_connection("localhost", port)
+    await read_frame(reader)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        writer.write(GET)
+        counts["sent"] += 1
+        await read_frame(reader)
+        counts["received"] += 1
+        await asyncio.sleep(1 / 60)
+    return writer
+
+
+async def _subscriber(port, seconds, counts):
+    reader, writer = await asyncio.open_connection("localhost", port)
+    await read_frame(reader)
+    writer.write(SUBSCRIBE)
+    counts["sent"] += 1
+
+    async def receive():
+        while await read_frame(reader) is not None:
+            counts["received"] += 1
+
+    try:
+        await asyncio.wait_for(receive(), seconds)
+    except asyncio.TimeoutError:
+        pass
+    return writer
+
+
+async def _run(port, player, players, seconds):
+    counts = {"sent": 0, "received": 0}
+    writers = await asyncio.gather(*(player(port, seconds, counts) for _ in range(players)))
+    for writer in writers:
+        writer.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    sys.stdout, stdout = open(os.devnull, "w"), sys.stdout
+    server = AsyncServer("localhost", 0)
+    threading.Thread(target=server.run_server, daemon=True).start()
+
+    results = {}
+    for name, player in (("poll", _poller), ("push", _subscriber)):
+        results[name] = asyncio.run(_run(server.port, player, args.players, args.seconds))
+    sys.stdout = stdout
+
+    print(f"{args.players} idle players for {args.seconds}s")
+    for name, counts in results.items():
+        rate = counts["sent"] / args.seconds
+        print(f"{name}: {counts['sent']:7d} requests ({rate:8.1f}/s)  {counts['received']:7d} frames received")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Measures the client's frame time with and without the render cache, headless.
+
+Runs under SDL's dummy video driver, so no window is opened. A client draws frames of a game
+whose state changes every so often, like the client's 60 frames a second loop does while the
+players think: "uncached" repaints the whole window every frame, looking fonts up and rendering
+every label afresh, as the client used to; "cached" draws through a Renderer, which keeps fonts
+and labels and repaints only the changed areas. Reports the mean and p99 frame time and the
+window area updated per frame.
+
+Usage:
+    python benchmarks/bench_render.py [--frames 3000] [--change-every 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from button import Button
+from client import BACKGROUND, Client
+from game import Game
+from render import RenderCache, Renderer
+from session import Session
+
+
+class _Scripted:
+    """Stands in for the client's connection, handing the session the game the benchmark sets."""
+    thread = None
+    error = None
+    game = None
+
+    def next_round(self):
+        return None
+
+
+def _client(width=600, height=600):
+    """Builds a Client with its window and buttons but no connection."""
+    client = Client.__new__(Client)
+    client.width, client.height = width, height
+    client.win = pygame.display.set_mode((width, height))
+    client.cache = RenderCache()
+    client.renderer = Renderer(client.win, client.cache, BACKGROUND)
+    client.btns = [Button("Rock", 50, 500, (0, 0, 0)),
+                   Button("Scissors", 250, 500, (255, 0, 0)),
+                   Button("Paper", 450, 500, (0, 255, 0))]
+    client.player = 0
+    client.session = Session(_Scripted(), 0)
+    return client
+
+
+def _states():
+    """Yields the game states a client sees over a round, over and over."""
+    game = Game(0)
+    while True:
+        game.ready = False
+        yield game
+        game.ready = True
+        yield game
+        game.play(0, "Rock")
+        yield game
+        game.play(1, "Paper")
+        yield game
+        game.resetWent()
+
+
+def _uncached(client, game):
+    """Draws a frame the way the client did before the render cache."""
+    win = client.win
+    win.fill(BACKGROUND)
+    if not game.connected():
+        font = pygame.font.SysFont("comicsans", 80)
+        win.blit(font.render("Waiting for Player...", 1, (255, 0, 0)), (client.width / 2, client.height / 2))
+    else:
+        font = pygame.font.SysFont("comicsans", 60)
+        win.blit(font.render("Your Move", 1, (0, 255, 255)), (80, 200))
+        win.blit(font.render("Opponents", 1, (0, 255, 255)), (380, 200))
+        for text, x in ((game.get_player_move(0) or "Waiting...", 100), (game.get_player_move(1) or "Waiting...", 400)):
+            win.blit(font.render(text, 1, (0, 0, 0)), (x, 350))
+        for btn in client.btns:
+            pygame.draw.rect(win, btn.color, (btn.x, btn.y, btn.width, btn.height))
+            label = pygame.font.SysFont("comicsans", 40).render(btn.text, 1, (255, 255, 255))
+            win.blit(label, (btn.x + round(btn.width / 2) - round(label.get_width() / 2),
+                             btn.y + round(btn.height / 2) - round(label.get_height() / 2)))
+    pygame.display.update()
+    return win.get_width() * win.get_height()
+
+
+def _cached(client, game):
+    client.session.connection.game = game
+    return sum(area.width * area.height for area in client.redraw_window())
+
+
+def run(draw, frames, change_every):
+    client = _client()
+    states = _states()
+    game = next(states)
+    times, pixels = [], 0
+    for frame in range(frames):
+        if frame and frame % change_every == 0:
+            game = next(states)
+        start = time.perf_counter()
+        pixels += draw(client, game)
+        times.append(time.perf_counter() - start)
+    return times, pixels / frames / (client.width * client.height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--change-every", type=int, default=30, help="Frames between changes to the game")
+    args = parser.parse_args()
+
+    pygame.init()
+    for name, draw in (("uncached", _uncached), ("cached", _cached)):
+        times, updated = run(draw, args.frames, args.change_every)
+        times.sort()
+        print(f"{name:9} mean {sum(times) / len(times) * 1000:7.3f}ms  "
+              f"p99 {times[int(len(times) * 0.99)] * 1000:7.3f}ms  window updated per frame {updated:6.1%}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares one connection per game with many games multiplexed over one multi-room connection.
+
+Two tournament bots play a number of games against each other, either with a Network
+connection for every game each, or with a single RoomNetwork each. Reports the time to set up
+the games and to play the rounds, and the server's threads and memory once all games are open.
+
+Usage:
+    python benchmarks/bench_rooms.py [--games 200] [--rounds 5] [--mode threaded]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadgen import spawn_server
+from network import Network, RoomNetwork
+
+
+def _proc_status(pid, key):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def play_sockets(port, games, rounds):
+    pairs = []
+    for _ in range(games):
+        pairs.append((Network("localhost", port), Network("localhost", port)))
+    yield
+    for _ in range(rounds):
+        for a, b in pairs:
+            a.send("Rock")
+            b.send("Scissors")
+            a.send("reset")
+    yield sum(a.send("get").wins[0] for a, _ in pairs)
+    for a, b in pairs:
+        a.client.close()
+        b.client.close()
+
+
+def play_rooms(port, games, rounds):
+    a = RoomNetwork("localhost", port)
+    for _ in range(games - 1):
+        a.join()
+    b = RoomNetwork("localhost", port)
+    for _ in range(games - 1):
+        b.join()
+    shared = sorted(set(a.seats) & set(b.seats))
+    yield
+    for _ in range(rounds):
+        for game_id in shared:
+            a.send(game_id, "Rock")
+            b.send(game_id, "Scissors")
+            a.send(game_id, "reset")
+    yield sum(a.send(game_id, "get").wins[a.seats[game_id]] for game_id in shared)
+    a.client.close()
+    b.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mode", choices=["threaded", "asyncio", "pool"], default="threaded")
+    args = parser.parse_args()
+
+    for name, play in (("connection per game", play_sockets), ("multi-room", play_rooms)):
+        process, port = spawn_server(args.mode)
+        try:
+            bots = play(port, args.games, args.rounds)
+            start = time.perf_counter()
+            next(bots)
+            setup = time.perf_counter() - start
+            threads = _proc_status(process.pid, "Threads")
+            rss = _proc_status(process.pid, "VmRSS")
+            start = time.perf_counter()
+            wins = next(bots)
+            playing = time.perf_counter() - start
+            next(bots, None)
+        finally:
+            process.terminate()
+            process.join()
+        print(f"{name:20} setup {setup * 1000:7.1f}ms  rounds {playing * 1000:7.1f}ms  "
+              f"server threads {threads:5}  rss {rss / 1024:6.1f}MB  wins {wins}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Shows that resolving a round costs the same whatever the number of moves in the variant.
+
+Usage:
+    python benchmarks/bench_rules.py [--rounds 200000] [--sizes 3 5 15 101]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import Game
+from rules import RuleSet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 15, 101])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for size in args.sizes:
+        start = time.perf_counter()
+        rules = RuleSet.cyclic(f"cyclic-{size}", [f"Move{i}" for i in range(size)])
+        compiled = time.perf_counter() - start
+        game = Game(0, rules)
+        pairs = [(rng.randint(1, size), rng.randint(1, size)) for _ in range(args.rounds)]
+        start = time.perf_counter()
+        for codes in pairs:
+            game.move_codes = codes
+            game.winner()
+        elapsed = time.perf_counter() - start
+        print(f"{size:4d} moves: compiled in {compiled * 1000:.2f}ms, "
+              f"{elapsed / args.rounds * 1e9:.0f}ns per round")
+
+
+if __name__ == "__main__":
+    main()
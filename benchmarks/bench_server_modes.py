@@ -0,0 +1,147 @@
+"""
+Load test comparing the threaded, asyncio and worker-pool serving modes.
+
+Opens many concurrent client connections against a server running in a child process,
+has every client poll "get" for a number of rounds, and reports throughput, latency
+percentiles, requests the server rejected as overloaded, and how much server CPU time,
+memory and threads each mode needed.
+
+Usage:
+    python benchmarks/bench_server_modes.py [--connections 1000 10000] [--rounds 20] [--modes threaded pool]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import OVERLOADED, encode_frame, read_frame
+
+GET = encode_frame(b"get")
+
+MODES = ["threaded", "asyncio", "pool"]
+
+
+def _serve(mode, ports, connections):
+    sys.stdout = open(os.devnull, "w")
+    if mode == "asyncio":
+        from async_server import AsyncServer
+        server = AsyncServer("localhost", 0)
+    elif mode == "pool":
+        from pool_server import PoolServer
+        server = PoolServer("localhost", 0, max_connections=connections)
+    else:
+        from server import Server
+        server = Server("localhost", 0)
+    ports.put(server.port)
+    server.run_server()
+
+
+def _cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except OSError:
+        return None
+
+
+def _proc_status(pid, key):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def _connect(port):
+    reader, writer = await asyncio.open_connection("localhost", port)
+    await read_frame(reader)
+    return reader, writer
+
+
+async def _player(reader, writer, rounds, latencies, rejected):
+    for _ in range(rounds):
+        start = time.perf_counter()
+        writer.write(GET)
+        if await read_frame(reader) == OVERLOADED:
+            rejected.append(1)
+        else:
+            latencies.append(time.perf_counter() - start)
+
+
+async def _load(port, pid, connections, rounds):
+    # Connect everyone before polling so that no game is torn down while others are still joining.
+    clients = [await _connect(port) for _ in range(connections)]
+    start = time.perf_counter()
+    latencies = []
+    rejected = []
+    await asyncio.gather(*(_player(reader, writer, rounds, latencies, rejected) for reader, writer in clients))
+    elapsed = time.perf_counter() - start
+    # Sample while every connection is still open.
+    usage = _proc_status(pid, "VmRSS"), _proc_status(pid, "Threads")
+    for _, writer in clients:
+        writer.close()
+    return latencies, len(rejected), elapsed, usage
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(mode, connections, rounds):
+    ports = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve, args=(mode, ports, connections), daemon=True)
+    proc.start()
+    port = ports.get(timeout=10)
+
+    cpu_before = _cpu_seconds(proc.pid)
+    latencies, rejected, elapsed, (rss, threads) = asyncio.run(_load(port, proc.pid, connections, rounds))
+    cpu_after = _cpu_seconds(proc.pid)
+
+    proc.terminate()
+    proc.join()
+
+    cpu = None if cpu_before is None else cpu_after - cpu_before
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "rejected": rejected,
+        "req_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "server_cpu_s": cpu,
+        "conns_per_cpu_s": connections / cpu if cpu else None,
+        "server_rss_mb": rss / 1024 if rss is not None else None,
+        "server_threads": threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, nargs="+", default=[500])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    for connections in args.connections:
+        print(f"{connections} connections x {args.rounds} rounds")
+        for mode in args.modes:
+            r = run(mode, connections, args.rounds)
+            cpu = f"{r['server_cpu_s']:.2f}s" if r["server_cpu_s"] is not None else "n/a"
+            per_cpu = f"{r['conns_per_cpu_s']:.0f}" if r["conns_per_cpu_s"] else "n/a"
+            rss = f"{r['server_rss_mb']:.1f}MB" if r["server_rss_mb"] is not None else "n/a"
+            print(f"{r['mode']:>9}: {r['req_per_s']:9.0f} req/s  p50 {r['p50_ms']:6.2f}ms  "
+                  f"p99 {r['p99_ms']:7.2f}ms  rejected {r['rejected']}  server cpu {cpu}  "
+                  f"conns/cpu-s {per_cpu}  rss {rss}  threads {r['server_threads']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measures how matches per second scale with the number of sharded worker processes.
+
+For each worker count, starts a Lobby with that many workers and drives it from several client
+processes. Each client plays complete matches back to back: two players join, both lock in a
+move, and both disconnect.
+
+Usage:
+    python benchmarks/bench_shards.py [--workers 1 2 4] [--seconds 5] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import encode_frame, read_frame
+from shards import Lobby
+
+
+async def _join(port):
+    reader, writer = await asyncio.open_connection("localhost", port)
+    await read_frame(reader)
+    return reader, writer
+
+
+async def _play(port, seconds, concurrency):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    played = 0
+
+    # Each pair of joins is made under a lock so the two players of a match join back to back
+    # and get paired with each other.
+    lock = asyncio.Lock()
+
+    async def slot():
+        nonlocal played
+        while loop.time() < end:
+            async with lock:
+                host = await _join(port)
+                guest = await _join(port)
+            for (reader, writer), move in ((host, b"Rock"), (guest, b"Paper")):
+                writer.write(encode_frame(move))
+                await read_frame(reader)
+            for _, writer in (host, guest):
+                writer.close()
+            played += 1
+
+    await asyncio.gather(*(slot() for _ in range(concurrency)))
+    return played
+
+
+def _client(port, seconds, concurrency, results):
+    results.put(asyncio.run(_play(port, seconds, concurrency)))
+
+
+def run(workers, seconds, concurrency, client_procs):
+    lobby = Lobby("localhost", 0, workers=workers)
+    lobby.start()
+    threading.Thread(target=lobby.serve_forever, daemon=True).start()
+
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=_client, args=(lobby.port, seconds, concurrency, results))
+               for _ in range(client_procs)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    played = sum(results.get() for _ in clients)
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.join()
+    for process in lobby.processes:
+        process.terminate()
+        process.join()
+    return played / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent matches per client process")
+    parser.add_argument("--client-procs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # Keep the server's connection logging out of the report.
+    sys.stdout, stdout = open(os.devnull, "w"), sys.stdout
+    print(f"{os.cpu_count()} CPUs, {args.client_procs} client processes x {args.concurrency} concurrent matches",
+          file=stdout)
+    baseline = None
+    for workers in args.workers:
+        rate = run(workers, args.seconds, args.concurrency, args.client_procs)
+        baseline = baseline or rate
+        print(f"{workers:3d} workers: {rate:8.0f} matches/s  ({rate / baseline:.2f}x)", file=stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the binary game snapshot against pickle.
+
+Reports the encoded size and the per-call encode and decode time of a mid-round game, and of
+the delta and "not modified" replies sent to clients polling with "get:<version>".
+
+Usage:
+    python benchmarks/bench_snapshot.py [--number 100000]
+"""
+import argparse
+import os
+import pickle
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import Game
+from protocol import NOT_MODIFIED, apply_update, decode_game, encode_delta, encode_game, game_fields
+
+
+def sample_game():
+    game = Game(1234)
+    game.ready = True
+    game.play(0, "Rock")
+    game.play(1, "Paper")
+    game.wins = [5, 7]
+    game.ties = 3
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    game = sample_game()
+    codecs = {
+        "pickle": (pickle.dumps, pickle.loads),
+        "snapshot": (encode_game, decode_game),
+    }
+    for name, (encode, decode) in codecs.items():
+        payload = encode(game)
+        enc = timeit.timeit(lambda: encode(game), number=args.number) / args.number
+        dec = timeit.timeit(lambda: decode(payload), number=args.number) / args.number
+        print(f"{name:>12}: {len(payload):4d} bytes  encode {enc * 1e6:6.2f}us  decode {dec * 1e6:6.2f}us")
+
+    # The opponent locks in a move: the client only needs the new flags and move.
+    old = game_fields(game)
+    client_copy = decode_game(encode_game(game))
+    game.resetWent()
+    game.play(1, "Scissors")
+    new = game_fields(game)
+    delta = encode_delta(old, new)
+    enc = timeit.timeit(lambda: encode_delta(old, new), number=args.number) / args.number
+    dec = timeit.timeit(lambda: apply_update(client_copy, delta), number=args.number) / args.number
+    print(f"{'delta':>12}: {len(delta):4d} bytes  encode {enc * 1e6:6.2f}us  apply  {dec * 1e6:6.2f}us")
+    print(f"{'not modified':>12}: {len(NOT_MODIFIED):4d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Measures request latency and connection bursts with and without each socket option.
+
+For every variant, a threaded server is started with those options and Network clients connect
+with the same ones. Reports the round trip of a "get", of a request written in two pieces before
+the reply is read (the pattern Nagle's algorithm and delayed ACKs penalise), and how long a burst
+of connections opened at once takes to be accepted, with the number not accepted within the
+timeout. Connections that overflow the listen backlog have their SYN dropped and retried a
+second or more later.
+
+Usage:
+    python benchmarks/bench_sockopts.py [--requests 2000] [--burst 500]
+"""
+import argparse
+import os
+import selectors
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadgen import spawn_server
+from network import Network
+from protocol import encode_frame
+from sockopts import SocketOptions
+
+VARIANTS = {
+    "defaults": SocketOptions(),
+    "nagle on": SocketOptions(nodelay=False),
+    "keepalive": SocketOptions(keepalive=10, keepalive_interval=5, keepalive_count=3),
+    "4KB buffers": SocketOptions(sndbuf=4096, rcvbuf=4096),
+    "backlog 128": SocketOptions(backlog=128),
+    "backlog 2": SocketOptions(backlog=2),
+}
+
+
+def _percentiles(samples):
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def round_trips(port, options, requests):
+    network = Network("localhost", port, options)
+    opponent = Network("localhost", port, options)
+    whole, split = [], []
+    frame = encode_frame(b"get")
+    for _ in range(requests):
+        start = time.perf_counter()
+        network.send("get")
+        whole.append(time.perf_counter() - start)
+        # The header and the body go out in separate writes, as a client writing fields one by one would.
+        start = time.perf_counter()
+        network.client.sendall(frame[:4])
+        network.client.sendall(frame[4:])
+        network.receive_data()
+        split.append(time.perf_counter() - start)
+    network.client.close()
+    opponent.client.close()
+    return whole, split
+
+
+def burst(port, options, connections, timeout=5.0):
+    """
+    Opens connections all at once.
+
+    Returns
+    -------
+    tuple
+        The seconds until each connection was accepted, and the number not accepted within the timeout.
+    """
+    selector = selectors.DefaultSelector()
+    start = time.perf_counter()
+    for _ in range(connections):
+        sock = options.socket()
+        sock.setblocking(False)
+        sock.connect_ex(("127.0.0.1", port))
+        selector.register(sock, selectors.EVENT_READ)
+    accepted = []
+    # A connection counts as accepted once the server's greeting arrives.
+    deadline = start + timeout
+    while selector.get_map() and time.perf_counter() < deadline:
+        for key, _ in selector.select(0.05):
+            try:
+                if key.fileobj.recv(64):
+                    accepted.append(time.perf_counter() - start)
+            except OSError:
+                pass
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+    selector.close()
+    return accepted, connections - len(accepted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=500, help="Connections opened at once")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    args = parser.parse_args()
+
+    for name in args.variants:
+        options = VARIANTS[name]
+        process, port = spawn_server("threaded", socket_options=options)
+        try:
+            whole, split = round_trips(port, options, args.requests)
+            accepted, failed = burst(port, options, args.burst)
+        finally:
+            process.terminate()
+            process.join()
+        get_p50, get_p99 = _percentiles(whole)
+        split_p50, split_p99 = _percentiles(split)
+        accept_p99 = _percentiles(accepted)[1] if accepted else float("nan")
+        print(f"{name:12} get p50 {get_p50:6.3f}ms p99 {get_p99:6.3f}ms  "
+              f"split request p50 {split_p50:6.3f}ms p99 {split_p99:6.3f}ms  "
+              f"burst of {args.burst}: p99 accepted in {accept_p99:7.1f}ms, {failed} not accepted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measures the startup import time of the headless and GUI entry points with python -X importtime.
+
+Each entry point is imported in a fresh interpreter a number of times. "headless" imports the
+game core a bot or tool uses (session, network, protocol, game); "client" imports the GUI client
+module, which no longer loads pygame by itself; "gui" also loads pygame, as opening the window
+does. Reports the median of the total import time -X importtime records and of the
+interpreter's wall time, whether pygame was loaded, and the slowest top-level imports.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--top 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "headless": "import session, network",
+    "client": "import client",
+    "gui": "import client; from render import load_pygame; load_pygame()",
+}
+
+
+def import_times(code):
+    """
+    Runs code in a fresh interpreter under -X importtime.
+
+    Returns
+    -------
+    tuple
+        The wall time in seconds, and the cumulative microseconds of every top-level import by module name.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1"),
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module that imported them.
+        if not name[1:].startswith(" "):
+            imports[name.strip()] = int(cumulative)
+    return wall, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=3, help="Slowest top-level imports to show")
+    args = parser.parse_args()
+
+    for name, code in ENTRY_POINTS.items():
+        walls, totals, slowest = [], [], {}
+        for _ in range(args.runs):
+            wall, imports = import_times(code)
+            walls.append(wall)
+            totals.append(sum(imports.values()))
+            for module, micros in imports.items():
+                slowest.setdefault(module, []).append(micros)
+        top = sorted(slowest.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+        print(f"{name:9} imports {statistics.median(totals) / 1000:7.1f}ms  "
+              f"process {statistics.median(walls) * 1000:7.1f}ms  pygame {'pygame' in slowest!s:5}  slowest "
+              + ", ".join(f"{module} {statistics.median(micros) / 1000:.1f}ms" for module, micros in top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the timer wheel with scanning every connection's deadline on each tick.
+
+Both keep an idle timeout for each of a number of connections. Every tick, a share of the
+connections send a message, pushing their timeout back, and the due timeouts are collected.
+
+Usage:
+    python benchmarks/bench_timers.py [--connections 100000] [--ticks 200] [--active 0.2]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timers import TimerWheel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=100000)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--active", type=float, default=0.2,
+                        help="Share of the connections that send a message each tick")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Idle timeout, in ticks")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    active = int(args.connections * args.active)
+    schedule = [rng.sample(range(args.connections), active) for _ in range(args.ticks)]
+
+    now = [0.0]
+    wheel = TimerWheel(tick=1.0, clock=lambda: now[0])
+    expired = []
+    timers = [wheel.schedule(args.timeout, expired.append, i) for i in range(args.connections)]
+    touching = ticking = 0.0
+    for senders in schedule:
+        start = time.perf_counter()
+        for i in senders:
+            wheel.touch(timers[i], args.timeout)
+        touching += time.perf_counter() - start
+        now[0] += 1
+        start = time.perf_counter()
+        wheel.advance()
+        ticking += time.perf_counter() - start
+    print(f"timer wheel:   {touching / args.ticks * 1000:6.2f}ms touching + {ticking / args.ticks * 1000:6.2f}ms "
+          f"expiring per tick, {len(expired)} expired")
+
+    deadlines = {i: args.timeout for i in range(args.connections)}
+    expired = []
+    touching = ticking = 0.0
+    for tick, senders in enumerate(schedule):
+        start = time.perf_counter()
+        for i in senders:
+            if i in deadlines:
+                deadlines[i] = tick + args.timeout
+        touching += time.perf_counter() - start
+        start = time.perf_counter()
+        due = [i for i, deadline in deadlines.items() if deadline <= tick + 1]
+        for i in due:
+            del deadlines[i]
+        expired.extend(due)
+        ticking += time.perf_counter() - start
+    print(f"deadline scan: {touching / args.ticks * 1000:6.2f}ms touching + {ticking / args.ticks * 1000:6.2f}ms "
+          f"expiring per tick, {len(expired)} expired")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
-import pygame
+from render import RenderCache
+
+FONT_SIZE = 40
+TEXT_COLOR = (255, 255, 255)
+# Shared by buttons drawn straight onto a window, so their labels are only rendered once.
+CACHE = RenderCache()
 
 class Button:
     def __init__(self, text, x, y, color):
@@ -9,13 +14,17 @@ class Button:
         self.width = 150
         self.height = 100
 
-    def draw(self, win):
+    def draw(self, win, cache=CACHE):
         """Draws the button on the window."""
-        pygame.draw.rect(win, self.color, (self.x, self.y, self.width, self.height))
-        font = pygame.font.SysFont("comicsans", 40)
-        text = font.render(self.text, 1, (255,255,255))
+        win.fill(self.color, (self.x, self.y, self.width, self.height))
+        text = cache.text(self.text, FONT_SIZE, TEXT_COLOR)
         win.blit(text, (self.x + round(self.width/2) - round(text.get_width()/2), self.y + round(self.height/2) - round(text.get_height()/2)))
 
+    def add_to(self, renderer):
+        """Adds the button to the frame a Renderer is drawing."""
+        renderer.rect(self.color, (self.x, self.y, self.width, self.height))
+        renderer.text(self.text, FONT_SIZE, (self.x + round(self.width/2), self.y + round(self.height/2)), TEXT_COLOR, center=True)
+
     def click(self, pos):
         """Checks if the button is clicked."""
         x1, y1 = pos
@@ -0,0 +1,694 @@
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from protocol import NOT_MODIFIED, encode_delta, encode_fields, encode_frame, encode_game, encode_room, game_fields
+
+PUSH_POLICIES = ("coalesce", "drop")
+# Seconds hangup waits for another thread's send to a client before giving up on what is queued.
+HANGUP_WAIT = 0.05
+
+
+class Broadcast:
+    """
+    An update pushed to every subscriber of a game, framed once and shared by all of them.
+
+    The frame for plain connections and the tagged frame for multi-room connections are each
+    built the first time a subscriber needs them, so a thousand subscribers cost one encoding
+    and a thousand references to the same bytes.
+
+    Attributes
+    ----------
+    game_id : int
+        The unique ID of the game the update is about, or None for a keepalive.
+    payload : bytes
+        The update: a snapshot, a "not modified" marker or a closed notice.
+    """
+    __slots__ = ("game_id", "payload", "_frame", "_tagged")
+
+    def __init__(self, game_id, payload):
+        self.game_id = game_id
+        self.payload = payload
+        self._frame = None
+        self._tagged = None
+
+    def frame(self):
+        """Returns the update framed for a connection tied to one game."""
+        if self._frame is None:
+            self._frame = encode_frame(self.payload)
+        return self._frame
+
+    def tagged_frame(self):
+        """Returns the update tagged with its game ID and framed, for a multi-room connection."""
+        if self._tagged is None:
+            self._tagged = encode_frame(encode_room(self.game_id, self.payload))
+        return self._tagged
+
+
+class SocketChannel:
+    """
+    A client connection served by the threaded server.
+
+    Once a game has subscribers, the opponent's thread may push updates on this socket while its
+    own thread is replying, so every send goes through a lock to keep frames whole.
+
+    Replies are sent with send, which blocks until the client has taken them, as only the thread
+    serving this client waits. A pool worker, which serves many clients, queues its replies with
+    push_frame instead, and disconnects a client whose queue is full. Updates pushed from other threads go through push, which never
+    blocks: when the socket is full, or another thread is sending, the update is queued for the
+    fanout thread to send once the client catches up. The queue is bounded, and updates beyond
+    the queue size are dropped. A newer update for a game a client watches replaces the one
+    still queued for it, unless the policy is "drop"; a player's updates are never replaced, so
+    that the state showing both moves of a round reaches the player even when the reset follows
+    straight away. A client that falls behind that far skips intermediate states, and can catch
+    up with "get:<version>".
+
+    Attributes
+    ----------
+    conn : socket
+        The client socket.
+    subscribed : bool
+        Whether the client asked for pushed updates instead of replies to each poll.
+    metrics : Metrics
+        Where bytes sent, and pushed updates dropped or replaced, are counted, or None.
+    rooms : dict
+        The games of a multi-room connection, as RoomChannels with the game ID as the key, or
+        None while the connection is tied to a single game.
+    fanout : Fanout
+        The thread that sends queued updates, or None to push with blocking sends.
+    pending : deque
+        The queued [game ID, frame] entries, oldest first. The game ID is None once an entry can
+        no longer be replaced, i.e. while it is being sent.
+    closed : bool
+        Whether the connection was closed.
+    """
+
+    def __init__(self, conn, metrics=None, fanout=None):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.subscribed = False
+        self.metrics = metrics
+        self.rooms = None
+        self.fanout = fanout
+        self.pending = deque()
+        self.queued = {}
+        self.queue_lock = threading.Lock()
+        self.closed = False
+
+    def send(self, payload):
+        """Sends one framed message to the client, after any updates still queued for it."""
+        frame = encode_frame(payload)
+        with self.lock:
+            entry = self._head()
+            while entry is not None:
+                self.conn.sendall(entry[1])
+                entry = self._next()
+            self.conn.sendall(frame)
+        if self.metrics is not None:
+            self.metrics.increment("bytes_out", len(frame))
+
+    def push(self, broadcast, replace=False):
+        """
+        Pushes an update to the client without blocking; see the class description.
+
+        Parameters
+        ----------
+        broadcast : Broadcast
+            The update.
+        replace : bool
+            Whether a newer update for the game may replace this one while it is queued, as for
+            a spectator.
+        """
+        self.push_frame(broadcast.frame(), broadcast.game_id if replace else None)
+
+    def push_frame(self, frame, key):
+        """
+        Sends a framed update if the socket takes it straight away, or else queues it for the fanout thread.
+
+        Parameters
+        ----------
+        frame : bytes
+            The framed update.
+        key : int
+            The game the update is about. A queued update is replaced by a newer one for the same
+            game. None if it must not be replaced.
+
+        Returns
+        -------
+        bool
+            True if the update was sent or queued, False if it was dropped because the queue is full.
+
+        Raises
+        ------
+        OSError
+            If the connection is broken.
+        """
+        if self.fanout is None:
+            with self.lock:
+                self.conn.sendall(frame)
+            self._count(len(frame))
+            return True
+        if self.lock.acquire(blocking=False):
+            try:
+                if not self.pending:
+                    try:
+                        sent = self.conn.send(frame, socket.MSG_DONTWAIT)
+                    except BlockingIOError:
+                        sent = 0
+                    self._count(sent)
+                    if sent == len(frame):
+                        return True
+                    if sent:
+                        # The rest of a frame that was partly sent must go out first, ahead of anything
+                        # queued meanwhile by other threads, and must not be replaced or dropped.
+                        with self.queue_lock:
+                            self.pending.appendleft([None, memoryview(frame)[sent:]])
+                        self.fanout.wake(self)
+                        return True
+                queued = self._queue(frame, key)
+            finally:
+                self.lock.release()
+        else:
+            queued = self._queue(frame, key)
+        self.fanout.wake(self)
+        return queued
+
+    def _queue(self, frame, key):
+        """Queues a framed update, and returns False if it was dropped because the queue is full."""
+        metrics = self.metrics
+        with self.queue_lock:
+            entry = self.queued.get(key) if key is not None else None
+            if entry is not None and self.fanout.policy == "coalesce":
+                entry[1] = frame
+                if metrics is not None:
+                    metrics.increment("pushes_coalesced")
+                return True
+            if len(self.pending) >= self.fanout.queue_size:
+                if metrics is not None:
+                    metrics.increment("pushes_dropped")
+                return False
+            entry = [key, frame]
+            self.pending.append(entry)
+            if key is not None:
+                self.queued[key] = entry
+            return True
+
+    def _head(self):
+        """Returns the oldest queued entry, which can no longer be replaced, or None."""
+        with self.queue_lock:
+            if not self.pending:
+                return None
+            entry = self.pending[0]
+            if entry[0] is not None:
+                del self.queued[entry[0]]
+                entry[0] = None
+            return entry
+
+    def _next(self):
+        """Drops the oldest queued entry, which was sent, and returns the next one."""
+        with self.queue_lock:
+            self._count(len(self.pending.popleft()[1]))
+        return self._head()
+
+    def _count(self, sent):
+        if self.metrics is not None and sent:
+            self.metrics.increment("bytes_out", sent)
+
+    def flush(self, wait=0):
+        """
+        Sends queued updates until the queue is empty or the socket is full. Called by the fanout thread.
+
+        Parameters
+        ----------
+        wait : float
+            Seconds to wait for another thread that is sending, default is not to wait.
+
+        Returns
+        -------
+        bool
+            True if the queue was emptied, False if the socket is full, or None if another thread
+            was sending and the flush should be retried.
+
+        Raises
+        ------
+        OSError
+            If the connection is broken.
+        """
+        if not self.lock.acquire(timeout=wait):
+            return None
+        try:
+            entry = self._head()
+            while entry is not None:
+                frame = entry[1]
+                try:
+                    sent = self.conn.send(frame, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    sent = 0
+                if sent < len(frame):
+                    self._count(sent)
+                    entry[1] = memoryview(frame)[sent:]
+                    return False
+                entry = self._next()
+            return True
+        finally:
+            self.lock.release()
+
+    def hangup(self):
+        """
+        Disconnects the client from another thread, waking up the thread blocked reading from it.
+
+        Updates still queued, such as a closed notice that was pushed last, are sent first as far
+        as the socket takes them without waiting, so a client that stopped reading cannot hold up
+        the caller, typically the timer thread.
+        """
+        if self.fanout is not None:
+            try:
+                self.flush(HANGUP_WAIT)
+            except OSError:
+                pass
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        """Closes the connection. Only the thread serving this client may call it."""
+        if self.fanout is not None:
+            self.fanout.forget(self)
+        self.closed = True
+        self.conn.close()
+
+
+class Fanout:
+    """
+    Pushes updates to spectators, and sends the updates queued on subscribers whose sockets were
+    full, from one background thread, so that publishing a game never waits for its spectators or
+    for a slow client.
+
+    Published games and channels with updates queued are handed over through a pipe that wakes
+    the thread. Only the newest update of each game is kept until the thread gets to it. A
+    channel whose socket fills up again is watched with a selector until it can take more. The
+    thread, its selector and its wakeup sockets are only created by the first hand-over, so a
+    server whose clients never fill their sockets and have no spectators has none of them.
+
+    ...
+
+    Attributes
+    ----------
+    queue_size : int
+        the most updates queued on one connection
+    policy : str
+        what happens to a spectator's update for a game that already has one queued: "coalesce"
+        replaces the queued one, "drop" queues it behind, as long as there is room
+    selector : selectors.BaseSelector
+        watches the wakeup socket and the connections waiting for room in their socket, or None
+        before the thread is started
+
+    Methods
+    -------
+    publish(subscription, broadcast):
+        Has an update pushed to a game's spectators.
+    wake(channel):
+        Has a channel's queued updates sent.
+    forget(channel):
+        Stops sending to a channel that is being closed.
+    run():
+        Sends queued updates as the sockets can take them, forever.
+    """
+
+    def __init__(self, queue_size=64, policy="coalesce"):
+        if policy not in PUSH_POLICIES:
+            raise ValueError(f"Unknown push policy {policy!r}, expected one of {PUSH_POLICIES}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.woken = set()
+        self.broadcasts = {}
+        self.waiting = {}
+        self.thread = None
+        self.selector = None
+
+    def publish(self, subscription, broadcast):
+        """Has an update pushed to a game's spectators, replacing one for the game not yet pushed."""
+        with self.lock:
+            first = self._start()
+            self.broadcasts[subscription] = broadcast
+        self._signal(first)
+
+    def wake(self, channel):
+        """Has a channel's queued updates sent by the fanout thread."""
+        with self.lock:
+            if channel.closed:
+                return
+            first = self._start()
+            self.woken.add(channel)
+        self._signal(first)
+
+    def _start(self):
+        """Starts the thread if need be, and returns whether it has nothing to do yet. Needs the lock."""
+        if self.selector is None:
+            self.selector = selectors.DefaultSelector()
+            self.wakeup, self.waker = socket.socketpair()
+            self.waker.setblocking(False)
+            self.selector.register(self.wakeup, selectors.EVENT_READ)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="rps-fanout", daemon=True)
+            self.thread.start()
+        return not self.woken and not self.broadcasts
+
+    def _signal(self, first):
+        if first:
+            try:
+                self.waker.send(b"\0")
+            except BlockingIOError:
+                pass  # The socket is full of wakeups already.
+
+    def forget(self, channel):
+        """Stops sending to a channel, before its socket is closed and its file descriptor reused."""
+        with self.lock:
+            channel.closed = True
+            self.woken.discard(channel)
+            fd = channel.conn.fileno()
+            if self.waiting.get(fd) is channel:
+                del self.waiting[fd]
+                self.selector.unregister(fd)
+
+    def watch(self, channel):
+        """Waits for room in a channel's socket to send the rest of its queue."""
+        with self.lock:
+            if channel.closed:
+                return
+            fd = channel.conn.fileno()
+            if fd not in self.waiting:
+                self.selector.register(fd, selectors.EVENT_WRITE)
+            self.waiting[fd] = channel
+
+    def run(self):
+        """Sends queued updates as the sockets can take them, forever. Runs on its own thread."""
+        retry = set()
+        while True:
+            ready, retry = retry, set()
+            for key, _ in self.selector.select(0.005 if ready else None):
+                if key.fileobj is self.wakeup:
+                    self.wakeup.recv(4096)
+                    continue
+                # A channel is only watched until its socket has room; watch registers it again.
+                with self.lock:
+                    channel = self.waiting.pop(key.fd, None)
+                    if channel is not None:
+                        self.selector.unregister(key.fd)
+                if channel is not None:
+                    ready.add(channel)
+            with self.lock:
+                ready |= self.woken
+                self.woken.clear()
+                broadcasts, self.broadcasts = self.broadcasts, {}
+            for subscription, broadcast in broadcasts.items():
+                subscription.push_spectators(broadcast)
+            for channel in ready:
+                try:
+                    done = channel.flush()
+                except OSError:
+                    continue  # The client is gone; its own thread cleans up.
+                if done is None:
+                    retry.add(channel)
+                elif not done:
+                    self.watch(channel)
+
+
+class StreamChannel:
+    """
+    A client connection served by the asyncio server.
+
+    Everything runs on the event loop thread, so writes need no locking; they are buffered by
+    the transport and flushed when the client's coroutine drains the writer. Pushed updates are
+    dropped instead while the transport already holds about queue_size of them unsent.
+
+    Attributes
+    ----------
+    writer : asyncio.StreamWriter
+        The stream to write to the client.
+    subscribed : bool
+        Whether the client asked for pushed updates instead of replies to each poll.
+    metrics : Metrics
+        Where bytes sent, and pushed updates dropped, are counted, or None.
+    queue_size : int
+        About how many pushed updates may wait in the transport, or None for no limit.
+    rooms : dict
+        The games of a multi-room connection, as RoomChannels with the game ID as the key, or
+        None while the connection is tied to a single game.
+    """
+
+    def __init__(self, writer, metrics=None, queue_size=None):
+        self.writer = writer
+        self.subscribed = False
+        self.metrics = metrics
+        self.rooms = None
+        self.queue_size = queue_size
+
+    def send(self, payload):
+        """Queues one framed message for the client."""
+        frame = encode_frame(payload)
+        self.writer.write(frame)
+        if self.metrics is not None:
+            self.metrics.increment("bytes_out", len(frame))
+
+    def push(self, broadcast, replace=False):
+        """Pushes an update to the client, unless too many are waiting to be sent already."""
+        self.push_frame(broadcast.frame(), broadcast.game_id)
+
+    def push_frame(self, frame, key):
+        """Queues a framed update for the client, or drops it if the client is too far behind."""
+        if self.queue_size is not None and \
+                self.writer.transport.get_write_buffer_size() >= self.queue_size * len(frame):
+            if self.metrics is not None:
+                self.metrics.increment("pushes_dropped")
+            return
+        self.writer.write(frame)
+        if self.metrics is not None:
+            self.metrics.increment("bytes_out", len(frame))
+
+    def hangup(self):
+        """Disconnects the client, ending the coroutine that serves it."""
+        self.writer.close()
+
+    def close(self):
+        """Closes the connection."""
+        self.writer.close()
+
+
+class RoomChannel:
+    """
+    One game of a multi-room connection.
+
+    It stands in for the connection wherever the server deals with a single game: it is what
+    subscribes to the game, and what the game's players are registered under. Everything sent
+    through it is tagged with the game ID, and hanging it up only takes the game off the
+    connection, which stays open for the client's other games.
+
+    Attributes
+    ----------
+    channel : SocketChannel or StreamChannel
+        The connection the game is multiplexed over.
+    game_id : int
+        The unique ID of the game.
+    p : int
+        The client's player number in the game, or None if it only watches.
+    subscribed : bool
+        Whether the client asked for pushed updates of this game.
+    """
+
+    def __init__(self, channel, game_id, p):
+        self.channel = channel
+        self.game_id = game_id
+        self.p = p
+        self.subscribed = False
+
+    def send(self, payload):
+        """Sends one update for this game to the client."""
+        self.channel.send(encode_room(self.game_id, payload))
+
+    def push(self, broadcast, replace=False):
+        """Pushes an update for this game to the client without blocking; see SocketChannel.push."""
+        self.channel.push_frame(broadcast.tagged_frame(), self.game_id if replace else None)
+
+    def hangup(self):
+        """Takes the game off the connection, after the server closed it."""
+        rooms = self.channel.rooms
+        if rooms is not None and rooms.get(self.game_id) is self:
+            rooms.pop(self.game_id, None)
+
+    def close(self):
+        """Does nothing: the connection is closed by the thread serving it."""
+
+
+class Subscription:
+    """
+    The clients subscribed to a single game, and the recent states published to them.
+
+    The snapshot of the latest game version is encoded once and reused for every reply until
+    the game changes again. The fields of the last few versions are kept so that a client that
+    is a little behind can be sent only what changed.
+
+    Each snapshot is framed once for all subscribers (see Broadcast) and pushed without
+    blocking. Players are pushed to straight away. Spectators are pushed to by the fanout thread,
+    so however many there are, publishing costs the player one hand-over; if the fanout thread
+    falls behind, spectators skip to the newest snapshot.
+
+    Attributes
+    ----------
+    channels : list
+        The subscribed players' channels.
+    spectators : list
+        The channels of the clients watching the game.
+    fanout : Fanout
+        The thread that pushes to spectators, or None to push to them straight away too.
+    version : int
+        The game version of the last published snapshot, -1 before the first publish.
+    snapshot : bytes
+        The last game snapshot published.
+    history : deque
+        (version, fields) for the most recently published versions, newest last.
+    metrics : Metrics
+        Where the time spent encoding snapshots and deltas is recorded, as "serialize", or None.
+
+    Methods
+    -------
+    add(channel, game, spectator=False):
+        Subscribes a channel and pushes it the current state of the game.
+    remove(channel):
+        Unsubscribes a channel.
+    publish(game):
+        Encodes the game and pushes it to every subscriber if it changed.
+    since(version):
+        Returns the reply for a client that already has the given version.
+    """
+
+    def __init__(self, history=4, metrics=None, fanout=None):
+        self.metrics = metrics
+        self.fanout = fanout
+        self.lock = threading.Lock()
+        self.channels = []
+        self.spectators = []
+        self.version = -1
+        self.snapshot = None
+        self.history = deque(maxlen=history)
+        self.deltas = {}
+
+    def add(self, channel, game, spectator=False):
+        """
+        Subscribes a channel and pushes it the current state of the game.
+
+        The snapshot is pushed like any update, without blocking, since the caller holds the
+        game's lock: a client that stopped reading must not hold up the game's players.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The channel to subscribe.
+        game : Game
+            The game the channel subscribes to.
+        spectator : bool
+            Whether the client only watches the game.
+        """
+        with self.lock:
+            channel.subscribed = True
+            (self.spectators if spectator else self.channels).append(channel)
+            channel.push(Broadcast(game.id, encode_game(game)))
+
+    def remove(self, channel):
+        """Unsubscribes a channel. Does nothing if it was not subscribed."""
+        with self.lock:
+            for channels in (self.channels, self.spectators):
+                if channel in channels:
+                    channels.remove(channel)
+
+    def push_spectators(self, broadcast):
+        """Pushes an update to every spectator, unsubscribing those that are gone. Called by the fanout thread."""
+        with self.lock:
+            spectators = list(self.spectators)
+        for i, channel in enumerate(spectators):
+            if i % 32 == 31:
+                time.sleep(0)  # Lets the players' threads in between, rather than after thousands of sends.
+            try:
+                channel.push(broadcast, replace=True)
+            except OSError:
+                self.remove(channel)
+
+    def publish(self, game):
+        """
+        Encodes the game and pushes it to every subscriber if it changed.
+
+        Whether the game changed is decided by its version, so an unchanged game costs no
+        encoding at all. The snapshot is taken while holding the lock, so concurrent publishers
+        can never push an older state after a newer one.
+
+        Parameters
+        ----------
+        game : Game
+            The game to publish.
+
+        Returns
+        -------
+        tuple
+            The encoded snapshot, and whether it differed from the last one published.
+        """
+        with self.lock:
+            if game.version == self.version:
+                return self.snapshot, False
+            start = time.perf_counter() if self.metrics is not None else 0
+            fields = game_fields(game)
+            self.version = game.version
+            self.snapshot = encode_fields(fields)
+            if self.metrics is not None:
+                self.metrics.observe("serialize", time.perf_counter() - start)
+            self.history.append((self.version, fields))
+            self.deltas.clear()
+            broadcast = Broadcast(game.id, self.snapshot)
+            for channel in list(self.channels):
+                try:
+                    channel.push(broadcast)
+                except OSError:
+                    self.channels.remove(channel)
+            if self.spectators:
+                if self.fanout is not None:
+                    self.fanout.publish(self, broadcast)
+                else:
+                    for channel in list(self.spectators):
+                        try:
+                            channel.push(broadcast, replace=True)
+                        except OSError:
+                            self.spectators.remove(channel)
+            return self.snapshot, True
+
+    def since(self, version):
+        """
+        Returns the reply for a client that already has the given version.
+
+        Parameters
+        ----------
+        version : int
+            The last game version the client saw.
+
+        Returns
+        -------
+        bytes
+            NOT_MODIFIED if the client is up to date, a delta if its version is still in the
+            history, or else the full snapshot.
+        """
+        with self.lock:
+            if version == self.version:
+                return NOT_MODIFIED
+            delta = self.deltas.get(version)
+            if delta is None:
+                for known, fields in self.history:
+                    if known == version:
+                        start = time.perf_counter() if self.metrics is not None else 0
+                        delta = self.deltas[version] = encode_delta(fields, self.history[-1][1])
+                        if self.metrics is not None:
+                            self.metrics.observe("serialize", time.perf_counter() - start)
+                        break
+                else:
+                    return self.snapshot
+            return delta
@@ -1,13 +1,44 @@
+from rules import CLASSIC
+
 class Game:
-    def __init__(self, id: int):
+    # Slotted so that a game is a single small object with no __dict__: the server may hold tens
+    # of thousands of them. Moves are kept as codes of the game's rule set, 0 meaning no move yet;
+    # the rule set itself is shared by every game of the same variant.
+    __slots__ = ("p1Went", "p2Went", "ready", "id", "rules", "_move0", "_move1", "wins", "ties", "version")
+
+    def __init__(self, id: int, rules=CLASSIC):
         self.p1Went = False
         self.p2Went = False
         self.ready = False
         self.id = id
-        self.moves = [None, None]
-        self.game_rules = {'RS': 0, 'SP': 0, 'PR': 0, 'RP': 1, 'PS': 1, 'SR': 1}
+        self.rules = rules
+        self._move0 = 0
+        self._move1 = 0
         self.wins = [0,0]
         self.ties = 0
+        self.version = 0
+
+    @property
+    def moves(self) -> list:
+        """
+        The moves of both players by name, e.g. ["Rock", None].
+        """
+        return [self.rules.label(self._move0), self.rules.label(self._move1)]
+
+    @moves.setter
+    def moves(self, moves):
+        self._move0, self._move1 = (self.rules.code(move) if move else 0 for move in moves)
+
+    @property
+    def move_codes(self) -> tuple:
+        """
+        The moves of both players as codes of the game's rule set, 0 for a player who has not picked a move.
+        """
+        return self._move0, self._move1
+
+    @move_codes.setter
+    def move_codes(self, codes):
+        self._move0, self._move1 = codes
 
     def get_player_move(self, p: int) -> str:
         """
@@ -15,17 +46,29 @@ class Game:
         :param p: Player number [0,1]
         :return: Move
         """
-        return self.moves[p]
+        return self.rules.label(self._move1 if p else self._move0)
 
     def play(self, player: int, move: str):
         """
         Records the move of the specified player.
+        Every change to the game increments its version, so clients can tell whether their copy is current.
+        :param move: Move name, e.g. "Rock". Raises KeyError for unknown moves.
         """
-        self.moves[player] = move
+        code = self.rules.code(move)
         if player == 0:
+            self._move0 = code
             self.p1Went = True
         else:
+            self._move1 = code
             self.p2Went = True
+        self.version += 1
+
+    def set_ready(self):
+        """
+        Marks the game as ready once the second player has joined.
+        """
+        self.ready = True
+        self.version += 1
 
     def connected(self) -> bool:
         """
@@ -44,13 +87,13 @@ class Game:
         Determines the winner of the game based on the players' moves.
         Returns -1 if there's a tie.
         """
-        
-        players_moves = self.moves[0].upper()[0] + self.moves[1].upper()[0]
-        return self.game_rules.get(players_moves, -1)
+        return self.rules.outcome(self._move0, self._move1)
 
     def resetWent(self):
         """
         Resets the moves of both players.
         """
-        self.p1Went = False
-        self.p2Went = False
\ No newline at end of file
+        if self.p1Went or self.p2Went:
+            self.p1Went = False
+            self.p2Went = False
+            self.version += 1
@@ -1,18 +1,149 @@
 # Authors: Dasharn Dennis (solo)
-import heapq
-from collections import defaultdict
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+class SortedIndex:
+    """
+    A list of keys kept in sorted order, split into sublists of bounded size.
+
+    Inserting or removing a key only shifts the elements of one sublist, and a Fenwick tree over
+    the sublist lengths finds the position of any key in logarithmic time. The tree is rebuilt
+    only when a sublist is split or emptied, which happens once every few hundred changes.
+
+    ...
+
+    Attributes
+    ----------
+    load : int
+        the target sublist size; sublists are split when they grow to twice this size
+    lists : list
+        the sorted sublists
+    maxes : list
+        the last key of each sublist, for finding the sublist a key belongs to
+
+    Methods
+    -------
+    add(key):
+        Inserts a key.
+    remove(key):
+        Removes a key. The key must be present.
+    bisect_left(key):
+        Returns the number of keys smaller than key.
+    head(n):
+        Returns the n smallest keys.
+    """
+
+    def __init__(self, load=512):
+        self.load = load
+        self.lists = []
+        self.maxes = []
+        self.tree = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key):
+        """Inserts a key."""
+        lists, maxes = self.lists, self.maxes
+        if not lists:
+            lists.append([key])
+            maxes.append(key)
+            self.tree = None
+        else:
+            i = bisect_left(maxes, key)
+            if i == len(maxes):
+                i -= 1
+                lists[i].append(key)
+                maxes[i] = key
+            else:
+                insort(lists[i], key)
+            if len(lists[i]) > 2 * self.load:
+                sublist = lists[i]
+                lists[i + 1:i + 1] = [sublist[self.load:]]
+                del sublist[self.load:]
+                maxes[i:i + 1] = [sublist[-1], lists[i + 1][-1]]
+                self.tree = None
+            else:
+                self._update(i, 1)
+        self.size += 1
+
+    def remove(self, key):
+        """Removes a key. Raises ValueError if it is not present."""
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            raise ValueError(f"{key!r} is not in the index")
+        sublist = self.lists[i]
+        j = bisect_left(sublist, key)
+        if sublist[j] != key:
+            raise ValueError(f"{key!r} is not in the index")
+        del sublist[j]
+        self.size -= 1
+        if not sublist:
+            del self.lists[i]
+            del self.maxes[i]
+            self.tree = None
+        else:
+            self.maxes[i] = sublist[-1]
+            self._update(i, -1)
+
+    def bisect_left(self, key):
+        """Returns the number of keys smaller than key, i.e. the position key would be inserted at."""
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            return self.size
+        return self._prefix(i) + bisect_left(self.lists[i], key)
+
+    def head(self, n):
+        """Returns the n smallest keys, in order."""
+        return list(islice((key for sublist in self.lists for key in sublist), n))
+
+    def _build(self):
+        # A Fenwick tree: tree[i] holds the total length of a range of sublists ending at i - 1.
+        tree = [0] + [len(sublist) for sublist in self.lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def _update(self, i, delta):
+        tree = self.tree
+        if tree is None:
+            return
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i):
+        """Returns the number of keys in the sublists before sublist i."""
+        if self.tree is None:
+            self._build()
+        tree = self.tree
+        total = 0
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
 
 class Leaderboard:
-    
+
     """
     Class for managing the game leaderboard.
 
+    Besides the scores themselves, the leaderboard keeps every player in a SortedIndex ordered by
+    score, updated on each add_score, so that the top scores and any player's rank are read from
+    it directly rather than by sorting all players on every query.
+
     Attributes
     ----------
-    scores : defaultdict
-        A defaultdict to store player names and their scores.
-    heap : list
-        A list of tuples to store player names and their scores for the heap.
+    scores : dict
+        A dict to store player names and their scores.
+    index : SortedIndex
+        (-score, player_name) for every player, highest score first, ties in name order.
 
     Methods
     -------
@@ -22,21 +153,16 @@ class Leaderboard:
         Returns the score of a particular player.
     get_top_scores(n):
         Returns the top n scores.
+    get_rank(player_name):
+        Returns the rank of a particular player.
     """
 
     def __init__(self):
         """
         Constructs all the necessary attributes for the leaderboard object.
-
-        Parameters
-        ----------
-        scores : defaultdict
-            A defaultdict to store player names and their scores.
-        heap : list
-            A list of tuples to store player names and their scores for the heap.
         """
-        self.scores = defaultdict(int)
-        
+        self.scores = {}
+        self.index = SortedIndex()
 
     def add_score(self, player_name, score):
         """
@@ -49,8 +175,12 @@ class Leaderboard:
         score : int
             The score of the player.
         """
-        self.scores[player_name] += score
-        
+        old = self.scores.get(player_name)
+        if old is not None:
+            self.index.remove((-old, player_name))
+            score += old
+        self.scores[player_name] = score
+        self.index.add((-score, player_name))
 
     def get_score(self, player_name):
         """
@@ -64,9 +194,9 @@ class Leaderboard:
         Returns
         -------
         int
-            The score of the player.
+            The score of the player, 0 if they have not scored yet.
         """
-        return self.scores[player_name]
+        return self.scores.get(player_name, 0)
 
     def get_top_scores(self, n):
         """
@@ -82,5 +212,27 @@ class Leaderboard:
         list
             A list of tuples containing the player names and their scores, sorted in descending order.
         """
-        self.heap = [(-score, player_name) for player_name, score in self.scores.items()]
-        return heapq.nlargest(n, self.heap)
\ No newline at end of file
+        return [(player_name, -score) for score, player_name in self.index.head(n)]
+
+    def get_rank(self, player_name):
+        """
+        Returns the rank of a particular player.
+
+        Players with the same score share a rank, e.g. 1, 2, 2, 4.
+
+        Parameters
+        ----------
+        player_name : str
+            The name of the player.
+
+        Returns
+        -------
+        int
+            One more than the number of players with a higher score.
+
+        Raises
+        ------
+        KeyError
+            If the player has no score.
+        """
+        return self.index.bisect_left((-self.scores[player_name],)) + 1
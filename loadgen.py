@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from move import Move
+from protocol import CLOSED, ProtocolError, apply_update, encode_frame, read_frame
+
+MESSAGE_TYPES = ["connect", "name", "get", "move", "reset"]
+
+
+def percentile(values, q):
+    """Returns the q-th quantile (0 to 1) of a non-empty list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LoadReport:
+    """
+    Latencies and errors collected by the bots of a load run.
+
+    ...
+
+    Attributes
+    ----------
+    latencies : defaultdict
+        the round-trip time of every successful request, in seconds, with the message type as the key
+    errors : Counter
+        the number of failed requests of each message type
+    rounds : int
+        the number of rounds the bots completed
+    elapsed : float
+        the wall-clock duration of the run, in seconds
+
+    Methods
+    -------
+    summary():
+        Returns the request count, error rate and latency percentiles of each message type.
+    format():
+        Returns the summary as a printable table.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.rounds = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        """
+        Returns the request count, error rate and latency percentiles of each message type.
+
+        Returns
+        -------
+        dict
+            For each message type, a dict with "requests", "errors", "error_rate", "per_s", and
+            "p50_ms", "p95_ms", "p99_ms" (None if no request succeeded).
+        """
+        summary = {}
+        for kind in MESSAGE_TYPES:
+            latencies = self.latencies.get(kind, [])
+            requests = len(latencies) + self.errors[kind]
+            if not requests:
+                continue
+            summary[kind] = {
+                "requests": requests,
+                "errors": self.errors[kind],
+                "error_rate": self.errors[kind] / requests,
+                "per_s": len(latencies) / self.elapsed if self.elapsed else 0.0,
+            }
+            for q in (50, 95, 99):
+                summary[kind][f"p{q}_ms"] = percentile(latencies, q / 100) * 1000 if latencies else None
+        return summary
+
+    def format(self):
+        """Returns the summary as a printable table."""
+        lines = [f"{'type':>8} {'requests':>9} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for kind, row in self.summary().items():
+            latencies = " ".join(f"{row[key]:8.2f}" if row[key] is not None else f"{'-':>8}"
+                                 for key in ("p50_ms", "p95_ms", "p99_ms"))
+            lines.append(f"{kind:>8} {row['requests']:9d} {row['per_s']:9.0f} {row['error_rate']:7.1%} {latencies}")
+        lines.append(f"{self.rounds} rounds in {self.elapsed:.2f}s: {self.rounds / self.elapsed if self.elapsed else 0:.0f} rounds/s")
+        return "\n".join(lines)
+
+
+class Bot:
+    """
+    A headless player speaking the same framed protocol as Network, driven by asyncio.
+
+    Bots poll with "get:<version>" like Network.sync. A round ends when the game's win and tie
+    counts go up; player 0 then resets the round, and player 1 waits to see the reset before its
+    next move, so that a reset can never wipe out a move of the next round. After the last round
+    the reset tells player 1 it may leave, and player 0 stays until the server closes the game.
+
+    ...
+
+    Attributes
+    ----------
+    index : int
+        the bot's number, also used in its name
+    report : LoadReport
+        where the bot records its latencies and errors
+    p : int
+        the player number the server assigned, None until connected
+    game : Game
+        the bot's copy of the game
+
+    Methods
+    -------
+    run():
+        Connects, plays all rounds and disconnects, recording errors instead of raising them.
+    """
+
+    def __init__(self, index, host, port, report, rounds=10, think_time=0.0, poll_interval=0.01,
+                 timeout=10.0, rng=None, connect_limit=None):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.report = report
+        self.rounds = rounds
+        self.think_time = think_time
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.rng = rng or random.Random(index)
+        self.connect_limit = connect_limit
+        self.reader = self.writer = None
+        self.p = None
+        self.game = None
+
+    async def request(self, kind, message):
+        """Sends one message, waits for the reply and applies it to the bot's game."""
+        start = time.perf_counter()
+        try:
+            self.writer.write(encode_frame(message.encode()))
+            frame = await asyncio.wait_for(read_frame(self.reader), self.timeout)
+            if frame is None:
+                raise EOFError("Connection closed by server")
+            self.game = apply_update(self.game, frame)
+        except Exception:
+            self.report.errors[kind] += 1
+            raise
+        self.report.latencies[kind].append(time.perf_counter() - start)
+        return self.game
+
+    async def connect(self):
+        """Connects and reads the player number, with at most connect_limit bots connecting at once."""
+        if self.connect_limit is None:
+            await self._connect()
+        else:
+            async with self.connect_limit:
+                await self._connect()
+
+    async def _connect(self):
+        start = time.perf_counter()
+        try:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            frame = await asyncio.wait_for(read_frame(self.reader), self.timeout)
+            if frame is None:
+                raise EOFError("Connection closed by server")
+            self.p = int(frame)
+        except Exception:
+            self.report.errors["connect"] += 1
+            raise
+        self.report.latencies["connect"].append(time.perf_counter() - start)
+
+    async def poll_until(self, condition):
+        """Polls the game until condition(game) is true, without polling if it already is."""
+        if self.game is not None and condition(self.game):
+            return self.game
+        version = -1 if self.game is None else self.game.version
+        while True:
+            game = await self.request("get", f"get:{version}")
+            if condition(game):
+                return game
+            version = game.version
+            await asyncio.sleep(self.poll_interval)
+
+    async def play(self):
+        await self.connect()
+        await self.request("name", f"name:bot{self.index}")
+        await self.poll_until(lambda game: game.connected())
+        for played in range(1, self.rounds + 1):
+            if self.think_time:
+                await asyncio.sleep(self.rng.uniform(0, self.think_time))
+            await self.request("move", self.rng.choice(list(Move)).label)
+            await self.poll_until(lambda game: game.wins[0] + game.wins[1] + game.ties >= played)
+            if self.p == 1:
+                self.report.rounds += 1
+            if self.p == 0:
+                await self.request("reset", "reset")
+            else:
+                await self.poll_until(lambda game: not game.p2Went)
+        if self.p == 0:
+            await self.wait_for_close()
+
+    async def wait_for_close(self):
+        """
+        Stays until the opponent has seen the last result and left, and the server closed the game.
+
+        The server only notices the game is gone when the bot next sends something, so the bot keeps
+        polling; these polls are not part of the report.
+        """
+        while True:
+            self.writer.write(encode_frame(b"get"))
+            frame = await asyncio.wait_for(read_frame(self.reader), self.timeout)
+            if frame is None or frame[0] == CLOSED:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self):
+        """
+        Connects, plays all rounds and disconnects, recording errors instead of raising them.
+        """
+        try:
+            await self.play()
+        except (OSError, EOFError, ProtocolError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+
+
+async def run_load(host, port, players=100, rounds=10, think_time=0.0, poll_interval=0.01,
+                   timeout=10.0, connect_concurrency=16, seed=0):
+    """
+    Runs a number of bots against a server and collects their latencies and errors.
+
+    Parameters
+    ----------
+    host : str
+        The server address.
+    port : int
+        The server port.
+    players : int
+        The number of bots. Bots are paired in the order they connect, so use an even number.
+    rounds : int
+        The number of rounds each pair plays.
+    think_time : float
+        The most seconds a bot waits before each move, chosen at random.
+    poll_interval : float
+        Seconds between polls while a bot waits for its opponent.
+    timeout : float
+        Seconds a bot waits for any reply before giving up.
+    connect_concurrency : int
+        The most connections being opened at once, so the server's accept backlog is not overrun.
+    seed : int
+        Seed for the bots' moves and think times.
+
+    Returns
+    -------
+    LoadReport
+        The latencies and errors of the run.
+    """
+    report = LoadReport()
+    limit = asyncio.Semaphore(connect_concurrency)
+    bots = [Bot(i, host, port, report, rounds, think_time, poll_interval, timeout,
+                random.Random(seed * 1000003 + i), limit) for i in range(players)]
+    start = time.perf_counter()
+    await asyncio.gather(*(bot.run() for bot in bots))
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _serve(mode, ports, metrics, socket_options):
+    sys.stdout = open(os.devnull, "w")
+    if mode == "asyncio":
+        from async_server import AsyncServer
+        server = AsyncServer("localhost", 0, metrics=metrics, socket_options=socket_options)
+    elif mode == "pool":
+        from pool_server import PoolServer
+        server = PoolServer("localhost", 0, metrics=metrics, socket_options=socket_options)
+    else:
+        from server import Server
+        server = Server("localhost", 0, metrics=metrics, socket_options=socket_options)
+    ports.put(server.port)
+    server.run_server()
+
+
+def spawn_server(mode="threaded", metrics=False, socket_options=None):
+    """
+    Starts a server on a free local port in a child process.
+
+    Parameters
+    ----------
+    mode : str
+        "threaded", "asyncio" or "pool".
+    metrics : bool
+        Whether the server records metrics.
+    socket_options : SocketOptions
+        The server's TCP options, default is SocketOptions().
+
+    Returns
+    -------
+    tuple
+        The process and the port it listens on. Terminate the process when done.
+    """
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(mode, ports, metrics, socket_options), daemon=True)
+    process.start()
+    return process, ports.get(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless load generator for the game server")
+    parser.add_argument("server_address", nargs="?", default="localhost", help="Server address (e.g., 'localhost')")
+    parser.add_argument("port_number", nargs="?", type=int, default=5555, help="Port number (e.g., 5555)")
+    parser.add_argument("--spawn", choices=["threaded", "asyncio", "pool"], default=None,
+                        help="Start a local server in a child process and load it instead")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Most seconds a bot waits before each move")
+    parser.add_argument("--poll-interval", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    process = None
+    host, port = args.server_address, args.port_number
+    if args.spawn:
+        process, port = spawn_server(args.spawn)
+        host = "localhost"
+    try:
+        report = asyncio.run(run_load(host, port, args.players, args.rounds, args.think_time,
+                                      args.poll_interval, args.timeout, seed=args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+    print(f"{args.players} players x {args.rounds} rounds against {host}:{port}")
+    print(report.format())
@@ -0,0 +1,229 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT = "rps"
+FORMATS = ("kv", "json")
+
+# Until setup_logging is called, e.g. when a server is embedded in tests or benchmarks, events
+# are discarded rather than falling through to logging's last-resort handler on stderr.
+logging.getLogger(ROOT).addHandler(logging.NullHandler())
+
+
+class EventLogger:
+    """
+    Logs structured events: a short event name plus key=value fields, e.g.
+    log.info("connected", peer=addr).
+
+    Fields are only turned into text by the background writer, so an event costs the caller a
+    level check and a queue put. Events below the logger's level cost only the level check.
+
+    ...
+
+    Attributes
+    ----------
+    logger : logging.Logger
+        the standard logger the events go through
+
+    Methods
+    -------
+    debug(event, **fields), info(event, **fields), warning(event, **fields), error(event, **fields):
+        Logs an event at that level.
+    exception(event, **fields):
+        Logs an error event with the traceback of the exception being handled.
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(f"{ROOT}.{name}")
+
+    def log(self, level, event, exc_info=False, **fields):
+        """Logs an event at the given level."""
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name):
+    """Returns the EventLogger for a module, e.g. get_logger("server")."""
+    return EventLogger(name)
+
+
+def _value(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Formats events as one line of key=value pairs: ts, level, logger, event, then the fields."""
+
+    def format(self, record):
+        parts = [
+            f"ts={record.created:.3f}",
+            f"level={record.levelname.lower()}",
+            f"logger={record.name}",
+            f"event={_value(record.getMessage())}",
+        ]
+        parts.extend(f"{key}={_value(value)}" for key, value in getattr(record, "fields", {}).items())
+        if record.exc_text:
+            parts.append(f"exc={_value(record.exc_text)}")
+        return " ".join(parts)
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats events as one JSON object per line, with the same keys as KeyValueFormatter."""
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname.lower(),
+                 "logger": record.name, "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most burst events with the same logger and event name per interval seconds,
+    for events at or above a level; the rest are dropped and counted.
+
+    The first event let through after some were dropped carries the count in a "suppressed" field,
+    so a flood of identical errors shows up as a few lines instead of stalling the writer.
+
+    ...
+
+    Attributes
+    ----------
+    burst : int
+        the most events of each kind let through per interval
+    interval : float
+        the length of a rate-limiting window, in seconds
+    level : int
+        events below this level are never limited
+    """
+
+    def __init__(self, burst=10, interval=1.0, level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.level = level
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                window = self.windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.fields = dict(getattr(record, "fields", {}), suppressed=suppressed)
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue for the background writer, dropping them when it is full
+    rather than blocking the caller.
+
+    Records are passed on unformatted, except that a traceback is rendered straight away, while
+    the frames it refers to are still alive.
+
+    ...
+
+    Attributes
+    ----------
+    dropped : int
+        the number of records dropped because the queue was full
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level="INFO", fmt="kv", stream=None, burst=10, interval=1.0, capacity=10000):
+    """
+    Sends the server's events to a stream through a queue drained by a background thread.
+
+    Parameters
+    ----------
+    level : str or int
+        The lowest level logged, e.g. "DEBUG" or "WARNING".
+    fmt : str
+        "kv" for key=value lines or "json" for one JSON object per line.
+    stream : file
+        Where to write events, default is standard error.
+    burst : int
+        The most warnings or errors of each kind written per interval; see RateLimitFilter.
+    interval : float
+        The rate-limiting window, in seconds.
+    capacity : int
+        The most events waiting to be written; further events are dropped until the writer catches up.
+
+    Returns
+    -------
+    QueueListener
+        The running background writer. It is stopped, writing out what is queued, at exit.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown log format {fmt!r}, expected one of {FORMATS}")
+    output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    output.setFormatter(JSONFormatter() if fmt == "json" else KeyValueFormatter())
+    handler = DroppingQueueHandler(queue.Queue(capacity))
+    handler.addFilter(RateLimitFilter(burst, interval))
+    root = logging.getLogger(ROOT)
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    listener = QueueListener(handler.queue, output)
+    listener.start()
+    atexit.register(_stop, listener)
+    return listener
+
+
+def _stop(listener):
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,310 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import compress
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it tallies are counted from strided memoryviews.
+    np = None
+
+# Every round is one fixed-width little-endian record: timestamp, game id, player 0 and player 1
+# name ids, player 0 and player 1 move codes, and the winner (0, 1 or -1 for a tie), padded to
+# 32 bytes so the columns stay aligned. Names are stored once each in a companion file, as a
+# length byte followed by the UTF-8 name, and are numbered in the order they were added.
+RECORD = struct.Struct("<dQIIBBb5x")
+NAME_SIZE = struct.Struct("<B")
+NO_NAME = 0xFFFFFFFF
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("timestamp", "<f8"), ("game_id", "<u8"), ("player0", "<u4"), ("player1", "<u4"),
+        ("move0", "u1"), ("move1", "u1"), ("winner", "i1"), ("padding", "V5"),
+    ])
+# Offsets of the columns read when rebuilding the leaderboard.
+PLAYER0_OFFSET = 16
+PLAYER1_OFFSET = 20
+WINNER_OFFSET = 26
+
+
+def names_path(path):
+    """Returns the path of the names file that goes with a match log."""
+    return path + ".names"
+
+
+def _read_names(path):
+    """Returns the names stored in a names file, and the size of the complete entries."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    names = []
+    offset = 0
+    while offset < len(data):
+        size = data[offset]
+        if offset + 1 + size > len(data):
+            break  # Torn by a crash in the middle of a write.
+        names.append(data[offset + 1:offset + 1 + size].decode())
+        offset += 1 + size
+    return names, offset
+
+
+class MatchLog:
+    """
+    An append-only log of every round played, for rebuilding scores after a restart.
+
+    Records are buffered and written to disk in batches; fsync is called at most once every
+    sync_interval seconds, or once sync_every records have been written since the last one, so
+    the cost of durability is shared by many rounds. A crash loses at most the rounds since the
+    last sync, and a record torn by a crash is cut off the next time the log is opened. A new
+    name is forced to disk as soon as it is added, before any record that refers to it can be.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        the path of the log file
+    ids : dict
+        the id of every name in the log, with the name as the key
+    sync_every : int
+        the most records written between two fsyncs
+    sync_interval : float
+        the most seconds between two fsyncs while records are being written
+
+    Methods
+    -------
+    append(game_id, names, moves, winner, timestamp=None):
+        Adds a round to the log.
+    sync():
+        Writes buffered records and forces them to disk.
+    close():
+        Syncs and closes the log.
+    """
+
+    def __init__(self, path, sync_every=4096, sync_interval=1.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        names, names_end = _read_names(names_path(path))
+        self.ids = {name: i for i, name in enumerate(names)}
+        # Unbuffered, so a new name reaches the OS before the records that use its id.
+        self.names_file = open(names_path(path), "ab", buffering=0)
+        self.names_file.truncate(names_end)
+        self.file = open(path, "ab")
+        self.file.truncate(self.file.tell() - self.file.tell() % RECORD.size)
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def _name_id(self, name):
+        if name is None:
+            return NO_NAME
+        name_id = self.ids.get(name)
+        if name_id is None:
+            raw = name.encode()
+            self.names_file.write(NAME_SIZE.pack(len(raw)) + raw)
+            os.fsync(self.names_file.fileno())
+            name_id = self.ids[name] = len(self.ids)
+        return name_id
+
+    def append(self, game_id, names, moves, winner, timestamp=None):
+        """
+        Adds a round to the log.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game the round was played in.
+        names : tuple
+            The names of player 0 and player 1, None for a player without a name.
+        moves : tuple
+            The move codes of player 0 and player 1.
+        winner : int
+            0 or 1 for the winning player, -1 for a tie.
+        timestamp : float
+            When the round ended, as from time.time(), default is now.
+        """
+        with self.lock:
+            self.file.write(RECORD.pack(
+                time.time() if timestamp is None else timestamp, game_id,
+                self._name_id(names[0]), self._name_id(names[1]), moves[0], moves[1], winner,
+            ))
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        """Writes buffered records and forces them to disk."""
+        with self.lock:
+            if self.unsynced:
+                self._sync()
+
+    def close(self):
+        """Syncs and closes the log."""
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+                self.file.close()
+                self.names_file.close()
+
+
+class MatchLogReader:
+    """
+    Reads a match log through a memory map, without turning every record into Python objects.
+
+    Rebuilding scores only looks at the player and winner columns, which are sliced straight out
+    of the mapped file and counted without building a tuple per record; with NumPy the whole scan
+    runs as array operations. Name ids missing from the names file, as a log written before names
+    were synced with it may have, are read as players without a name and counted in unknown_names.
+
+    ...
+
+    Attributes
+    ----------
+    names : list
+        the names in the log, indexed by name id
+    records : memoryview
+        the complete records in the log, RECORD.size bytes each
+    unknown_names : int
+        the number of name ids the last tally found in records but not in names
+
+    Methods
+    -------
+    tally(win=1, tie=0):
+        Returns the points of every named player.
+    """
+
+    def __init__(self, path):
+        self.names, _ = _read_names(names_path(path))
+        self.unknown_names = 0
+        self.map = None
+        self.records = memoryview(b"")
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            size -= size % RECORD.size
+            if size:
+                self.map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                self.records = memoryview(self.map)
+
+    def __len__(self):
+        return len(self.records) // RECORD.size
+
+    def __getitem__(self, index):
+        """
+        Returns a record as (timestamp, game id, player 0 name, player 1 name, player 0 move,
+        player 1 move, winner). Names are None for players without one.
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        timestamp, game_id, player0, player1, move0, move1, winner = RECORD.unpack_from(
+            self.records, (index % len(self)) * RECORD.size)
+        return timestamp, game_id, self._name(player0), self._name(player1), move0, move1, winner
+
+    def _name(self, name_id):
+        return self.names[name_id] if name_id < len(self.names) else None
+
+    def tally(self, win=1, tie=0):
+        """
+        Returns the points of every named player.
+
+        Parameters
+        ----------
+        win : int
+            Points for winning a round.
+        tie : int
+            Points for a tied round.
+
+        Returns
+        -------
+        dict
+            The total points of every named player that played a round, with the name as the key.
+        """
+        if not self.records:
+            return {}
+        if np is not None:
+            return self._tally_numpy(win, tie)
+        views = []
+        try:
+            if sys.byteorder == "little":
+                ids = self.records.cast("I")
+                step = RECORD.size // ids.itemsize
+                views = [ids, ids[PLAYER0_OFFSET // ids.itemsize::step], ids[PLAYER1_OFFSET // ids.itemsize::step]]
+                player0, player1 = views[1:]
+            else:
+                columns = list(zip(*RECORD.iter_unpack(self.records)))
+                player0, player1 = columns[2], columns[3]
+            views.append(self.records[WINNER_OFFSET::RECORD.size])
+            winners = bytes(views[-1])
+            # compress picks the players of the rounds whose selector byte is 1, all in C, so only
+            # the counting itself touches each selected record in Python.
+            wins = Counter(compress(player0, winners.translate(_SELECT_ZERO)))
+            wins.update(compress(player1, winners.translate(_SELECT_ONE)))
+            ties = Counter()
+            if tie:
+                tied = winners.translate(_SELECT_TIE)
+                ties.update(compress(player0, tied))
+                ties.update(compress(player1, tied))
+            player_ids = set(player0).union(player1)
+        finally:
+            # The map cannot be closed while views derived from it are alive.
+            for view in views:
+                view.release()
+        player_ids.discard(NO_NAME)
+        points = {}
+        self.unknown_names = 0
+        for name_id in player_ids:
+            if name_id < len(self.names):
+                points[self.names[name_id]] = win * wins[name_id] + tie * ties[name_id]
+            else:
+                self.unknown_names += 1
+        return points
+
+    def _tally_numpy(self, win, tie):
+        size = len(self.names)
+        points = np.zeros(size, dtype=np.int64)
+        played = np.zeros(size, dtype=bool)
+        unknown = set()
+        records = np.frombuffer(self.records, dtype=RECORD_DTYPE)
+        try:
+            for player, won in ((records["player0"], 0), (records["player1"], 1)):
+                named = player != NO_NAME
+                unknown.update(np.unique(player[named & (player >= size)]).tolist())
+                named &= player < size
+                player, winners = player[named], records["winner"][named]
+                played[player] = True
+                points += win * np.bincount(player[winners == won], minlength=size)
+                points += tie * np.bincount(player[winners == -1], minlength=size)
+        finally:
+            # Arrays viewing the map must go before it can be closed, even if a traceback keeps this frame.
+            records = player = None
+        self.unknown_names = len(unknown)
+        return {self.names[i]: int(points[i]) for i in np.flatnonzero(played)}
+
+    def close(self):
+        """Unmaps the log."""
+        self.records.release()
+        if self.map is not None:
+            self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Selectors for compress: the winner byte translates to 1 where the condition holds, 0 elsewhere.
+_SELECT_ZERO = bytes([1] + [0] * 255)
+_SELECT_ONE = bytes([0, 1] + [0] * 254)
+_SELECT_TIE = bytes([0] * 255 + [1])
@@ -0,0 +1,150 @@
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class Ticket:
+    """A player waiting in the queue for an opponent."""
+    __slots__ = ("game_id", "bucket", "joined", "active")
+
+    def __init__(self, game_id, bucket, joined):
+        self.game_id = game_id
+        self.bucket = bucket
+        self.joined = joined
+        self.active = True
+
+
+class Matchmaker:
+    """
+    Pairs arriving players into games.
+
+    Each skill bucket has a FIFO queue of players waiting for an opponent. A new arrival either
+    takes the oldest waiting player in its bucket and joins their game as player 1, or gets a new
+    game ID and waits as player 0. Players who leave or time out are only marked inactive and are
+    skipped when they reach the front of the queue, so every operation is O(1) amortized and
+    nothing is ever scanned.
+
+    Attributes
+    ----------
+    queues : defaultdict
+        a deque of waiting tickets for each bucket, oldest first
+    waiting : dict
+        the active ticket of each game waiting for an opponent, with the game ID as the key
+    ids : iterator
+        the generator game IDs are drawn from. IDs are never reused, so a handler still holding
+        the ID of a closed game can never pick up someone else's game.
+    wait_timeout : float
+        seconds a player may wait for an opponent before expire gives up on them, or None
+
+    Methods
+    -------
+    join(bucket=0, exclude=(), create=None):
+        Pairs a new player with a waiting one, or queues them.
+    cancel(game_id):
+        Removes the player waiting in a game from the queue.
+    expire(now=None):
+        Removes and returns the games whose player waited longer than wait_timeout.
+    """
+
+    def __init__(self, wait_timeout=None, ids=None):
+        self.queues = defaultdict(deque)
+        self.waiting = {}
+        self.ids = ids if ids is not None else itertools.count()
+        self.wait_timeout = wait_timeout
+        self.lock = threading.Lock()
+
+    def join(self, bucket=0, exclude=(), create=None):
+        """
+        Pairs a new player with a waiting one, or queues them.
+
+        Parameters
+        ----------
+        bucket : hashable
+            The skill bucket to match in. Players are only paired within the same bucket.
+        exclude : container
+            Games the player must not be paired into, e.g. the games a multi-room client is
+            already waiting in. Waiting players passed over for this keep their place in the queue.
+        create : callable
+            Called with the ID of a new game before the player is queued, while no one else can
+            join, so that nobody is paired into the game before it exists. If it raises, the
+            player is not queued.
+
+        Returns
+        -------
+        tuple
+            The game ID and the player number: 1 if the player joins a waiting player's game,
+            0 if a new game was started and the player is now waiting.
+        """
+        with self.lock:
+            queue = self.queues[bucket]
+            passed = []
+            try:
+                while queue:
+                    ticket = queue.popleft()
+                    if ticket.active and ticket.game_id in exclude:
+                        passed.append(ticket)
+                    elif ticket.active:
+                        ticket.active = False
+                        del self.waiting[ticket.game_id]
+                        return ticket.game_id, 1
+            finally:
+                queue.extendleft(reversed(passed))
+            game_id = next(self.ids)
+            if create is not None:
+                create(game_id)
+            ticket = Ticket(game_id, bucket, time.monotonic())
+            queue.append(ticket)
+            self.waiting[game_id] = ticket
+            return game_id, 0
+
+    def cancel(self, game_id):
+        """
+        Removes the player waiting in a game from the queue.
+
+        Parameters
+        ----------
+        game_id : int
+            The game of the waiting player.
+
+        Returns
+        -------
+        bool
+            True if the player was still waiting, False if they had already been paired or removed.
+        """
+        with self.lock:
+            ticket = self.waiting.pop(game_id, None)
+            if ticket is None:
+                return False
+            ticket.active = False
+            return True
+
+    def expire(self, now=None):
+        """
+        Removes and returns the games whose player waited longer than wait_timeout.
+
+        Queues are in arrival order, so only the expired tickets at the front are looked at.
+
+        Parameters
+        ----------
+        now : float
+            The current time.monotonic() value, default is to read the clock.
+
+        Returns
+        -------
+        list
+            The IDs of the games that timed out.
+        """
+        if self.wait_timeout is None:
+            return []
+        deadline = (time.monotonic() if now is None else now) - self.wait_timeout
+        expired = []
+        with self.lock:
+            for queue in self.queues.values():
+                while queue and (not queue[0].active or queue[0].joined <= deadline):
+                    ticket = queue.popleft()
+                    if ticket.active:
+                        ticket.active = False
+                        del self.waiting[ticket.game_id]
+                        expired.append(ticket.game_id)
+        return expired
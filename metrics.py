@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "rps_"
+
+
+class Histogram:
+    """
+    A latency histogram with power-of-two microsecond buckets.
+
+    Recording a value is an integer bit_length and a list increment, with no locking and no
+    allocation, so it can sit on the request path. Bucket i counts values from 2**(i-1) up to
+    2**i microseconds; percentiles are reported as the upper bound of their bucket, so they are
+    accurate to within a factor of two.
+
+    ...
+
+    Attributes
+    ----------
+    counts : list
+        the number of values in each bucket
+    count : int
+        the number of values recorded
+    total : float
+        the sum of the values recorded, in seconds
+
+    Methods
+    -------
+    record(seconds):
+        Adds a value.
+    percentile(q):
+        Returns the upper bound of the bucket holding the q-th quantile, in seconds.
+    """
+
+    BUCKETS = 32
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        """Adds a value, in seconds."""
+        bucket = int(seconds * 1e6).bit_length()
+        self.counts[bucket if bucket < self.BUCKETS else self.BUCKETS - 1] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q-th quantile (0 to 1), in seconds, or
+        None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return (1 << bucket) / 1e6
+        return (1 << (self.BUCKETS - 1)) / 1e6
+
+
+class Metrics:
+    """
+    Counters and latency histograms for a server, rendered as plain text.
+
+    Updates take no lock: the GIL keeps every update intact, and a count lost to two threads
+    updating the same counter at the same instant does not matter for monitoring. A server
+    without metrics has None instead of a Metrics object, so when they are off the request path
+    only pays for an `is None` check.
+
+    ...
+
+    Attributes
+    ----------
+    counters : defaultdict
+        the value of every counter, with its name as the key
+    histograms : defaultdict
+        the Histogram of every timed stage, with its name as the key
+
+    Methods
+    -------
+    increment(name, amount=1):
+        Adds to a counter.
+    observe(name, seconds):
+        Records a duration in a histogram.
+    snapshot():
+        Returns the counters and histograms as plain data.
+    add(snapshot):
+        Adds the counters and histograms of a snapshot taken elsewhere.
+    render(gauges=None):
+        Returns every metric as plain text.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+
+    def increment(self, name, amount=1):
+        """Adds to a counter."""
+        self.counters[name] += amount
+
+    def observe(self, name, seconds):
+        """Records a duration in a histogram."""
+        self.histograms[name].record(seconds)
+
+    def snapshot(self):
+        """
+        Returns the counters and histograms as plain data, so another process can add them to its own.
+
+        Returns
+        -------
+        dict
+            "counters" with the value of every counter, and "histograms" with [counts, count, total]
+            for every histogram.
+        """
+        return {"counters": dict(self.counters),
+                "histograms": {name: [list(histogram.counts), histogram.count, histogram.total]
+                               for name, histogram in self.histograms.items()}}
+
+    def add(self, snapshot):
+        """
+        Adds the counters and histograms of a snapshot taken elsewhere.
+
+        Parameters
+        ----------
+        snapshot : dict
+            What another Metrics object's snapshot returned.
+        """
+        for name, value in snapshot["counters"].items():
+            self.counters[name] += value
+        for name, (counts, count, total) in snapshot["histograms"].items():
+            histogram = self.histograms[name]
+            histogram.counts = [mine + theirs for mine, theirs in zip(histogram.counts, counts)]
+            histogram.count += count
+            histogram.total += total
+
+    def render(self, gauges=None):
+        """
+        Returns every metric as plain text, one "name value" line each.
+
+        Parameters
+        ----------
+        gauges : dict
+            Current values to include as they are, e.g. the number of open connections.
+
+        Returns
+        -------
+        str
+            The metrics. Counters end in _total; each histogram has _count, _sum and quantile lines.
+        """
+        lines = []
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"{PREFIX}{name} {value}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{PREFIX}{name}_total {value}")
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f"{PREFIX}{name}_seconds_count {histogram.count}")
+            lines.append(f"{PREFIX}{name}_seconds_sum {histogram.total:.6f}")
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'{PREFIX}{name}_seconds{{quantile="{q}"}} {histogram.percentile(q):.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(render, server="localhost", port=9100):
+    """
+    Serves metrics as plain text over HTTP from a background thread.
+
+    Parameters
+    ----------
+    render : callable
+        Returns the metrics text for each request.
+    server : str
+        The address to bind to.
+    port : int
+        The port to listen on. Port 0 picks a free port.
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        The running endpoint; its server_address holds the port actually bound.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    endpoint = ThreadingHTTPServer((server, port), Handler)
+    threading.Thread(target=endpoint.serve_forever, daemon=True).start()
+    return endpoint
+
+
+def dump_metrics(render, interval, out=None):
+    """
+    Prints metrics every interval seconds, forever. Runs on its own thread.
+
+    Parameters
+    ----------
+    render : callable
+        Returns the metrics text.
+    interval : float
+        Seconds between dumps.
+    out : file
+        Where to print, default is standard output.
+    """
+    while True:
+        time.sleep(interval)
+        print(render(), file=out, flush=True)
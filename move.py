@@ -1,7 +1,30 @@
 from enum import Enum
+from rules import CLASSIC
 class Move(Enum):
-    """Represents a move."""
+    """Represents a move of the classic game. Codes and outcomes come from rules.CLASSIC."""
     ROCK = 'R'
     PAPER = 'P'
     SCISSORS = 'S'
 
+    @classmethod
+    def parse(cls, text):
+        """Returns the move named by text, e.g. "Rock" or "ROCK". Raises KeyError for unknown moves."""
+        return cls[text.upper()]
+
+    @classmethod
+    def from_code(cls, code):
+        """Returns the move with the given wire code."""
+        return _MOVES[code - 1]
+
+    @property
+    def code(self):
+        """Small integer identifying the move on the wire. 0 is reserved for "no move"."""
+        return _CODES[self]
+
+    @property
+    def label(self):
+        """The move's display name, as shown on the client's buttons."""
+        return self.name.capitalize()
+
+_CODES = {move: CLASSIC.code(move.label) for move in Move}
+_MOVES = sorted(Move, key=_CODES.get)
@@ -1,5 +1,17 @@
+import queue
+import select
 import socket
-import pickle
+import threading
+import time
+from collections import deque
+from sockopts import SocketOptions
+from protocol import (DEFAULT_TOP, JOINED, LEADERBOARD, NOT_MODIFIED, OVERLOADED, ROOM, FrameBuffer, GameClosed,
+                      ProtocolError, ServerOverloaded, apply_update, decode_joined, decode_leaderboard, decode_room,
+                      encode_frame)
+
+# Seconds BackgroundNetwork goes without sending before it sends a keepalive, so that a server
+# with an idle timeout does not take a player waiting for their opponent for gone.
+KEEPALIVE = 10.0
 
 class Network:
     """
@@ -19,6 +31,12 @@ class Network:
         a tuple containing the server address and port number
     p : str
         a string received from the server upon connection
+    frames : FrameBuffer
+        the reusable receive buffer that splits the server's byte stream into messages
+    game : Game
+        the most recent game state received from the server, None until the first one arrives
+    closed_reason : str
+        why the server closed the game (see protocol.CLOSE_REASONS), None while it is open
 
     Methods
     -------
@@ -28,15 +46,45 @@ class Network:
         Connects to the server and returns the string received upon connection.
     send(data):
         Sends data to the server and returns the data received in response.
+    send_many(messages):
+        Sends several messages back to back and returns the responses in order.
     receive_data():
         Receives data from the server and returns it.
+    apply(frame):
+        Applies a game update from the server to the cached game.
+    sync():
+        Brings the cached game up to date, transferring only what changed.
+    post(data):
+        Sends data to the server without waiting for a response.
+    subscribe():
+        Asks the server to push game updates and returns the current game.
+    poll():
+        Returns the next pushed game update without blocking, or None if there is none.
+    top_scores(n):
+        Returns the n best players on the server's leaderboard.
     """
 
-    def __init__(self):
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server = "localhost"
-        self.port = 5555
+    def __init__(self, server="localhost", port=5555, socket_options=None):
+        """
+        Connects to a server.
+
+        Parameters
+        ----------
+        server : str
+            The server address, default is "localhost".
+        port : int
+            The port the server listens on, default is 5555.
+        socket_options : SocketOptions
+            TCP_NODELAY, keepalive and buffer sizes of the connection; default is SocketOptions(),
+            which turns Nagle's algorithm off.
+        """
+        self.client = (socket_options if socket_options is not None else SocketOptions()).socket()
+        self.server = server
+        self.port = port
         self.addr = (self.server, self.port)
+        self.frames = FrameBuffer()
+        self.game = None
+        self.closed_reason = None
         self.p = self.connect()
 
     def getP(self):
@@ -61,8 +109,11 @@ class Network:
         """
         try:
             self.client.connect(self.addr)
-            return self.client.recv(2048).decode()
-        except socket.error as e:
+            frame = self.frames.read_frame(self.client)
+            if frame == OVERLOADED:
+                raise ServerOverloaded("Server overloaded, connection refused")
+            return None if frame is None else str(frame, "utf-8")
+        except (socket.error, ProtocolError, ServerOverloaded) as e:
             print(f"Connection error: {e}")
             return None
 
@@ -85,17 +136,44 @@ class Network:
             The data received from the server in response, or None if there was a send error.
         """
         try:
-            self.client.send(str.encode(data))
+            self.client.sendall(encode_frame(str.encode(data)))
             return self.receive_data()
         except socket.error as e:
             print(f"Send error: {e}")
             return None
 
+    def send_many(self, messages):
+        """
+        Sends several messages back to back and returns the responses in order.
+
+        All requests are written in a single send before any response is read, so the round trips
+        overlap instead of being paid one after another. The server answers frames in the order it
+        receives them.
+
+        Parameters
+        ----------
+        messages : list of str
+            The messages to send to the server.
+
+        Returns
+        -------
+        list
+            The response to each message, or None if there was a send error.
+        """
+        try:
+            self.client.sendall(b"".join(encode_frame(str.encode(data)) for data in messages))
+            return [self.receive_data() for _ in messages]
+        except socket.error as e:
+            print(f"Send error: {e}")
+            return None
+
     def receive_data(self):
         """
         Receives data from the server and returns it.
 
-        This method attempts to receive data from the server and deserialize it using pickle.
+        This method reads exactly one length-prefixed frame from the server and applies the game update in it
+        (a full snapshot, a delta or a "not modified" marker) to the cached game.
+        Frames that arrived together with an earlier response stay buffered for the next call.
         If the receive and deserialization are successful, it returns the deserialized data.
         If an error occurs during this process, it prints the error and returns None.
 
@@ -109,7 +187,620 @@ class Network:
             The data received from the server, or None if there was a receive error.
         """
         try:
-            return pickle.loads(self.client.recv(2048*2))
-        except (pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError) as e:
+            frame = self.frames.read_frame(self.client)
+            if frame is None:
+                raise EOFError("Connection closed by server")
+            self.game = self.apply(frame)
+            return self.game
+        except (EOFError, ProtocolError, ServerOverloaded) as e:
+            print(f"Receive error: {e}")
+            return None
+
+    def apply(self, frame):
+        """
+        Applies a game update from the server to the cached game and returns it.
+
+        Raises
+        ------
+        GameClosed
+            If the server closed the game; the reason is kept in closed_reason.
+        """
+        try:
+            return apply_update(self.game, frame)
+        except GameClosed as e:
+            self.closed_reason = e.reason
+            raise
+
+    def sync(self):
+        """
+        Brings the cached game up to date, transferring only what changed.
+
+        This is the polling counterpart of subscribe. It sends "get:<version>" with the version of the
+        cached game; the server replies with a one-byte "not modified" marker when nothing changed, or
+        with just the changed fields, which are merged into the cached game.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Game
+            The up-to-date game, or None if there was an error.
+        """
+        version = -1 if self.game is None else self.game.version
+        return self.send(f"get:{version}")
+
+    def post(self, data):
+        """
+        Sends data to the server without waiting for a response.
+
+        Used once subscribed, when the server pushes the resulting game state instead of replying.
+
+        Parameters
+        ----------
+        data : str
+            The data to be sent to the server.
+        """
+        self.client.sendall(encode_frame(str.encode(data)))
+
+    def subscribe(self):
+        """
+        Asks the server to push game updates and returns the current game.
+
+        After subscribing, the server sends a new game snapshot only when the game changes, so the
+        client no longer needs to poll with "get". Pushed updates are collected with poll.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Game
+            The game state at the time of subscribing, or None if there was an error.
+        """
+        try:
+            self.post("subscribe")
+            return self.receive_data()
+        except socket.error as e:
+            print(f"Send error: {e}")
+            return None
+
+    def poll(self):
+        """
+        Returns the next pushed game update without blocking, or None if there is none.
+
+        Updates are returned one at a time in the order they were pushed, so intermediate states
+        such as both players having moved are never skipped.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        Game
+            The next game update, or None if no complete update has arrived yet.
+
+        Raises
+        ------
+        EOFError
+            If the server closed the connection.
+        """
+        frame = self.frames.next_frame()
+        while frame is None:
+            readable, _, _ = select.select([self.client], [], [], 0)
+            if not readable:
+                return None
+            if not self.frames.fill(self.client):
+                raise EOFError("Connection closed by server")
+            frame = self.frames.next_frame()
+        self.game = self.apply(frame)
+        return self.game
+
+    def top_scores(self, n=DEFAULT_TOP):
+        """
+        Returns the n best players on the server's leaderboard.
+
+        Players are only on the leaderboard once they have sent "name:<name>". Game updates pushed
+        while waiting for the reply are applied to the cached game as usual.
+
+        Parameters
+        ----------
+        n : int
+            The number of players to return, at most protocol.MAX_TOP.
+
+        Returns
+        -------
+        list
+            (name, score) tuples, highest score first, or None if there was an error.
+        """
+        try:
+            self.post(f"top:{n}")
+            while True:
+                frame = self.frames.read_frame(self.client)
+                if frame is None:
+                    raise EOFError("Connection closed by server")
+                if frame[0] == LEADERBOARD:
+                    return decode_leaderboard(frame)
+                self.game = self.apply(frame)
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
+            print(f"Receive error: {e}")
+            return None
+
+
+class BackgroundNetwork:
+    """
+    Runs a subscribed Network on a background I/O thread, so that the caller never waits on the server.
+
+    The thread owns the socket. Messages queued with post are sent as soon as they are queued,
+    and the updates the server pushes are applied as they arrive. The newest game is published
+    in the game attribute for the caller to read whenever it likes: every update replaces it
+    with a new Game rather than changing it, so reading it takes no lock. Rounds that finished
+    are also kept in order, since the reset that follows may replace them before the caller looks.
+    When nothing was sent for keepalive seconds, the thread sends "get:<version>", which the
+    server answers with a "not modified" marker.
+
+    ...
+
+    Attributes
+    ----------
+    network : Network
+        the connection, used only by the I/O thread once it is started
+    game : Game
+        the newest game state received from the server
+    rounds : queue.SimpleQueue
+        the games in which both players had moved, in the order they arrived
+    commands : queue.SimpleQueue
+        the messages waiting to be sent, None telling the thread to stop
+    keepalive : float
+        the most seconds the thread goes without sending anything, or None for no limit
+    error : str
+        why the connection ended, None while it is open
+    thread : threading.Thread
+        the I/O thread
+
+    Methods
+    -------
+    start():
+        Subscribes to the game, starts the I/O thread and returns the current game.
+    post(data):
+        Queues a message to be sent straight away, without waiting for a response.
+    next_round():
+        Returns the next finished round, or None if there is none.
+    close():
+        Stops the I/O thread and closes the connection.
+    """
+
+    def __init__(self, network, keepalive=KEEPALIVE):
+        self.network = network
+        self.keepalive = keepalive
+        self.game = None
+        self.rounds = queue.SimpleQueue()
+        self.commands = queue.SimpleQueue()
+        self.error = None
+        self.thread = None
+        # Writing a byte to the waker wakes the thread up from select to send what was queued.
+        self.waker, self.wakeup = socket.socketpair()
+        self.waker.setblocking(False)
+
+    def start(self):
+        """
+        Subscribes to the game, then starts the I/O thread.
+
+        Returns
+        -------
+        Game
+            The game state at the time of subscribing, or None if there was an error.
+        """
+        self.game = self.network.subscribe()
+        if self.game is None:
+            return None
+        self.thread = threading.Thread(target=self.run, name="rps-network", daemon=True)
+        self.thread.start()
+        return self.game
+
+    def post(self, data):
+        """
+        Queues a message, e.g. a move, for the I/O thread to send straight away.
+
+        Parameters
+        ----------
+        data : str
+            The message to send to the server.
+        """
+        self.commands.put(data)
+        self.wake()
+
+    def wake(self):
+        try:
+            self.waker.send(b"\0")
+        except OSError:
+            pass  # Stopped already, or plenty of wakeups are pending.
+
+    def next_round(self):
+        """Returns the next game in which both players had moved, or None if there is none."""
+        try:
+            return self.rounds.get_nowait()
+        except queue.Empty:
+            return None
+
+    def publish(self, game):
+        """Makes a game the newest state, keeping it in rounds if both players had moved."""
+        if game is self.game:
+            return  # A keepalive.
+        if game.bothWent():
+            self.rounds.put(game)
+        self.game = game
+
+    def receive(self):
+        """Applies every pushed update that can be read without blocking."""
+        update = self.network.poll()
+        while update is not None:
+            self.publish(update)
+            update = self.network.poll()
+
+    def run(self):
+        """
+        Sends the queued messages and applies the pushed updates until the connection ends or
+        close is called. Runs on the I/O thread.
+        """
+        network = self.network
+        sent = time.monotonic()
+        try:
+            # Updates that arrived together with the reply to subscribe are already in the receive
+            # buffer, where select cannot see them.
+            self.receive()
+            while True:
+                timeout = None if self.keepalive is None else max(0.0, sent + self.keepalive - time.monotonic())
+                readable, _, _ = select.select([network.client, self.wakeup], [], [], timeout)
+                if not readable:
+                    network.post(f"get:{self.game.version}")
+                    sent = time.monotonic()
+                if self.wakeup in readable:
+                    self.wakeup.recv(4096)
+                    while True:
+                        try:
+                            data = self.commands.get_nowait()
+                        except queue.Empty:
+                            break
+                        if data is None:
+                            return
+                        network.post(data)
+                        sent = time.monotonic()
+                if network.client in readable:
+                    self.receive()
+        except GameClosed:
+            self.error = f"Game closed by server: {network.closed_reason}"
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
+            self.error = str(e) or type(e).__name__
+
+    def close(self):
+        """Stops the I/O thread and closes the connection."""
+        self.commands.put(None)
+        self.wake()
+        if self.thread is not None:
+            self.thread.join(1)
+        self.network.client.close()
+        self.waker.close()
+        self.wakeup.close()
+
+
+class RoomNetwork:
+    """
+    A connection to a server that plays in and watches many games at once, instead of one
+    connection per game.
+
+    On connecting, the server seats the client in a game as usual; the client then switches the
+    connection to multi-room (see Server.open_rooms), keeping that game as its first. Every
+    update the server sends is tagged with its game, and is applied to that game's cached state.
+    Updates for other games that arrive while waiting for a reply are kept for poll.
+
+    ...
+
+    Attributes
+    ----------
+    client : socket
+        the socket connected to the server
+    addr : tuple
+        the server address and port number
+    frames : FrameBuffer
+        the reusable receive buffer that splits the server's byte stream into messages
+    games : dict
+        the latest state of every open game, with the game ID as the key; None until the first update
+    seats : dict
+        the client's player number in every game it plays in, with the game ID as the key
+    closed : dict
+        why the server closed each game the client was in (see protocol.CLOSE_REASONS)
+    pushed : deque
+        (game ID, game) updates received while waiting for a reply, not yet returned by poll
+
+    Methods
+    -------
+    join():
+        Takes a seat in another game and returns its ID and the player number.
+    send(game_id, data):
+        Sends a message for one game and returns the game's state in response.
+    post(game_id, data):
+        Sends a message for one game without waiting for a response.
+    sync(game_id):
+        Brings one game's cached state up to date, transferring only what changed.
+    subscribe(game_id):
+        Asks the server to push one game's updates and returns its current state.
+    watch(game_id):
+        Starts watching a game without playing in it and returns its current state.
+    leave(game_id):
+        Gives up the seat in a game, closing it, or stops watching it.
+    poll():
+        Returns the next pushed update without blocking, or None if there is none.
+    top_scores(n):
+        Returns the n best players on the server's leaderboard.
+    """
+
+    def __init__(self, server="localhost", port=5555, socket_options=None):
+        self.client = (socket_options if socket_options is not None else SocketOptions()).socket()
+        self.addr = (server, port)
+        self.frames = FrameBuffer()
+        self.games = {}
+        self.seats = {}
+        self.closed = {}
+        self.pushed = deque()
+        self.connect()
+
+    def connect(self):
+        """
+        Connects to the server and switches the connection to multi-room.
+
+        Returns
+        -------
+        int
+            The ID of the client's first game, or None if there was a connection error.
+        """
+        try:
+            self.client.connect(self.addr)
+            frame = self.read_frame()
+            if frame == OVERLOADED:
+                raise ServerOverloaded("Server overloaded, connection refused")
+            self.client.sendall(encode_frame(b"rooms"))
+            return self.wait_for(JOINED)[0]
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
+            print(f"Connection error: {e}")
+            return None
+
+    def read_frame(self):
+        """Reads the next frame from the server, waiting for it if need be."""
+        frame = self.frames.read_frame(self.client)
+        if frame is None:
+            raise EOFError("Connection closed by server")
+        return frame
+
+    def apply(self, frame):
+        """
+        Applies a tagged game update to the cached state of its game.
+
+        Parameters
+        ----------
+        frame : bytes
+            A frame from the server that is not the reply to join or top_scores.
+
+        Returns
+        -------
+        tuple
+            The game ID and the up-to-date game, or None for a game the server closed; or None
+            if the frame was a keepalive.
+        """
+        if frame == NOT_MODIFIED:
+            return None
+        if frame == OVERLOADED:
+            raise ServerOverloaded("Server overloaded, request dropped")
+        if frame[0] != ROOM:
+            raise ProtocolError(f"Unexpected reply type {frame[0]} on a multi-room connection")
+        game_id, update = decode_room(frame)
+        try:
+            game = self.games[game_id] = apply_update(self.games.get(game_id), update)
+        except GameClosed as e:
+            self.games.pop(game_id, None)
+            self.seats.pop(game_id, None)
+            self.closed[game_id] = e.reason
+            game = None
+        return game_id, game
+
+    def wait_for(self, tag):
+        """
+        Reads frames until one with the given tag arrives, applying and keeping the updates before it.
+
+        Parameters
+        ----------
+        tag : int
+            protocol.JOINED or protocol.LEADERBOARD.
+
+        Returns
+        -------
+        object
+            The decoded frame: (game ID, player number) for JOINED, (name, score) tuples for LEADERBOARD.
+        """
+        while True:
+            frame = self.read_frame()
+            if frame[0] == tag:
+                break
+            update = self.apply(frame)
+            if update is not None:
+                self.pushed.append(update)
+        if tag == LEADERBOARD:
+            return decode_leaderboard(frame)
+        game_id, p = decode_joined(frame)
+        self.games[game_id] = None
+        self.seats[game_id] = p
+        return game_id, p
+
+    def request(self, data, game_id):
+        """
+        Sends a message and returns the first update for game_id that arrives after it.
+
+        Parameters
+        ----------
+        data : str
+            The message, tagged with the game ID if it is for a single game.
+        game_id : int
+            The unique ID of the game the reply is about.
+
+        Returns
+        -------
+        Game
+            The game's state, or None if it was closed or there was an error.
+        """
+        try:
+            self.client.sendall(encode_frame(str.encode(data)))
+            while True:
+                update = self.apply(self.read_frame())
+                if update is None:
+                    continue
+                if update[0] == game_id:
+                    return update[1]
+                self.pushed.append(update)
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
+            print(f"Receive error: {e}")
+            return None
+
+    def join(self):
+        """
+        Takes a seat in another game, through the matchmaker like a new connection would.
+
+        Returns
+        -------
+        tuple
+            The game ID and the player number (0 or 1), or None if there was an error.
+        """
+        try:
+            self.client.sendall(encode_frame(b"join"))
+            return self.wait_for(JOINED)
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
+            print(f"Receive error: {e}")
+            return None
+
+    def send(self, game_id, data):
+        """
+        Sends a message for one game, e.g. a move, and returns the game's state in response.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+        data : str
+            Any message a single-game client could send, e.g. "Rock" or "get".
+
+        Returns
+        -------
+        Game
+            The game's state, or None if it was closed or there was an error.
+        """
+        return self.request(f"@{game_id}:{data}", game_id)
+
+    def post(self, game_id, data):
+        """
+        Sends a message for one game without waiting for a response, e.g. a move in a
+        subscribed game, whose result is pushed.
+        """
+        self.client.sendall(encode_frame(str.encode(f"@{game_id}:{data}")))
+
+    def sync(self, game_id):
+        """
+        Brings one game's cached state up to date with "get:<version>", transferring only what changed.
+
+        Returns
+        -------
+        Game
+            The up-to-date game, or None if it was closed or there was an error.
+        """
+        game = self.games.get(game_id)
+        return self.send(game_id, f"get:{-1 if game is None else game.version}")
+
+    def subscribe(self, game_id):
+        """
+        Asks the server to push one game's updates, collected with poll, and returns its current state.
+        """
+        return self.send(game_id, "subscribe")
+
+    def watch(self, game_id):
+        """
+        Starts watching a game without playing in it. Its updates are pushed, and collected with poll.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        Game
+            The game's current state, or None if there is no such game or there was an error.
+        """
+        return self.request(f"watch:{game_id}", game_id)
+
+    def leave(self, game_id):
+        """
+        Gives up the seat in a game, which closes it for the opponent, or stops watching it.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        None
+        """
+        self.closed.pop(game_id, None)
+        try:
+            self.client.sendall(encode_frame(str.encode(f"leave:{game_id}")))
+            while game_id not in self.closed:
+                update = self.apply(self.read_frame())
+                if update is not None and update[0] != game_id:
+                    self.pushed.append(update)
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
+            print(f"Receive error: {e}")
+
+    def poll(self):
+        """
+        Returns the next pushed update without blocking, or None if there is none.
+
+        Updates are returned one at a time in the order they arrived, including those that arrived
+        while waiting for a reply.
+
+        Returns
+        -------
+        tuple
+            The game ID and the game's new state, or None as the state of a game the server
+            closed; or None if no complete update has arrived yet.
+
+        Raises
+        ------
+        EOFError
+            If the server closed the connection.
+        """
+        while not self.pushed:
+            frame = self.frames.next_frame()
+            while frame is None:
+                readable, _, _ = select.select([self.client], [], [], 0)
+                if not readable:
+                    return None
+                if not self.frames.fill(self.client):
+                    raise EOFError("Connection closed by server")
+                frame = self.frames.next_frame()
+            update = self.apply(frame)
+            if update is not None:
+                self.pushed.append(update)
+        return self.pushed.popleft()
+
+    def top_scores(self, n=DEFAULT_TOP):
+        """
+        Returns the n best players on the server's leaderboard, as (name, score) tuples, highest
+        score first, or None if there was an error.
+        """
+        try:
+            self.client.sendall(encode_frame(str.encode(f"top:{n}")))
+            return self.wait_for(LEADERBOARD)
+        except (socket.error, EOFError, ProtocolError, ServerOverloaded) as e:
             print(f"Receive error: {e}")
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,425 @@
+import select
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from _thread import start_new_thread
+from server import Server
+from protocol import HEADER, OVERLOADED, FrameBuffer, encode_frame
+from channels import SocketChannel
+from logs import get_logger
+
+log = get_logger("pool")
+
+REJECTED = encode_frame(OVERLOADED)
+
+
+class EpollPoller:
+    """
+    Watches the listening socket and the client connections with epoll.
+
+    Connections are registered one-shot: one is reported once when it becomes readable, and then
+    not again until it is re-armed, which epoll allows from any thread.
+
+    Methods
+    -------
+    listen(sock):
+        Watches the listening socket, every time it has connections waiting.
+    add(conn):
+        Watches a new connection until it becomes readable.
+    arm(conn):
+        Watches a connection again once a worker is done with it.
+    remove(conn):
+        Stops watching a connection.
+    poll():
+        Waits for readable sockets and returns their file descriptors.
+    """
+
+    def __init__(self):
+        self.epoll = select.epoll()
+
+    def listen(self, sock):
+        """Watches the listening socket, every time it has connections waiting."""
+        self.epoll.register(sock, select.EPOLLIN)
+
+    def add(self, conn):
+        """Watches a new connection until it becomes readable."""
+        self.epoll.register(conn, select.EPOLLIN | select.EPOLLONESHOT)
+
+    def arm(self, conn):
+        """Watches a connection again once a worker is done with it."""
+        self.epoll.modify(conn, select.EPOLLIN | select.EPOLLONESHOT)
+
+    def remove(self, conn):
+        """Stops watching a connection."""
+        self.epoll.unregister(conn)
+
+    def poll(self):
+        """Waits for readable sockets and returns their file descriptors."""
+        return [fd for fd, _ in self.epoll.poll()]
+
+
+class SelectorPoller:
+    """
+    Watches the listening socket and the client connections with the platform's default selector,
+    where there is no epoll.
+
+    Selectors have no one-shot mode, so a connection is unregistered when it is reported and
+    registered again when it is re-armed. Re-arming also wakes the polling thread through a
+    socket pair, since not every selector notices a socket registered while it is waiting.
+    The methods are those of EpollPoller.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.wakeup, self.waker = socket.socketpair()
+        self.waker.setblocking(False)
+        self.selector.register(self.wakeup, selectors.EVENT_READ)
+        self.listener = None
+
+    def listen(self, sock):
+        self.listener = sock.fileno()
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def add(self, conn):
+        with self.lock:
+            self.selector.register(conn, selectors.EVENT_READ)
+
+    def arm(self, conn):
+        self.add(conn)
+        try:
+            self.waker.send(b"\0")
+        except BlockingIOError:
+            pass  # The socket is full of wakeups already.
+
+    def remove(self, conn):
+        with self.lock:
+            try:
+                self.selector.unregister(conn)
+            except KeyError:
+                pass  # A worker is serving it, so it is not registered.
+
+    def poll(self):
+        ready = []
+        for key, _ in self.selector.select():
+            if key.fileobj is self.wakeup:
+                self.wakeup.recv(4096)
+            elif key.fd == self.listener:
+                ready.append(key.fd)
+            else:
+                with self.lock:
+                    try:
+                        self.selector.unregister(key.fd)
+                    except KeyError:
+                        continue  # Removed since the selector reported it.
+                ready.append(key.fd)
+        return ready
+
+
+Poller = EpollPoller if hasattr(select, "epoll") else SelectorPoller
+
+
+class Connection:
+    """A client connection served by the worker pool."""
+    __slots__ = ("conn", "channel", "frames", "game_id", "p", "idle")
+
+    def __init__(self, conn, channel, game_id, p, idle):
+        self.conn = conn
+        self.channel = channel
+        self.frames = FrameBuffer()
+        self.game_id = game_id
+        self.p = p
+        self.idle = idle
+
+
+class PoolServer(Server):
+    """
+    A server that watches every client connection from one polling thread and hands the ones with
+    requests waiting to a fixed pool of worker threads.
+
+    It shares game management with the threaded Server (add_player, handle_message, cleanup_game), but
+    instead of one thread per connection, threads are only busy while a request is being handled.
+    Connections are registered one-shot, so epoll reports a readable connection once and then
+    ignores it while a worker serves it; its requests are still handled one at a time and in
+    order. The worker re-arms the connection itself when it is done, which epoll allows from any
+    thread, so handing a connection back costs no wakeup of the polling thread. Without epoll, a
+    selector does the same at the cost of a wakeup per re-arm (see SelectorPoller).
+
+    Workers never wait for a client: replies are queued behind the client's pushed updates and
+    sent by the fanout thread when the socket is full, and a client that lets push_queue of them
+    pile up is disconnected. A client that stops reading therefore cannot tie up a worker.
+
+    The pool is bounded: at most queue_size connections may wait for a free worker. When the
+    queue is full, the polling thread answers the waiting requests itself with an "overloaded"
+    reply and drops them, and connections beyond max_connections are sent the same reply and
+    closed, so a flood of clients is turned away instead of piling up memory and threads.
+
+    ...
+
+    Attributes
+    ----------
+    workers : int
+        the number of worker threads
+    queue_size : int
+        the most connections waiting for a free worker
+    max_connections : int
+        the most open client connections
+    poller : EpollPoller or SelectorPoller
+        watches the listening socket and the client connections no worker is serving
+    pool : ThreadPoolExecutor
+        the worker threads
+    slots : threading.BoundedSemaphore
+        one slot for every connection a worker is serving or that is queued for one
+    clients : dict
+        every open connection, with its file descriptor as the key
+
+    Methods
+    -------
+    accept():
+        Accepts every pending connection, or turns it away if there are too many.
+    dispatch(connection):
+        Queues a connection with requests waiting for a worker, or rejects the requests.
+    reject(connection):
+        Answers every request waiting on a connection with an "overloaded" reply.
+    serve_ready(connection):
+        Handles the requests waiting on a connection. Runs on a worker.
+    run_server():
+        Runs the polling loop.
+    """
+
+    def __init__(self, server="localhost", port=5555, workers=32, queue_size=1024, max_connections=10000,
+                 **kwargs):
+        """
+        Constructs the server and its worker pool.
+
+        Parameters
+        ----------
+        server : str
+            The address to bind to.
+        port : int
+            The port to listen on. Port 0 picks a free port.
+        workers : int
+            The number of worker threads.
+        queue_size : int
+            The most connections with requests waiting for a free worker before further requests
+            are rejected.
+        max_connections : int
+            The most open client connections before new ones are rejected.
+        **kwargs
+            Passed on to Server, e.g. wait_timeout or idle_timeout.
+
+        Raises
+        ------
+        ValueError
+            If the fanout thread is turned off or the platform has no non-blocking sends
+            (socket.MSG_DONTWAIT), as workers could then be held up by clients that stop reading.
+        """
+        if not kwargs.get("fanout", True) or not hasattr(socket, "MSG_DONTWAIT"):
+            raise ValueError("Pool mode needs the fanout thread and socket.MSG_DONTWAIT to reply without "
+                             "blocking; use the threaded or asyncio mode on this platform")
+        super().__init__(server, port, **kwargs)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.poller = Poller()
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="rps-worker")
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.clients = {}
+
+    def accept(self):
+        """
+        Accepts every pending connection, or turns it away if there are too many.
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            try:
+                conn, addr = self.s.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(True)
+            self.socket_options.apply(conn)
+            if len(self.clients) >= self.max_connections:
+                log.warning("connection_rejected", peer=addr, connections=len(self.clients))
+                if self.metrics is not None:
+                    self.metrics.increment("connections_rejected")
+                try:
+                    conn.send(REJECTED, socket.MSG_DONTWAIT)
+                except OSError:
+                    pass
+                conn.close()
+                continue
+            log.info("connected", peer=addr)
+            game_id, p = self.add_player()
+            channel = SocketChannel(conn, self.metrics, self.fanout)
+            connection = Connection(conn, channel, game_id, p, self.open_channel(channel, game_id, p))
+            self.clients[conn.fileno()] = connection
+            self.poller.add(conn)
+            try:
+                channel.send(str.encode(str(p)))
+            except OSError:
+                self.close_connection(connection)
+
+    def dispatch(self, connection):
+        """
+        Queues a connection with requests waiting for a worker, or rejects the requests if the
+        queue is full.
+
+        Parameters
+        ----------
+        connection : Connection
+            The connection epoll found readable.
+
+        Returns
+        -------
+        None
+        """
+        if not self.slots.acquire(blocking=False):
+            self.reject(connection)
+            return
+        self.pool.submit(self.serve_ready, connection)
+
+    def reject(self, connection):
+        """
+        Answers every request waiting on a connection with an "overloaded" reply, without handling it.
+
+        Runs on the polling thread, so it never blocks: the connection is known to be readable,
+        the replies are not sent while another thread is sending to the client or updates are
+        queued for it, and a client whose replies do not fit in its socket's send buffer is
+        disconnected.
+
+        Parameters
+        ----------
+        connection : Connection
+            The connection epoll found readable.
+
+        Returns
+        -------
+        None
+        """
+        rejected = 0
+        try:
+            if not connection.frames.fill(connection.conn):
+                self.close_connection(connection)
+                return
+            while connection.frames.next_frame() is not None:
+                rejected += 1
+            if rejected:
+                log.warning("requests_rejected", game=connection.game_id, player=connection.p, count=rejected)
+                if self.metrics is not None:
+                    self.metrics.increment("requests_rejected", rejected)
+            if rejected and not connection.channel.pending and connection.channel.lock.acquire(blocking=False):
+                try:
+                    replies = REJECTED * rejected
+                    if connection.conn.send(replies, socket.MSG_DONTWAIT) < len(replies):
+                        connection.channel.hangup()  # A cut-off reply would garble the stream.
+                finally:
+                    connection.channel.lock.release()
+        except BlockingIOError:
+            connection.channel.hangup()
+        except Exception as e:
+            log.warning("client_error", game=connection.game_id, player=connection.p, error=e)
+            self.close_connection(connection)
+            return
+        self.poller.arm(connection.conn)
+
+    def serve_ready(self, connection):
+        """
+        Handles the requests waiting on a connection, then re-arms it so epoll reports the next
+        ones. Runs on a worker.
+
+        Parameters
+        ----------
+        connection : Connection
+            The connection with requests waiting.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            alive = self.handle_requests(connection)
+        except Exception as e:
+            log.warning("client_error", game=connection.game_id, player=connection.p, error=e)
+            alive = False
+        finally:
+            self.slots.release()
+        if not alive:
+            self.close_connection(connection)
+            return
+        self.poller.arm(connection.conn)
+
+    def handle_requests(self, connection):
+        """
+        Reads what the client sent and replies to every complete request, like Server.threaded_client,
+        except that replies are queued rather than waited for.
+
+        Returns
+        -------
+        bool
+            False if the client disconnected, its game is gone, or it is too far behind to queue a reply.
+        """
+        metrics = self.metrics
+        frames = connection.frames
+        if not frames.fill(connection.conn):
+            return False
+        while True:
+            frame = frames.next_frame()
+            if frame is None:
+                return True
+            if connection.channel.rooms is None and connection.game_id not in self.games:
+                return False
+            if connection.idle is not None:
+                self.timers.touch(connection.idle, self.idle_timeout)
+            if metrics is not None:
+                received = time.perf_counter()
+                metrics.increment("messages_in")
+                metrics.increment("bytes_in", HEADER.size + len(frame))
+            payload = self.handle_message(connection.channel, connection.game_id, connection.p, str(frame, "utf-8"))
+            if metrics is not None:
+                handled = time.perf_counter()
+                metrics.observe("handle", handled - received)
+            if payload is not None:
+                if not connection.channel.push_frame(encode_frame(payload), None):
+                    log.warning("slow_client", game=connection.game_id, player=connection.p)
+                    return False
+                if metrics is not None:
+                    metrics.observe("send", time.perf_counter() - handled)
+
+    def close_connection(self, connection):
+        """Stops the connection's timers, forgets it and cleans up its game."""
+        if connection.idle is not None:
+            connection.idle.cancel()
+        self.clients.pop(connection.conn.fileno(), None)
+        self.poller.remove(connection.conn)
+        self.cleanup_game(connection.channel, connection.game_id, connection.p)
+
+    def run_server(self):
+        """
+        Runs the polling loop: accepts connections and dispatches the readable ones to the workers.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        if self.matchmaker.wait_timeout is not None:
+            start_new_thread(self.reap_waiting, ())
+        if self.uses_timers():
+            start_new_thread(self.timers.run, ())
+        self.s.setblocking(False)
+        listener = self.s.fileno()
+        self.poller.listen(self.s)
+        while True:
+            for fd in self.poller.poll():
+                if fd == listener:
+                    self.accept()
+                else:
+                    self.dispatch(self.clients[fd])
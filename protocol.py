@@ -0,0 +1,619 @@
+import struct
+from game import Game
+from rules import VARIANTS
+
+# Every message on the wire is a 4-byte big-endian payload length followed by the payload.
+HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 1 << 20
+
+# Game snapshot: format version, flags, game id, state version, player 0 move, player 1 move,
+# wins[0], wins[1], ties, variant. Moves are codes of the game's RuleSet, with 0 meaning the
+# player has not picked a move yet; the variant is the index of the RuleSet in RULES.
+SNAPSHOT_VERSION = 3
+SNAPSHOT = struct.Struct("!BBIIBBIIIB")
+RULES = tuple(VARIANTS.values())
+_RULES_IDS = {rules: index for index, rules in enumerate(RULES)}
+P1_WENT = 0x01
+P2_WENT = 0x02
+READY = 0x04
+
+# Replies to "get:<version>" when the client already has that version, or an older one the
+# server still remembers: a one-byte "not modified" marker, or a delta of the changed fields.
+NOT_MODIFIED = b"\x80"
+DELTA = 0x81
+DELTA_HEADER = struct.Struct("!BIB")
+# The fields a delta can carry, as (index into game_fields, struct format). The game id and
+# variant never change and the new state version is always in the header.
+DELTA_FIELDS = ((0, "B"), (3, "B"), (4, "B"), (5, "I"), (6, "I"), (7, "I"))
+_delta_structs = {}
+
+# Reply to "top:<n>": a tag and the number of entries, then for each player their score and
+# their UTF-8 name prefixed by its length. Names are at most MAX_NAME_SIZE bytes, and a reply
+# holds at most MAX_TOP entries; "top" without a valid n gets DEFAULT_TOP.
+LEADERBOARD = 0x82
+LEADERBOARD_HEADER = struct.Struct("!BH")
+LEADERBOARD_ENTRY = struct.Struct("!IB")
+MAX_NAME_SIZE = 64
+MAX_TOP = 100
+DEFAULT_TOP = 10
+
+# Sent to a player just before the server disconnects them because their game was closed: a tag
+# and the index of the reason in CLOSE_REASONS.
+CLOSED = 0x83
+CLOSED_FORMAT = struct.Struct("!BB")
+CLOSE_REASONS = ("left", "idle", "move_timeout", "wait_timeout")
+
+# Sent instead of a reply, or instead of the player number on connecting, when the server is too
+# busy to serve the request. The request was dropped and may be retried later.
+OVERLOADED = b"\x84"
+
+# On a multi-room connection (see Server.open_rooms), every game update is wrapped in a ROOM frame:
+# a tag and the ID of the game it belongs to, then the update itself. Taking a seat in a game is
+# answered with a JOINED frame: a tag, the game ID and the player number.
+ROOM = 0x85
+ROOM_HEADER = struct.Struct("!BI")
+MAX_GAME_ID = 2 ** 32 - 1
+JOINED = 0x86
+JOINED_FORMAT = struct.Struct("!BIB")
+
+class ProtocolError(Exception):
+    """Raised when the peer sends a frame that violates the wire protocol."""
+
+
+class ServerOverloaded(Exception):
+    """Raised when the server turned a request or connection away because it is too busy."""
+
+
+class GameClosed(EOFError):
+    """
+    Raised when the server says it closed the game, with the reason it gave.
+
+    ...
+
+    Attributes
+    ----------
+    reason : str
+        one of CLOSE_REASONS: the opponent "left", a player was "idle" too long, a player took
+        too long to move ("move_timeout"), or nobody joined in time ("wait_timeout")
+    """
+
+    def __init__(self, reason):
+        super().__init__(f"Game closed by server: {reason}")
+        self.reason = reason
+
+
+def encode_frame(payload):
+    """
+    Prefixes a payload with its length header.
+
+    Parameters
+    ----------
+    payload : bytes
+        The message to frame.
+
+    Returns
+    -------
+    bytes
+        The framed message, ready to be written to a socket.
+    """
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {len(payload)} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return HEADER.pack(len(payload)) + payload
+
+
+def send_frame(sock, payload):
+    """
+    Sends a single framed message over a blocking socket.
+
+    Parameters
+    ----------
+    sock : socket
+        The socket to send on.
+    payload : bytes
+        The message to send.
+    """
+    sock.sendall(encode_frame(payload))
+
+
+async def read_frame(reader):
+    """
+    Reads a single framed message from an asyncio stream.
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+        The stream to read from. Its internal buffer holds any frames that arrived early.
+
+    Returns
+    -------
+    bytes
+        The payload of the frame, or None if the peer closed the connection.
+    """
+    try:
+        (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+        if size > MAX_FRAME_SIZE:
+            raise ProtocolError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+        return await reader.readexactly(size)
+    except EOFError:
+        # asyncio.IncompleteReadError, caught by its base class so that clients not using asyncio
+        # don't pay for importing it.
+        return None
+
+
+def game_fields(game):
+    """
+    Returns the state of a game as the tuple of values stored in a snapshot.
+
+    Parameters
+    ----------
+    game : Game
+        The game to read.
+
+    Returns
+    -------
+    tuple
+        (flags, game id, state version, player 0 move code, player 1 move code, wins[0], wins[1],
+        ties, variant)
+
+    Raises
+    ------
+    ValueError
+        If the game is played with a RuleSet that is not one of the built-in variants, which
+        the other end could not know.
+    """
+    flags = (P1_WENT if game.p1Went else 0) | (P2_WENT if game.p2Went else 0) | (READY if game.ready else 0)
+    m0, m1 = game.move_codes
+    try:
+        variant = _RULES_IDS[game.rules]
+    except KeyError:
+        raise ValueError(f"{game.rules!r} is not a built-in variant and cannot be sent") from None
+    return (flags, game.id, game.version, m0, m1, game.wins[0], game.wins[1], game.ties, variant)
+
+
+def encode_fields(fields):
+    """Packs a tuple returned by game_fields into a snapshot."""
+    return SNAPSHOT.pack(SNAPSHOT_VERSION, *fields)
+
+
+def encode_game(game):
+    """
+    Packs a game into a fixed-layout binary snapshot.
+
+    Only the per-game state and the variant's index are sent, as the client knows every
+    built-in variant.
+
+    Parameters
+    ----------
+    game : Game
+        The game to encode.
+
+    Returns
+    -------
+    bytes
+        The snapshot, SNAPSHOT.size bytes long.
+    """
+    return encode_fields(game_fields(game))
+
+
+def encode_delta(old, new):
+    """
+    Encodes the fields that differ between two game states.
+
+    Parameters
+    ----------
+    old : tuple
+        The state the client has, as returned by game_fields.
+    new : tuple
+        The current state.
+
+    Returns
+    -------
+    bytes
+        A delta that apply_update turns the old state into the new one with.
+    """
+    mask = 0
+    values = []
+    for bit, (index, _) in enumerate(DELTA_FIELDS):
+        if old[index] != new[index]:
+            mask |= 1 << bit
+            values.append(new[index])
+    return DELTA_HEADER.pack(DELTA, new[2], mask) + _delta_struct(mask).pack(*values)
+
+
+def _delta_struct(mask):
+    """Returns the struct for the delta fields selected by mask, compiling it on first use."""
+    fields = _delta_structs.get(mask)
+    if fields is None:
+        fields = _delta_structs[mask] = struct.Struct(
+            "!" + "".join(fmt for bit, (_, fmt) in enumerate(DELTA_FIELDS) if mask & (1 << bit)))
+    return fields
+
+
+def _game_from_fields(fields):
+    """Builds a game from a tuple in the layout returned by game_fields."""
+    flags, game_id, version, m0, m1, wins0, wins1, ties, variant = fields
+    if variant >= len(RULES):
+        raise ProtocolError(f"Unknown variant in game update ({variant})")
+    game = Game(game_id, RULES[variant])
+    if m0 > len(game.rules) or m1 > len(game.rules):
+        raise ProtocolError(f"Unknown move code in game update ({m0}, {m1})")
+    game.p1Went = bool(flags & P1_WENT)
+    game.p2Went = bool(flags & P2_WENT)
+    game.ready = bool(flags & READY)
+    game.version = version
+    game.move_codes = (m0, m1)
+    game.wins = [wins0, wins1]
+    game.ties = ties
+    return game
+
+
+def decode_game(payload):
+    """
+    Rebuilds a game from a binary snapshot produced by encode_game.
+
+    Parameters
+    ----------
+    payload : bytes
+        The snapshot.
+
+    Returns
+    -------
+    Game
+        A game with the same state as the one that was encoded. Moves are restored as their
+        display names, e.g. "Rock".
+    """
+    if len(payload) != SNAPSHOT.size or payload[0] != SNAPSHOT_VERSION:
+        raise ProtocolError(f"Unsupported game snapshot (version {payload[0] if payload else None}, {len(payload)} bytes)")
+    return _game_from_fields(SNAPSHOT.unpack(payload)[1:])
+
+
+def apply_update(game, payload):
+    """
+    Applies a server reply to the game the client already has.
+
+    Parameters
+    ----------
+    game : Game
+        The client's current copy of the game, or None if it has none yet.
+    payload : bytes
+        A full snapshot, a delta, or the "not modified" marker.
+
+    Returns
+    -------
+    Game
+        The up-to-date game. Deltas produce a new Game rather than changing the one passed in.
+
+    Raises
+    ------
+    GameClosed
+        If the payload says the server closed the game.
+    ServerOverloaded
+        If the server dropped the request because it is too busy.
+    """
+    if not payload:
+        raise ProtocolError("Empty game update")
+    tag = payload[0]
+    if tag == SNAPSHOT_VERSION:
+        return decode_game(payload)
+    if tag == CLOSED:
+        raise GameClosed(decode_closed(payload))
+    if payload == OVERLOADED:
+        raise ServerOverloaded("Server overloaded, request dropped")
+    if game is None:
+        raise ProtocolError("Received a game update without a game to apply it to")
+    if tag == NOT_MODIFIED[0]:
+        return game
+    if tag == DELTA:
+        _, version, mask = DELTA_HEADER.unpack_from(payload)
+        fields = list(game_fields(game))
+        fields[2] = version
+        values = _delta_struct(mask).unpack_from(payload, DELTA_HEADER.size)
+        changed = (index for bit, (index, _) in enumerate(DELTA_FIELDS) if mask & (1 << bit))
+        for index, value in zip(changed, values):
+            fields[index] = value
+        return _game_from_fields(fields)
+    raise ProtocolError(f"Unknown game update type {tag}")
+
+
+def encode_leaderboard(entries):
+    """
+    Packs the top entries of the leaderboard into a reply.
+
+    Parameters
+    ----------
+    entries : list
+        (name, score) tuples, at most MAX_TOP of them.
+
+    Returns
+    -------
+    bytes
+        The encoded leaderboard.
+    """
+    parts = [LEADERBOARD_HEADER.pack(LEADERBOARD, len(entries))]
+    for name, score in entries:
+        raw = name.encode()
+        parts.append(LEADERBOARD_ENTRY.pack(score, len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def decode_leaderboard(payload):
+    """
+    Unpacks a reply produced by encode_leaderboard.
+
+    Parameters
+    ----------
+    payload : bytes
+        The reply.
+
+    Returns
+    -------
+    list
+        (name, score) tuples, highest score first.
+    """
+    try:
+        tag, count = LEADERBOARD_HEADER.unpack_from(payload)
+        if tag != LEADERBOARD:
+            raise ProtocolError(f"Expected a leaderboard, got message type {tag}")
+        entries = []
+        offset = LEADERBOARD_HEADER.size
+        for _ in range(count):
+            score, size = LEADERBOARD_ENTRY.unpack_from(payload, offset)
+            offset += LEADERBOARD_ENTRY.size
+            if offset + size > len(payload):
+                raise ProtocolError("Truncated leaderboard")
+            entries.append((bytes(payload[offset:offset + size]).decode(), score))
+            offset += size
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Malformed leaderboard: {e}") from e
+    return entries
+
+
+class FrameBuffer:
+    """
+    A reusable receive buffer that splits a byte stream back into frames.
+
+    Data is read straight into one preallocated bytearray with recv_into, so no new buffer is
+    allocated per message. A single recv may deliver several frames, or only part of one;
+    frames that are already buffered are returned without touching the socket again.
+
+    Attributes
+    ----------
+    buf : bytearray
+        The receive buffer. It only grows when a single frame does not fit in it.
+    start : int
+        Offset of the first unread byte in the buffer.
+    end : int
+        Offset one past the last received byte in the buffer.
+
+    Methods
+    -------
+    next_frame():
+        Returns the next complete buffered frame, or None if there is none yet.
+    fill(sock):
+        Reads more data from the socket into the buffer.
+    feed(data):
+        Adds data that was read elsewhere, e.g. from an asyncio stream, to the buffer.
+    read_frame(sock):
+        Returns the next frame, reading from the socket until one is complete.
+    """
+
+    def __init__(self, size=4096):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+
+    def next_frame(self):
+        """
+        Returns the next complete buffered frame, or None if there is none yet.
+
+        The returned memoryview points into the receive buffer and is only valid until the buffer
+        is read from again, so callers must decode it before asking for the next frame.
+
+        Returns
+        -------
+        memoryview
+            The payload of the frame, or None if no complete frame is buffered.
+        """
+        available = self.end - self.start
+        if available < HEADER.size:
+            return None
+        (size,) = HEADER.unpack_from(self.buf, self.start)
+        if size > MAX_FRAME_SIZE:
+            raise ProtocolError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+        if available < HEADER.size + size:
+            self._reserve(HEADER.size + size)
+            return None
+        begin = self.start + HEADER.size
+        self.start = begin + size
+        if self.start == self.end:
+            self.start = self.end = 0
+        return self.view[begin:begin + size]
+
+    def fill(self, sock):
+        """
+        Reads more data from the socket into the buffer.
+
+        Parameters
+        ----------
+        sock : socket
+            The socket to read from.
+
+        Returns
+        -------
+        int
+            The number of bytes read, 0 if the peer closed the connection.
+        """
+        if self.end == len(self.buf):
+            self._reserve(len(self.buf) - self.start + 1)
+        n = sock.recv_into(self.view[self.end:])
+        self.end += n
+        return n
+
+    def feed(self, data):
+        """
+        Adds data that was read elsewhere, e.g. from an asyncio stream, to the buffer.
+
+        Parameters
+        ----------
+        data : bytes
+            The data, in the order it was received.
+        """
+        if self.end + len(data) > len(self.buf):
+            self._reserve(self.end - self.start + len(data))
+        self.buf[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def read_frame(self, sock):
+        """
+        Returns the next frame, reading from the socket until one is complete.
+
+        Parameters
+        ----------
+        sock : socket
+            The socket to read from.
+
+        Returns
+        -------
+        memoryview
+            The payload of the frame, or None if the peer closed the connection.
+        """
+        frame = self.next_frame()
+        while frame is None:
+            if not self.fill(sock):
+                return None
+            frame = self.next_frame()
+        return frame
+
+    def _reserve(self, needed):
+        """Makes room for `needed` bytes from the current start, compacting or growing the buffer."""
+        pending = self.end - self.start
+        if needed > len(self.buf):
+            size = len(self.buf)
+            while size < needed:
+                size *= 2
+            buf = bytearray(size)
+            buf[:pending] = self.view[self.start:self.end]
+            self.buf = buf
+            self.view = memoryview(buf)
+        elif self.start + needed > len(self.buf):
+            self.buf[:pending] = self.buf[self.start:self.end]
+        else:
+            return
+        self.start = 0
+        self.end = pending
+
+
+def encode_closed(reason):
+    """
+    Packs the notice sent to a player whose game the server closed.
+
+    Parameters
+    ----------
+    reason : str
+        One of CLOSE_REASONS.
+
+    Returns
+    -------
+    bytes
+        The encoded notice.
+    """
+    return CLOSED_FORMAT.pack(CLOSED, CLOSE_REASONS.index(reason))
+
+
+def decode_closed(payload):
+    """
+    Unpacks a notice produced by encode_closed.
+
+    Parameters
+    ----------
+    payload : bytes
+        The notice.
+
+    Returns
+    -------
+    str
+        The reason the game was closed, one of CLOSE_REASONS.
+    """
+    if len(payload) != CLOSED_FORMAT.size or payload[0] != CLOSED or payload[1] >= len(CLOSE_REASONS):
+        raise ProtocolError(f"Malformed game closed notice ({len(payload)} bytes)")
+    return CLOSE_REASONS[payload[1]]
+
+
+def encode_room(game_id, payload):
+    """
+    Tags a game update with the ID of the game it belongs to, for a multi-room connection.
+
+    Parameters
+    ----------
+    game_id : int
+        The unique ID of the game.
+    payload : bytes
+        The snapshot, delta, "not modified" marker or closed notice for that game.
+
+    Returns
+    -------
+    bytes
+        The tagged update.
+    """
+    return ROOM_HEADER.pack(ROOM, game_id) + payload
+
+
+def decode_room(payload):
+    """
+    Splits a frame produced by encode_room.
+
+    Parameters
+    ----------
+    payload : bytes
+        The tagged update.
+
+    Returns
+    -------
+    tuple
+        The game ID and the update for that game.
+    """
+    if len(payload) <= ROOM_HEADER.size or payload[0] != ROOM:
+        raise ProtocolError(f"Malformed room update ({len(payload)} bytes)")
+    _, game_id = ROOM_HEADER.unpack_from(payload)
+    return game_id, payload[ROOM_HEADER.size:]
+
+
+def encode_joined(game_id, p):
+    """
+    Packs the reply telling a multi-room client which game it got a seat in.
+
+    Parameters
+    ----------
+    game_id : int
+        The unique ID of the game.
+    p : int
+        The player number (0 or 1).
+
+    Returns
+    -------
+    bytes
+        The encoded reply.
+    """
+    return JOINED_FORMAT.pack(JOINED, game_id, p)
+
+
+def decode_joined(payload):
+    """
+    Unpacks a reply produced by encode_joined.
+
+    Parameters
+    ----------
+    payload : bytes
+        The reply.
+
+    Returns
+    -------
+    tuple
+        The game ID and the player number.
+    """
+    if len(payload) != JOINED_FORMAT.size or payload[0] != JOINED:
+        raise ProtocolError(f"Malformed joined reply ({len(payload)} bytes)")
+    _, game_id, p = JOINED_FORMAT.unpack(payload)
+    return game_id, p
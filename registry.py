@@ -0,0 +1,138 @@
+import threading
+from contextlib import contextmanager
+from game import Game
+from rules import CLASSIC
+
+
+class GameRegistry:
+    """
+    The server's table of active games, safe to use from many handler threads at once.
+
+    Games are spread over a fixed number of stripes, each with its own dict and lock, so adding
+    and removing games only ever locks one stripe. On top of that every game has its own lock,
+    held while its state is read or changed, so handlers of different games never wait on each
+    other and the two players of one game never see each other's half-made changes.
+
+    ...
+
+    Attributes
+    ----------
+    stripes : list
+        (lock, {game_id: (game, game_lock)}) for each stripe
+    rules : RuleSet
+        the variant new games are played with
+
+    Methods
+    -------
+    create(game_id):
+        Adds a new game and returns it.
+    get(game_id, default=None):
+        Returns the game with the given ID, or default.
+    join(game_id):
+        Marks a waiting game as ready for play and returns it.
+    remove(game_id):
+        Removes a game and returns it.
+    locked(game_id):
+        Context manager holding a game's lock and yielding the game.
+    """
+
+    def __init__(self, stripes=64, rules=CLASSIC):
+        self.rules = rules
+        self.stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+
+    def _stripe(self, game_id):
+        return self.stripes[hash(game_id) % len(self.stripes)]
+
+    def create(self, game_id):
+        """
+        Adds a new game and returns it.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        Game
+            The new game.
+
+        Raises
+        ------
+        KeyError
+            If a game with that ID already exists.
+        """
+        lock, table = self._stripe(game_id)
+        game = Game(game_id, self.rules)
+        with lock:
+            if game_id in table:
+                raise KeyError(f"Game {game_id} already exists")
+            table[game_id] = (game, threading.Lock())
+        return game
+
+    def get(self, game_id, default=None):
+        """
+        Returns the game with the given ID, or default if there is none.
+
+        The game is returned without its lock held; use locked to read or change its state.
+        """
+        entry = self._stripe(game_id)[1].get(game_id)
+        return default if entry is None else entry[0]
+
+    def join(self, game_id):
+        """
+        Marks a waiting game as ready for play and returns it.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        Game
+            The game, or None if it was removed before the second player arrived.
+        """
+        try:
+            with self.locked(game_id) as game:
+                game.set_ready()
+                return game
+        except KeyError:
+            return None
+
+    def remove(self, game_id):
+        """
+        Removes a game and returns it, or None if there was no such game.
+        """
+        lock, table = self._stripe(game_id)
+        with lock:
+            entry = table.pop(game_id, None)
+        return None if entry is None else entry[0]
+
+    @contextmanager
+    def locked(self, game_id):
+        """
+        Holds a game's lock and yields the game.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Raises
+        ------
+        KeyError
+            If there is no game with that ID.
+        """
+        entry = self._stripe(game_id)[1].get(game_id)
+        if entry is None:
+            raise KeyError(game_id)
+        game, lock = entry
+        with lock:
+            yield game
+
+    def __contains__(self, game_id):
+        return game_id in self._stripe(game_id)[1]
+
+    def __len__(self):
+        return sum(len(table) for _, table in self.stripes)
@@ -0,0 +1,225 @@
+from collections import OrderedDict
+
+FONT = "comicsans"
+# Imported on first use by load_pygame, so that importing the client costs nothing until a window is opened.
+pygame = None
+
+
+def load_pygame():
+    """Imports pygame the first time it is needed, and returns it."""
+    global pygame
+    if pygame is None:
+        import pygame as module
+        pygame = module
+    return pygame
+
+
+class RenderCache:
+    """
+    Keeps fonts and rendered text around between frames.
+
+    Looking a font up with pygame.font.SysFont searches the system's fonts every time, and
+    rendering text builds a new surface, so both are done once: fonts are kept for good, there
+    being only a handful of sizes, and text surfaces are kept by (text, size, colour) up to a
+    bound, dropping the least recently used beyond it.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        the font family used for every label
+    capacity : int
+        the most text surfaces kept
+    fonts : dict
+        the loaded fonts, with the size as the key
+    surfaces : OrderedDict
+        the rendered text, least recently used first
+    hits : int
+        the text lookups served from the cache
+    misses : int
+        the text lookups that had to render
+
+    Methods
+    -------
+    font(size):
+        Returns the font of a size, loading it the first time.
+    text(text, size, color):
+        Returns the rendered text, rendering it the first time.
+    """
+
+    def __init__(self, name=FONT, capacity=128):
+        self.name = name
+        self.capacity = capacity
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        """Returns the font of a size, loading it the first time."""
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = load_pygame().font.SysFont(self.name, size)
+        return font
+
+    def text(self, text, size, color):
+        """
+        Returns text rendered in a size and colour, rendering it the first time.
+
+        Parameters
+        ----------
+        text : str
+            The text to render.
+        size : int
+            The font size.
+        color : tuple
+            The RGB colour of the text.
+
+        Returns
+        -------
+        pygame.Surface
+            The rendered text. It is shared, so it must not be drawn on.
+        """
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.surfaces[key] = self.font(size).render(text, 1, color)
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+class Renderer:
+    """
+    Draws a frame's rectangles and labels, repainting and updating only what changed since the
+    last frame.
+
+    A frame is described by calling rect and text for everything on the screen, then present.
+    Every item is a small tuple, so present compares the frame with the previous one: the areas of
+    items that went away or appeared are filled with the background, the items in those areas are
+    drawn again, and only those areas are passed to pygame.display.update. A frame the same as the
+    last costs no drawing at all. Items are drawn in the order they were added, later ones on top.
+
+    ...
+
+    Attributes
+    ----------
+    win : pygame.Surface
+        the window
+    cache : RenderCache
+        the fonts and rendered text
+    background : tuple
+        the RGB colour of the window behind the items
+    items : list
+        the items of the frame being described
+    shown : dict
+        the items on the screen, in drawing order, with the area each covers
+
+    Methods
+    -------
+    rect(color, rect):
+        Adds a filled rectangle to the frame.
+    text(text, size, position, color, center=False):
+        Adds a label to the frame.
+    present():
+        Draws what changed and updates those areas of the window.
+    invalidate():
+        Makes the next present draw and update the whole window.
+    """
+
+    def __init__(self, win, cache=None, background=(128, 128, 128)):
+        load_pygame()
+        self.win = win
+        self.cache = cache if cache is not None else RenderCache()
+        self.background = background
+        self.items = []
+        self.shown = None
+
+    def rect(self, color, rect):
+        """Adds a rectangle filled with a colour to the frame."""
+        self.items.append(("rect", color, tuple(rect)))
+
+    def text(self, text, size, position, color, center=False):
+        """
+        Adds a label to the frame.
+
+        Parameters
+        ----------
+        text : str
+            The text of the label.
+        size : int
+            The font size.
+        position : tuple
+            Where the top left of the label goes, or its centre if center is true.
+        color : tuple
+            The RGB colour of the text.
+        center : bool
+            Whether position is the centre of the label.
+
+        Returns
+        -------
+        None
+        """
+        self.items.append(("text", text, size, color, tuple(position), center))
+
+    def area(self, item):
+        """Returns the part of the window an item covers."""
+        if item[0] == "rect":
+            return pygame.Rect(item[2])
+        _, text, size, color, position, center = item
+        surface = self.cache.text(text, size, color)
+        if center:
+            return surface.get_rect(center=position)
+        return surface.get_rect(topleft=position)
+
+    def draw(self, item, area):
+        """Draws an item onto the window."""
+        if item[0] == "rect":
+            self.win.fill(item[1], area)
+        else:
+            _, text, size, color, _, _ = item
+            self.win.blit(self.cache.text(text, size, color), area)
+
+    def present(self):
+        """
+        Draws what changed since the last frame and updates those areas of the window.
+
+        Returns
+        -------
+        list
+            The areas of the window that were updated, empty if nothing changed.
+        """
+        items, self.items = self.items, []
+        shown, previous = {}, self.shown
+        for item in items:
+            shown[item] = previous[item] if previous is not None and item in previous else self.area(item)
+        self.shown = shown
+        if previous is None:
+            self.win.fill(self.background)
+            for item, area in shown.items():
+                self.draw(item, area)
+            pygame.display.update()
+            return [self.win.get_rect()]
+        dirty = [area for item, area in previous.items() if item not in shown]
+        dirty.extend(area for item, area in shown.items() if item not in previous)
+        if not dirty:
+            return []
+        # Drawing is clipped to each dirty area, so items drawn again never cover unchanged ones.
+        for clip in dirty:
+            self.win.set_clip(clip)
+            self.win.fill(self.background)
+            for item, area in shown.items():
+                if area.colliderect(clip):
+                    self.draw(item, area)
+        self.win.set_clip(None)
+        pygame.display.update(dirty)
+        return dirty
+
+    def invalidate(self):
+        """Makes the next present draw and update the whole window, e.g. after it was uncovered."""
+        self.shown = None
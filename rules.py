@@ -0,0 +1,129 @@
+class RuleSet:
+    """
+    The moves of a game variant and which move beats which, compiled into an outcome table.
+
+    Moves are numbered from 1 in the order given, and 0 means "no move". The outcome of every
+    pair of codes is precomputed into a flat table, so resolving a round is a single index
+    whatever the number of moves.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        the variant's name
+    moves : tuple
+        the move names, so that moves[code - 1] is the move with that code
+    stride : int
+        the row length of the outcome table, one more than the number of moves
+    table : list
+        table[code0 * stride + code1] is 0 if the first move wins, 1 if the second one does,
+        or -1 for a tie or when either code is 0
+
+    Methods
+    -------
+    cyclic(name, moves):
+        Builds a balanced variant where every move beats the half of the moves before it.
+    code(move):
+        Returns the code of a move given by name.
+    label(code):
+        Returns the name of the move with the given code.
+    outcome(code0, code1):
+        Returns the winner of a round between two move codes.
+    """
+
+    def __init__(self, name, moves, beats):
+        """
+        Compiles a variant from its dominance graph.
+
+        Parameters
+        ----------
+        name : str
+            The variant's name.
+        moves : list
+            The move names, in code order.
+        beats : dict
+            The moves each move beats, with the move name as the key. Pairs where neither move
+            beats the other are ties.
+
+        Raises
+        ------
+        ValueError
+            If a move name is repeated or unknown, or two moves beat each other.
+        """
+        self.name = name
+        self.moves = tuple(moves)
+        self.codes = {move.upper(): code for code, move in enumerate(self.moves, 1)}
+        if len(self.codes) != len(self.moves):
+            raise ValueError(f"{name}: move names must be unique")
+        self.stride = len(self.moves) + 1
+        self.table = [-1] * (self.stride * self.stride)
+        for winner, losers in beats.items():
+            for loser in losers:
+                first, second = self.code(winner), self.code(loser)
+                if first == second or self.table[second * self.stride + first] == 0:
+                    raise ValueError(f"{name}: {winner} and {loser} cannot beat each other")
+                self.table[first * self.stride + second] = 0
+                self.table[second * self.stride + first] = 1
+
+    @classmethod
+    def cyclic(cls, name, moves):
+        """
+        Builds a balanced variant where every move beats the half of the moves before it.
+
+        With the moves listed in order, e.g. Rock, Paper, Scissors, each move beats the
+        (N - 1) / 2 moves before it, wrapping around, and loses to the ones after it.
+
+        Raises
+        ------
+        ValueError
+            If the number of moves is even, since such a variant cannot be balanced.
+        """
+        if len(moves) % 2 == 0:
+            raise ValueError(f"{name}: a cyclic variant needs an odd number of moves")
+        reach = len(moves) // 2
+        beats = {move: [moves[i - step] for step in range(1, reach + 1)] for i, move in enumerate(moves)}
+        return cls(name, moves, beats)
+
+    def code(self, move):
+        """
+        Returns the code of a move given by name, in any case. Raises KeyError for unknown moves.
+        """
+        return self.codes[move.upper()]
+
+    def label(self, code):
+        """
+        Returns the name of the move with the given code, or None for code 0.
+        """
+        return self.moves[code - 1] if code else None
+
+    def outcome(self, code0, code1):
+        """
+        Returns 0 if code0 beats code1, 1 if code1 beats code0, or -1 for a tie.
+        """
+        return self.table[code0 * self.stride + code1]
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __reduce__(self):
+        # Built-in variants pickle by name, so pickled games do not each carry a copy of the table.
+        if VARIANTS.get(self.name) is self:
+            return variant, (self.name,)
+        return super().__reduce__()
+
+    def __repr__(self):
+        return f"RuleSet({self.name!r}, {len(self.moves)} moves)"
+
+
+CLASSIC = RuleSet.cyclic("classic", ["Rock", "Paper", "Scissors"])
+LIZARD_SPOCK = RuleSet.cyclic("lizard-spock", ["Rock", "Spock", "Paper", "Lizard", "Scissors"])
+VARIANTS = {rules.name: rules for rules in (CLASSIC, LIZARD_SPOCK)}
+
+
+def variant(name):
+    """
+    Returns the built-in rule set with the given name, e.g. "classic" or "lizard-spock".
+    Raises KeyError for unknown variants.
+    """
+    return VARIANTS[name]
@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from collections import Counter
+from improvements.leaderboard import Leaderboard
+from logs import get_logger
+from matchlog import MatchLog, MatchLogReader
+
+log = get_logger("scores")
+
+
+class ScoreKeeper:
+    """
+    Feeds round results into a Leaderboard from a background thread.
+
+    Handlers only put results on a queue, which never blocks, so scoring adds no latency to the
+    request path. The writer thread takes everything queued at once, adds up the points of each
+    player in the batch, and applies one update per player under the leaderboard lock. If there
+    is a match log, the batch is appended to it first, and restore rebuilds the scores from it.
+
+    ...
+
+    Attributes
+    ----------
+    leaderboard : Leaderboard
+        the scores of every named player
+    pending : queue.Queue
+        round results not yet applied to the leaderboard
+    batch_size : int
+        the most results applied in one batch
+    lock : threading.Lock
+        held while the leaderboard is read or updated
+    log : MatchLog
+        the log every round is appended to, or None
+
+    Methods
+    -------
+    restore(path):
+        Creates a score keeper from the rounds in a match log, and logs new rounds to it.
+    record(game_id, names, moves, winner):
+        Queues the result of a round.
+    top(n):
+        Returns the top n players and their scores.
+    apply(batch):
+        Logs a batch of results and adds their points to the leaderboard.
+    flush():
+        Waits until every queued result has been applied.
+    """
+
+    # Points for the result of a round. Ties still add the players to the leaderboard.
+    WIN = 1
+    TIE = 0
+
+    def __init__(self, leaderboard=None, batch_size=1024, log=None):
+        self.leaderboard = leaderboard if leaderboard is not None else Leaderboard()
+        self.pending = queue.Queue()
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.log = log
+        threading.Thread(target=self.write_behind, daemon=True).start()
+
+    @classmethod
+    def restore(cls, path, **kwargs):
+        """
+        Creates a score keeper from the rounds in a match log, and logs new rounds to it.
+
+        Parameters
+        ----------
+        path : str
+            The match log. It is created if it does not exist.
+        **kwargs
+            Passed on to the constructor.
+
+        Returns
+        -------
+        ScoreKeeper
+            A score keeper whose leaderboard holds the points of every round in the log.
+        """
+        log = MatchLog(path)
+        leaderboard = Leaderboard()
+        with MatchLogReader(path) as reader:
+            for name, score in reader.tally(cls.WIN, cls.TIE).items():
+                leaderboard.add_score(name, score)
+        return cls(leaderboard, log=log, **kwargs)
+
+    def record(self, game_id, names, moves, winner):
+        """
+        Queues the result of a round.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+        names : tuple
+            The names of player 0 and player 1, None for a player without a name.
+        moves : tuple
+            The move codes of player 0 and player 1.
+        winner : int
+            0 or 1 for the winning player, -1 for a tie.
+        """
+        self.pending.put((game_id, names, moves, winner, time.time()))
+
+    def write_behind(self):
+        """
+        Applies queued results to the leaderboard in batches, forever. Runs on its own thread.
+
+        When no results arrive for the log's sync_interval, the rounds already logged are synced,
+        so they do not wait in the buffer for the next round. A batch that fails, e.g. because the
+        log's disk is full, is logged and counted as done, so the thread carries on with the next
+        one and flush never waits for it.
+        """
+        while True:
+            try:
+                batch = [self.pending.get(timeout=None if self.log is None else self.log.sync_interval)]
+            except queue.Empty:
+                try:
+                    self.log.sync()
+                except Exception:
+                    log.exception("match_log_sync_failed")
+                continue
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                self.apply(batch)
+            except Exception:
+                log.exception("scores_failed", rounds=len(batch))
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+
+    def apply(self, batch):
+        """
+        Appends a batch of results to the log, if there is one, and adds their points to the leaderboard.
+
+        Parameters
+        ----------
+        batch : list
+            (game_id, names, moves, winner, timestamp) for each round, as queued by record.
+        """
+        if self.log is not None:
+            for game_id, names, moves, winner, timestamp in batch:
+                self.log.append(game_id, names, moves, winner, timestamp)
+        points = Counter()
+        for _, names, _, winner, _ in batch:
+            if winner == -1:
+                points[names[0]] += self.TIE
+                points[names[1]] += self.TIE
+            else:
+                points[names[winner]] += self.WIN
+                points[names[1 - winner]] += self.TIE
+        points.pop(None, None)
+        with self.lock:
+            for name, score in points.items():
+                self.leaderboard.add_score(name, score)
+
+    def top(self, n):
+        """
+        Returns the top n players and their scores.
+
+        Results still queued are not included; call flush first to see them.
+
+        Parameters
+        ----------
+        n : int
+            The number of players to return.
+
+        Returns
+        -------
+        list
+            (name, score) tuples, highest score first.
+        """
+        with self.lock:
+            return self.leaderboard.get_top_scores(n)
+
+    def flush(self):
+        """
+        Waits until every queued result has been applied to the leaderboard, and syncs the log.
+        """
+        self.pending.join()
+        if self.log is not None:
+            self.log.sync()
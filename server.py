@@ -1,9 +1,39 @@
 import socket
+import time
 from _thread import *
-import pickle
-from game import Game
+from protocol import (DEFAULT_TOP, HEADER, MAX_GAME_ID, MAX_NAME_SIZE, MAX_TOP, NOT_MODIFIED, FrameBuffer,
+                      encode_closed, encode_joined, encode_leaderboard, encode_room)
+from channels import PUSH_POLICIES, Broadcast, Fanout, RoomChannel, SocketChannel, Subscription
+from matchmaking import Matchmaker
+from registry import GameRegistry
+from rules import CLASSIC, VARIANTS
+from scores import ScoreKeeper
+from metrics import Metrics, dump_metrics, serve_metrics
+from logs import FORMATS, get_logger, setup_logging
+from timers import TimerWheel
+from sockopts import SocketOptions
 import argparse
 
+log = get_logger("server")
+
+
+def _parse_int(text, default):
+    """Returns text as an int, or default if it is not one."""
+    try:
+        return int(text)
+    except ValueError:
+        return default
+
+
+def _parse_game_id(text):
+    """Returns text as a game ID, or None if it is not a number that fits in a room frame."""
+    game_id = _parse_int(text, None)
+    return game_id if game_id is not None and 0 <= game_id <= MAX_GAME_ID else None
+
+
+# Pushed to subscribed clients every heartbeat_interval. Framed once, like every other broadcast.
+HEARTBEAT = Broadcast(None, NOT_MODIFIED)
+
 class Server:
     """
     A class to represent a server for managing multiple games and their respective clients.
@@ -19,34 +49,105 @@ class Server:
     s : socket
         a socket object representing the server socket
     connected : set
-        a set to keep track of all connected clients
-    games : dict
-        a dictionary to keep track of all active games, with the game ID as the key and the game object as the value
-    idCount : int
-        an integer counter used to assign a unique ID to each game
+        a set to keep track of all connected clients, as their channels
+    games : GameRegistry
+        the thread-safe table of all active games, with the game ID as the key and the game object as the value
+    matchmaker : Matchmaker
+        the queue of players waiting for an opponent, which also hands out game IDs
+    subscriptions : dict
+        the clients subscribed to pushed updates for each game, with the game ID as the key
+    names : dict
+        the names players gave with "name:<name>", with (game ID, player number) as the key
+    scores : ScoreKeeper
+        the leaderboard of named players, updated in the background as rounds are resolved
+    metrics : Metrics
+        per-stage latency histograms and traffic counters, or None when metrics are off
+    channels : dict
+        the connection of every player, with (game ID, player number) as the key
+    timers : TimerWheel
+        the idle, move and heartbeat timers of every connection and game
+    move_timers : dict
+        the move timer of every game with two players, with the game ID as the key
+    push_queue : int
+        the most pushed updates queued for a client that is not keeping up
+    fanout : Fanout
+        the thread that sends the pushed updates queued for clients whose sockets were full, or
+        None where sockets cannot be written without blocking (Windows), so pushes block instead
+    socket_options : SocketOptions
+        the TCP options of the listening socket and of every accepted connection
     """
 
-    def __init__(self):
+    def __init__(self, server="localhost", port=5555, wait_timeout=None, match_log=None,
+                 metrics=False, idle_timeout=None, move_timeout=None, heartbeat_interval=None, push_queue=64,
+                 push_policy="coalesce", socket_options=None, fanout=True, rules=CLASSIC):
         """
         Constructs all the necessary attributes for the server object.
 
         Parameters
         ----------
-            None
+        server : str
+            The address to bind to, default is "localhost".
+        port : int
+            The port to listen on, default is 5555. Port 0 picks a free port.
+        wait_timeout : float
+            Seconds a player may wait for an opponent before being disconnected, default is no limit.
+        match_log : str
+            The path of a match log to record every round in. The leaderboard is rebuilt from it
+            on startup. Default is to keep scores in memory only.
+        metrics : bool
+            Whether to record latency histograms and counters, default is off. See start_metrics.
+        idle_timeout : float
+            Seconds a client may go without sending anything before it is disconnected and its
+            game closed, default is no limit. Subscribed clients must keep sending within it too;
+            BackgroundNetwork, which the GUI client uses, sends a keepalive every
+            network.KEEPALIVE seconds.
+        move_timeout : float
+            Seconds a game with two players may go without a move or reset before it is closed,
+            default is no limit.
+        heartbeat_interval : float
+            Seconds between the "not modified" markers pushed to subscribed clients, so that they
+            know the server is alive and dead connections are found, default is none.
+        push_queue : int
+            The most pushed updates queued for a subscriber whose socket is full, default is 64.
+            Further updates are dropped, so slow subscribers never hold up the players.
+        push_policy : str
+            "coalesce" (the default) to replace an update still queued for a spectator with a newer
+            one for the same game, or "drop" to queue it behind the older one. See SocketChannel.
+        socket_options : SocketOptions
+            TCP_NODELAY, the listen backlog, address reuse, keepalive and buffer sizes; default is
+            SocketOptions().
+        fanout : bool
+            Whether to push from a fanout thread, default is yes. Subclasses that write to their
+            clients from a single thread turn it off.
+        rules : RuleSet
+            The variant every game is played with, one of rules.VARIANTS; default is the classic game.
         """
-        self.server = "localhost"
-        self.port = 5555
+        self.server = server
+        self.port = port
+        self.socket_options = socket_options if socket_options is not None else SocketOptions()
         self.s = self.setup_socket()
         self.connected = set()
-        self.games = {}
-        self.idCount = 0
+        self.games = GameRegistry(rules=rules)
+        self.subscriptions = {}
+        self.matchmaker = Matchmaker(wait_timeout)
+        self.names = {}
+        self.scores = ScoreKeeper() if match_log is None else ScoreKeeper.restore(match_log)
+        self.metrics = Metrics() if metrics else None
+        self.idle_timeout = idle_timeout
+        self.move_timeout = move_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.channels = {}
+        self.timers = TimerWheel()
+        self.move_timers = {}
+        self.push_queue = push_queue
+        self.fanout = Fanout(push_queue, push_policy) if fanout and hasattr(socket, "MSG_DONTWAIT") else None
 
     def setup_socket(self):
         """
         Sets up the server socket and starts listening for connections.
 
-        This method creates a new socket using the AF_INET address family and the SOCK_STREAM socket type.
-        It then binds the server and port to the socket and starts listening for connections.
+        This method creates a TCP socket with the server's socket options (see SocketOptions.listen),
+        binds the server and port to it and starts listening for connections.
 
         Parameters
         ----------
@@ -57,18 +158,21 @@ class Server:
         s : socket
             The server socket object that is set up and listening for connections.
         """
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.bind((self.server, self.port))
-        s.listen(2)
-        print("Waiting for a connection, Server Started")
+        options = self.socket_options
+        s = options.listen(self.server, self.port)
+        self.port = s.getsockname()[1]
+        log.info("listening", address=self.server, port=self.port, backlog=options.backlog, nodelay=options.nodelay)
         return s
-    
+
     def handle_game_data(self, game, data, p):
         """
         Handles the game data received from the client.
 
         This method processes the data received from the client. If the data is "reset", it resets the game.
-        If the data is anything other than "get", it makes a move in the game. The method then returns the game.
+        If the data names a move of the game's variant (e.g. "Rock" or "Spock"), it makes that move in the
+        game; unknown moves are ignored.
+        A move that completes a round records its result with record_round.
+        The method then returns the game.
 
         Parameters
         ----------
@@ -84,21 +188,318 @@ class Server:
         game : Game
             The updated game object after handling the received data.
         """
+        if data != "get" and game.id in self.move_timers:
+            self.timers.touch(self.move_timers[game.id], self.move_timeout)
         if data == "reset":
             game.resetWent()
         elif data != "get":
-            game.play(p, data)
+            try:
+                went = game.bothWent()
+                game.play(p, data)
+            except KeyError:
+                log.warning("unknown_move", game=game.id, player=p, data=data)
+            else:
+                if not went and game.bothWent():
+                    self.record_round(game)
         return game
 
+    def record_round(self, game):
+        """
+        Counts the result of a round that both players have just completed.
+
+        The game's wins or ties are updated straight away, since they go out with the game. The
+        result is only queued for the leaderboard and the match log, which are written off the
+        request path.
+
+        Parameters
+        ----------
+        game : Game
+            The game whose round just ended. Its lock must be held.
+
+        Returns
+        -------
+        None
+        """
+        winner = game.winner()
+        if winner == -1:
+            game.ties += 1
+        else:
+            game.wins[winner] += 1
+        if self.metrics is not None:
+            self.metrics.increment("rounds_resolved")
+        names = (self.names.get((game.id, 0)), self.names.get((game.id, 1)))
+        self.scores.record(game.id, names, game.move_codes, winner)
+
+    def set_name(self, game_id, p, name):
+        """
+        Records the name a player's results are kept under on the leaderboard.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the player's game.
+        p : int
+            The player number (0 or 1).
+        name : str
+            The player's name. Blank names and names over MAX_NAME_SIZE bytes are ignored.
+
+        Returns
+        -------
+        None
+        """
+        name = name.strip()
+        if not name or len(name.encode()) > MAX_NAME_SIZE:
+            log.warning("invalid_name", game=game_id, player=p, name=name)
+            return
+        self.names[(game_id, p)] = name
+
+    def respond(self, channel, game_id, p, data):
+        """
+        Handles one message from a client and works out what to send back.
+
+        The game's lock is held while it is changed and published, so the two players' handlers
+        never interleave their changes. Every change to a game is published to the clients subscribed to it. A client that sent
+        "subscribe" gets the current state pushed straight away and from then on only receives
+        updates when the game changes, plus a reply to an explicit "get" if nothing was pushed.
+        Clients that did not subscribe get a snapshot in reply to every message, as before.
+        A client polling with "get:<version>" instead of "get" names the game version it already
+        has, and gets back only a "not modified" marker or the fields that changed since.
+        "name:<name>" sets the name the player is scored under, and "top:<n>" is answered with the
+        n best players on the leaderboard, whether the client subscribed or not. A version or n
+        that is not a number is ignored: "get:<version>" is answered with the whole snapshot,
+        and "top:<n>" with the DEFAULT_TOP best players.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The connection the message arrived on.
+        game_id : int
+            The unique ID of the client's game.
+        p : int
+            The player number (0 or 1).
+        data : str
+            The message received from the client.
+
+        Returns
+        -------
+        bytes
+            The snapshot, delta, "not modified" marker or leaderboard to send back to the client,
+            or None if nothing needs to be sent.
+        """
+        data, _, known = data.partition(":")
+        if data == "top":
+            return encode_leaderboard(self.scores.top(max(0, min(_parse_int(known, DEFAULT_TOP), MAX_TOP))))
+
+        subscription = self.subscriptions[game_id]
+        with self.games.locked(game_id) as game:
+            if data == "subscribe":
+                subscription.add(channel, game)
+                return None
+
+            if data == "name":
+                self.set_name(game_id, p, known)
+                known = ""
+            else:
+                game = self.handle_game_data(game, data, p)
+            payload, changed = subscription.publish(game)
+        if channel.subscribed and (changed or data != "get"):
+            return None
+        version = _parse_int(known, None)
+        if version is not None:
+            return subscription.since(version)
+        return payload
+
+    def handle_message(self, channel, game_id, p, data):
+        """
+        Handles one message from a client, on its own game or, after "rooms", on any of its games.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The connection the message arrived on.
+        game_id : int
+            The unique ID of the game the client was given on connecting.
+        p : int
+            The player number the client was given on connecting.
+        data : str
+            The message received from the client.
+
+        Returns
+        -------
+        bytes
+            The reply to send back to the client, or None if nothing needs to be sent.
+        """
+        if channel.rooms is not None:
+            return self.respond_rooms(channel, data)
+        if data == "rooms":
+            return self.open_rooms(channel, game_id, p)
+        return self.respond(channel, game_id, p, data)
+
+    def open_rooms(self, channel, game_id, p):
+        """
+        Turns a connection into a multi-room connection, which can play in and watch any number of games.
+
+        The game the client was given on connecting becomes its first room. From then on the
+        client sends:
+
+        - "join" to take a seat in another game, through the matchmaker like a new connection;
+        - "watch:<game_id>" to be pushed the updates of a game without playing in it;
+        - "@<game_id>:<message>" to send any single-game message ("Rock", "get:<version>",
+          "subscribe", "name:<name>", ...) to one of its games;
+        - "leave:<game_id>" to give up its seat in a game, which closes it, or stop watching it;
+        - "top:<n>" as before.
+
+        Every game update the connection receives is tagged with its game ID (see protocol.ROOM),
+        and closing one game only takes it off the connection. Closing the connection leaves all
+        of its games. A client that only wants to watch should leave its first game straight away.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The client's connection. It should not have subscribed to its game yet.
+        game_id : int
+            The unique ID of the client's game.
+        p : int
+            The client's player number in it.
+
+        Returns
+        -------
+        bytes
+            The JOINED reply for the client's first game.
+        """
+        channel.rooms = {}
+        self.open_room(channel, game_id, p)
+        log.info("rooms_opened", game=game_id, player=p)
+        return encode_joined(game_id, p)
+
+    def open_room(self, channel, game_id, p):
+        """
+        Adds a game to a multi-room connection and, if the client plays in it, registers it as the player.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The multi-room connection.
+        game_id : int
+            The unique ID of the game.
+        p : int
+            The client's player number in the game, or None if it only watches.
+
+        Returns
+        -------
+        RoomChannel
+            The game's channel on the connection.
+        """
+        room = channel.rooms[game_id] = RoomChannel(channel, game_id, p)
+        if p is not None:
+            self.channels[(game_id, p)] = room
+        return room
+
+    def respond_rooms(self, channel, data):
+        """
+        Handles one message on a multi-room connection; see open_rooms for the messages.
+
+        A message for a game the client is not in, or that was closed, is answered with a tagged
+        "left" notice. Clients watching a game may only get its state or subscribe to it. A game
+        ID that is not a number, which no reply could be tagged with, is logged and ignored, and
+        the connection stays open.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The multi-room connection.
+        data : str
+            The message received from the client.
+
+        Returns
+        -------
+        bytes
+            The reply to send back to the client, or None if nothing needs to be sent.
+        """
+        if data.startswith("@"):
+            game_id, _, message = data[1:].partition(":")
+            game_id = _parse_game_id(game_id)
+            if game_id is None:
+                log.warning("bad_game_id", data=data)
+                return None
+            data = message
+            room = channel.rooms.get(game_id)
+            if room is None:
+                return encode_room(game_id, encode_closed("left"))
+            if room.p is None and data != "subscribe" and data.partition(":")[0] != "get":
+                log.warning("spectator_move", game=game_id, data=data)
+                data = "get"
+            try:
+                payload = self.respond(room, game_id, room.p, data)
+            except KeyError:
+                return encode_room(game_id, encode_closed("left"))  # Closed since the message arrived.
+            return None if payload is None else encode_room(game_id, payload)
+
+        command, _, argument = data.partition(":")
+        if command in ("watch", "leave"):
+            game_id = _parse_game_id(argument)
+            if game_id is None:
+                log.warning("bad_game_id", data=data)
+                return None
+        if command == "join":
+            game_id, p = self.add_player(exclude=channel.rooms)
+            self.open_room(channel, game_id, p)
+            return encode_joined(game_id, p)
+        if command == "watch":
+            if game_id in channel.rooms:
+                return encode_room(game_id, NOT_MODIFIED)
+            room = self.open_room(channel, game_id, None)
+            try:
+                with self.games.locked(game_id) as game:
+                    self.subscriptions[game_id].add(room, game, spectator=True)
+            except KeyError:
+                room.hangup()
+                return encode_room(game_id, encode_closed("left"))
+            return None
+        if command == "leave":
+            room = channel.rooms.get(game_id)
+            if room is not None:
+                self.leave_room(room)
+            return encode_room(game_id, encode_closed("left"))
+        if command == "top":
+            return self.respond(channel, None, None, data)
+        log.warning("unknown_command", data=data)
+        return None
+
+    def leave_room(self, room):
+        """
+        Takes a game off a multi-room connection. If the client played in it, the game is closed
+        and the opponent told that the player left.
+
+        Parameters
+        ----------
+        room : RoomChannel
+            The game's channel on the connection.
+
+        Returns
+        -------
+        None
+        """
+        room.hangup()
+        if room.p is not None:
+            self.leave_game(room, room.game_id, room.p)
+            return
+        subscription = self.subscriptions.get(room.game_id)
+        if subscription is not None:
+            subscription.remove(room)
+
     def threaded_client(self, conn, p, game_id):
         """
         Handles a client connection in a separate thread.
 
-        This method sends the player number to the client, then enters a loop where it continuously receives data from the client.
-        If the game ID is not in the games dictionary, or if no data is received, it breaks the loop.
-        Otherwise, it handles the received data and sends the updated game object back to the client.
-        If an exception occurs during this process, it prints the error and breaks the loop.
+        This method sends the player number to the client, then enters a loop where it continuously receives framed messages from the client.
+        Each message is a length-prefixed frame read through a FrameBuffer, so one read may yield several messages or only part of one.
+        If the game ID is not in the games registry (unless the client switched to multi-room), or if the client disconnects, it breaks the loop.
+        Otherwise, it handles the received data with handle_message and sends back the binary game snapshot it returns, if any.
+        If an exception occurs during this process, it logs the error and breaks the loop.
         After breaking the loop, it cleans up the game and connection.
+        With metrics on, each message's recv (including the wait for the client), handle (including
+        serialize) and send times are recorded, along with message and byte counts.
 
         Parameters
         ----------
@@ -113,62 +514,410 @@ class Server:
         -------
         None
         """
-        conn.send(str.encode(str(p)))
+        metrics = self.metrics
+        channel = SocketChannel(conn, metrics, self.fanout)
+        idle = self.open_channel(channel, game_id, p)
+        channel.send(str.encode(str(p)))
+        frames = FrameBuffer()
 
         while True:
             try:
-                data = conn.recv(4096).decode()
+                if metrics is not None:
+                    start = time.perf_counter()
+                frame = frames.read_frame(conn)
 
-                if game_id not in self.games:
+                if channel.rooms is None and game_id not in self.games:
                     break
 
-                game = self.games[game_id]
-
-                if not data:
+                if frame is None:
                     break
 
-                game = self.handle_game_data(game, data, p)
-                conn.sendall(pickle.dumps(game))
+                if idle is not None:
+                    self.timers.touch(idle, self.idle_timeout)
+                if metrics is not None:
+                    received = time.perf_counter()
+                    metrics.observe("recv", received - start)
+                    metrics.increment("messages_in")
+                    metrics.increment("bytes_in", HEADER.size + len(frame))
+                payload = self.handle_message(channel, game_id, p, str(frame, "utf-8"))
+                if metrics is not None:
+                    handled = time.perf_counter()
+                    metrics.observe("handle", handled - received)
+                if payload is not None:
+                    channel.send(payload)
+                    if metrics is not None:
+                        metrics.observe("send", time.perf_counter() - handled)
 
             except Exception as e:
-                print(f"Error occurred: {e}")
+                log.warning("client_error", game=game_id, player=p, error=e)
                 break
 
-        self.cleanup_game(conn, game_id)
+        if idle is not None:
+            idle.cancel()
+        self.cleanup_game(channel, game_id, p)
 
-    def cleanup_game(self, conn, game_id):
+    def open_channel(self, channel, game_id, p):
         """
-        Receives data from the server and returns it.
+        Registers a new client connection and starts its timers.
 
-        This method attempts to receive data from the server and deserialize it using pickle.
-        If the receive and deserialization are successful, it returns the deserialized data.
-        If an error occurs during this process, it prints the error and returns None.
+        Parameters
+        ----------
+        channel : SocketChannel
+            The client's connection.
+        game_id : int
+            The unique ID of the client's game.
+        p : int
+            The player number (0 or 1).
+
+        Returns
+        -------
+        Timer
+            The connection's idle timer, to be touched on every message, or None if there is no
+            idle timeout.
+        """
+        self.connected.add(channel)
+        self.channels[(game_id, p)] = channel
+        if self.metrics is not None:
+            self.metrics.increment("connections_opened")
+        if self.heartbeat_interval is not None:
+            self.timers.schedule(self.heartbeat_interval, self.heartbeat, channel)
+        if self.idle_timeout is None:
+            return None
+        return self.timers.schedule(self.idle_timeout, self.expire_idle, channel, game_id, p)
+
+    def cleanup_game(self, channel, game_id, p=None):
+        """
+        Closes a client connection and the game it belonged to, or every game of a multi-room connection.
 
         Parameters
         ----------
+        channel : SocketChannel
+            The connection of the client that left.
+        game_id : int
+            The unique ID of the client's game.
+        p : int
+            The client's player number.
+
+        Returns
+        -------
         None
+        """
+        log.info("disconnected", game=game_id)
+        if self.metrics is not None:
+            self.metrics.increment("connections_closed")
+        if channel.rooms is None:
+            self.leave_game(channel, game_id, p)
+        else:
+            for room in list(channel.rooms.values()):
+                self.leave_room(room)
+        self.connected.discard(channel)
+        channel.close()
+
+    def leave_game(self, channel, game_id, p):
+        """
+        Removes a player from their game and closes it.
+
+        If the player was still waiting for an opponent, they are taken out of the matchmaking queue.
+        The game is then closed with close_game, which tells the opponent that the player left.
+
+        Parameters
+        ----------
+        channel : SocketChannel or RoomChannel
+            The channel the player is registered under.
+        game_id : int
+            The unique ID of the game.
+        p : int
+            The player number.
+
+        Returns
+        -------
+        None
+        """
+        if self.channels.get((game_id, p)) is channel:
+            del self.channels[(game_id, p)]
+        self.matchmaker.cancel(game_id)
+        subscription = self.subscriptions.get(game_id)
+        if subscription is not None:
+            subscription.remove(channel)
+        self.close_game(game_id)
+
+    def close_game(self, game_id, reason="left"):
+        """
+        Deletes a game, tells the clients still connected to it why, and disconnects them.
+
+        Clients are disconnected straight away, whether they subscribed or poll, so that nobody
+        waits for updates that will never come and their connections are freed. Clients watching
+        the game from a multi-room connection are told as well; for them and for players on
+        multi-room connections, only the game is taken off the connection.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+        reason : str
+            Why the game was closed, one of protocol.CLOSE_REASONS.
 
         Returns
         -------
-        object
-            The data received from the server, or None if there was a receive error.
+        None
+        """
+        self.names.pop((game_id, 0), None)
+        self.names.pop((game_id, 1), None)
+        timer = self.move_timers.pop(game_id, None)
+        if timer is not None:
+            timer.cancel()
+        # Both channels are taken before either is hung up, as the hangup makes the player's handler
+        # close the game again, which would otherwise tell the opponent the player left.
+        players = [self.channels.pop((game_id, p), None) for p in (0, 1)]
+        # The notice is pushed, never sent with a blocking send: this may run on the timer thread,
+        # which a client that stopped reading must not hold up. Whatever does not fit in the
+        # socket is sent when the player is hung up, as far as it fits then.
+        broadcast = Broadcast(game_id, encode_closed(reason))
+        for channel in players:
+            if channel is not None:
+                try:
+                    channel.push(broadcast)
+                except OSError:
+                    pass
+        # The game is only removed once the players were told: a handler that finds its game gone
+        # closes its connection, and must not do so before the notice is out.
+        if self.games.remove(game_id) is not None:
+            log.info("game_closed", game=game_id, reason=reason)
+        subscription = self.subscriptions.pop(game_id, None)
+        spectators = []
+        if subscription is not None:
+            with subscription.lock:
+                spectators = subscription.spectators + [channel for channel in subscription.channels
+                                                        if channel not in players]
+        for channel in players:
+            if channel is not None:
+                channel.hangup()
+        # Spectators are told without waiting for them either; only the game is taken off their connection.
+        for channel in spectators:
+            try:
+                channel.push(broadcast)
+            except OSError:
+                pass
+            channel.hangup()
+
+    def uses_timers(self):
+        """Returns whether an idle or move timeout or a heartbeat interval is set."""
+        return any(value is not None for value in (self.idle_timeout, self.move_timeout, self.heartbeat_interval))
+
+    def expire_idle(self, channel, game_id, p):
+        """
+        Closes the game of a client that sent nothing for idle_timeout seconds. Called by the idle timer.
+
+        A multi-room client has every game it plays in closed, and is disconnected.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The client's connection.
+        game_id : int
+            The unique ID of the client's game.
+        p : int
+            The player number (0 or 1).
+
+        Returns
+        -------
+        None
+        """
+        log.info("idle_expired", game=game_id, player=p)
+        if channel.rooms is None:
+            self.close_game(game_id, "idle")
+            return
+        for room in list(channel.rooms.values()):
+            if room.p is not None:
+                self.close_game(room.game_id, "idle")
+        channel.hangup()
+
+    def expire_move(self, game_id):
+        """
+        Closes a game that went move_timeout seconds without a move or reset. Called by the move timer.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        None
+        """
+        log.info("move_expired", game=game_id)
+        self.close_game(game_id, "move_timeout")
+
+    def heartbeat(self, channel):
+        """
+        Pushes a "not modified" marker to a subscribed or multi-room client and schedules the next one, until
+        the client disconnects. A client that can no longer be reached is hung up.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The client's connection.
+
+        Returns
+        -------
+        None
+        """
+        if channel not in self.connected:
+            return
+        if channel.subscribed or channel.rooms is not None:
+            try:
+                channel.push(HEARTBEAT)
+            except OSError:
+                channel.hangup()
+                return
+        self.timers.schedule(self.heartbeat_interval, self.heartbeat, channel)
+
+    def expire_waiting(self):
+        """
+        Closes the games of players who waited longer than the matchmaker's wait_timeout.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        for game_id in self.matchmaker.expire():
+            log.info("wait_expired", game=game_id)
+            self.close_game(game_id, "wait_timeout")
+
+    def reap_waiting(self, interval=1.0):
+        """
+        Calls expire_waiting every interval seconds, forever. Runs on its own thread.
+        """
+        while True:
+            time.sleep(interval)
+            self.expire_waiting()
+
+    def stats(self):
+        """
+        Returns a summary of the server's current load.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            The number of open client connections and of active games.
+        """
+        return {"connections": len(self.connected), "games": len(self.games)}
+
+    def metrics_text(self):
+        """
+        Returns the server's metrics as plain text: the current stats, then counters and histograms.
+        """
+        return self.metrics.render(self.stats())
+
+    def start_metrics(self, port=None, interval=None):
+        """
+        Exposes the metrics over HTTP, prints them periodically, or both. Metrics must be on.
+
+        Parameters
+        ----------
+        port : int
+            The local port to serve the metrics on as plain text, default is not to serve them.
+        interval : float
+            Seconds between printing the metrics, default is not to print them.
+
+        Returns
+        -------
+        ThreadingHTTPServer
+            The metrics endpoint, or None if no port was given.
+        """
+        endpoint = None
+        if port is not None:
+            endpoint = serve_metrics(self.metrics_text, self.server, port)
+            log.info("metrics_listening", port=endpoint.server_address[1])
+        if interval is not None:
+            start_new_thread(dump_metrics, (self.metrics_text, interval))
+        return endpoint
+
+    def add_player(self, bucket=0, exclude=()):
+        """
+        Assigns a newly connected player to a game.
+
+        The matchmaker either pairs the player with the longest-waiting player in the same bucket,
+        making them player 1 of that game, or starts a new game with them as player 0. When a game
+        gets its second player it is marked as ready and the waiting player's subscription is told.
+
+        Parameters
+        ----------
+        bucket : hashable
+            The skill bucket to match the player in, default is a single shared bucket.
+        exclude : container
+            Games the player must not be paired into, because they are already in them.
+
+        Returns
+        -------
+        tuple
+            The game ID and the player number (0 or 1) for the new connection.
+        """
+        while True:
+            game_id, p = self.matchmaker.join(bucket, exclude, self.create_game)
+            if p == 0:
+                log.info("game_created", game=game_id)
+                return game_id, p
+            if self.games.join(game_id) is not None:
+                self.notify_joined(game_id)
+                return game_id, p
+            # Games exist before anyone can be paired into them, so the game is gone: the waiting
+            # player left or timed out just as we were paired with them. Queue up again.
+
+    def create_game(self, game_id):
+        """
+        Adds a new game and its subscription. Called by the matchmaker before anyone can join it.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        None
+        """
+        self.subscriptions[game_id] = Subscription(metrics=self.metrics, fanout=self.fanout)
+        self.games.create(game_id)
+
+    def notify_joined(self, game_id):
+        """
+        Publishes a game that just got its second player, so a subscribed waiting player hears of it,
+        and starts the game's move timer.
+
+        Parameters
+        ----------
+        game_id : int
+            The unique ID of the game.
+
+        Returns
+        -------
+        None
         """
-        print("Lost connection")
         try:
-            del self.games[game_id]
-            print("Closing Game", game_id)
-        except Exception as e:
-            print(f"Error while closing game: {e}")
-        self.idCount -= 1
-        conn.close()
+            with self.games.locked(game_id) as game:
+                self.subscriptions[game_id].publish(game)
+                if self.move_timeout is not None:
+                    self.move_timers[game_id] = self.timers.schedule(self.move_timeout, self.expire_move, game_id)
+        except KeyError:
+            pass  # The waiting player just left; the new player's handler will find the game gone.
 
     def run_server(self):
         """
         Runs the server, accepting new connections and starting new games.
 
         This method enters a loop where it continuously accepts new connections.
-        For each new connection, it increments the idCount and calculates the game_id.
-        If the idCount is odd, it creates a new game. If the idCount is even, it marks the game as ready and sets the player number to 1.
+        If a wait timeout is set, a background thread disconnects players who waited too long for an opponent.
+        If idle or move timeouts or heartbeats are set, another thread drives the timer wheel.
+        For each new connection, it assigns the player to a game using add_player.
         It then starts a new thread to handle the client connection.
 
         Parameters
@@ -179,20 +928,16 @@ class Server:
         -------
         None
         """
+        if self.matchmaker.wait_timeout is not None:
+            start_new_thread(self.reap_waiting, ())
+        if self.uses_timers():
+            start_new_thread(self.timers.run, ())
         while True:
             conn, addr = self.s.accept()
-            print("Connected to:", addr)
-
-            self.idCount += 1
-            p = 0
-            game_id = (self.idCount - 1) // 2
-            if self.idCount % 2 == 1:
-                self.games[game_id] = Game(game_id)
-                print("Creating a new game...")
-            else:
-                self.games[game_id].ready = True
-                p = 1
+            self.socket_options.apply(conn)
+            log.info("connected", peer=addr)
 
+            game_id, p = self.add_player()
             start_new_thread(self.threaded_client, (conn, p, game_id))
 
 if __name__ == "__main__":
@@ -202,14 +947,94 @@ if __name__ == "__main__":
     # Add command-line arguments for server address and port number
     parser.add_argument("server_address", type=str, help="Server address (e.g., 'localhost')")
     parser.add_argument("port_number", type=int, help="Port number (e.g., 5555)")
+    parser.add_argument("--mode", choices=["threaded", "asyncio", "pool", "sharded"], default="threaded",
+                        help="Serving mode: one thread per connection, a single asyncio event loop, "
+                             "a selector feeding a bounded worker pool, "
+                             "or several threaded worker processes sharing the port")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes in sharded mode (default: number of CPUs)")
+    parser.add_argument("--pool-workers", type=int, default=32,
+                        help="Number of worker threads in pool mode")
+    parser.add_argument("--pool-queue", type=int, default=1024,
+                        help="Connections that may wait for a worker in pool mode before requests are rejected")
+    parser.add_argument("--max-connections", type=int, default=10000,
+                        help="Open connections in pool mode before new ones are rejected")
+    parser.add_argument("--wait-timeout", type=float, default=None,
+                        help="Seconds a player may wait for an opponent before being disconnected")
+    parser.add_argument("--match-log", default=None,
+                        help="File to record every round in and rebuild the leaderboard from on startup "
+                             "(all but sharded mode)")
+    parser.add_argument("--variant", choices=list(VARIANTS), default="classic",
+                        help="The moves games are played with (all but sharded mode)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Record metrics and serve them as plain text on this port")
+    parser.add_argument("--metrics-interval", type=float, default=None,
+                        help="Record metrics and print them every this many seconds")
+
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Lowest level of events to log")
+    parser.add_argument("--log-format", default="kv", choices=FORMATS,
+                        help="Log events as key=value lines or as JSON lines")
+
+    parser.add_argument("--push-queue", type=int, default=64,
+                        help="Pushed updates queued for a slow subscriber before more are dropped "
+                             "(all but sharded mode)")
+    parser.add_argument("--push-policy", choices=PUSH_POLICIES, default="coalesce",
+                        help="Whether a newer update for a game replaces the one queued for a slow spectator, "
+                             "or is queued behind it (players' updates are never replaced)")
+
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Seconds a client may send nothing before its game is closed (all but sharded mode)")
+    parser.add_argument("--move-timeout", type=float, default=None,
+                        help="Seconds a game may go without a move before it is closed (all but sharded mode)")
+    parser.add_argument("--heartbeat-interval", type=float, default=None,
+                        help="Seconds between keepalives pushed to subscribed clients (all but sharded mode)")
+
+    parser.add_argument("--no-nodelay", dest="nodelay", action="store_false",
+                        help="Leave Nagle's algorithm on, so small replies may wait for the previous one's ACK")
+    parser.add_argument("--backlog", type=int, default=1024,
+                        help="Connections waiting to be accepted before more are refused")
+    parser.add_argument("--no-reuse-addr", dest="reuse_addr", action="store_false",
+                        help="Don't set SO_REUSEADDR, so a restart fails while old connections are in TIME_WAIT")
+    parser.add_argument("--keepalive", type=float, default=None,
+                        help="Seconds a connection may be idle before TCP keepalive probes start (default: off)")
+    parser.add_argument("--keepalive-interval", type=float, default=None,
+                        help="Seconds between TCP keepalive probes")
+    parser.add_argument("--keepalive-count", type=int, default=None,
+                        help="Unanswered TCP keepalive probes before a connection is dropped")
+    parser.add_argument("--sndbuf", type=int, default=None, help="Socket send buffer size in bytes")
+    parser.add_argument("--rcvbuf", type=int, default=None, help="Socket receive buffer size in bytes")
 
     # Parse the command-line arguments
     args = parser.parse_args()
+    log_options = {"level": args.log_level, "fmt": args.log_format}
+    setup_logging(**log_options)
 
     # Create a Server object with the specified server address and port number
-    server = Server()
-    server.server = args.server_address
-    server.port = args.port_number
+    metrics = args.metrics_port is not None or args.metrics_interval is not None
+    options = {"wait_timeout": args.wait_timeout, "match_log": args.match_log, "metrics": metrics,
+               "idle_timeout": args.idle_timeout, "move_timeout": args.move_timeout,
+               "heartbeat_interval": args.heartbeat_interval, "push_queue": args.push_queue,
+               "push_policy": args.push_policy, "rules": VARIANTS[args.variant]}
+    options["socket_options"] = SocketOptions(
+        nodelay=args.nodelay, backlog=args.backlog, reuse_addr=args.reuse_addr, keepalive=args.keepalive,
+        keepalive_interval=args.keepalive_interval, keepalive_count=args.keepalive_count,
+        sndbuf=args.sndbuf, rcvbuf=args.rcvbuf)
+    if args.mode == "sharded":
+        from shards import Lobby
+        server = Lobby(args.server_address, args.port_number, args.workers, log_options=log_options,
+                       socket_options=options["socket_options"], metrics=metrics)
+    elif args.mode == "asyncio":
+        from async_server import AsyncServer
+        server = AsyncServer(args.server_address, args.port_number, **options)
+    elif args.mode == "pool":
+        from pool_server import PoolServer
+        server = PoolServer(args.server_address, args.port_number, args.pool_workers, args.pool_queue,
+                            args.max_connections, **options)
+    else:
+        server = Server(args.server_address, args.port_number, **options)
+    if metrics:
+        server.start_metrics(args.metrics_port, args.metrics_interval)
 
     # Start the server
     server.run_server()
@@ -0,0 +1,190 @@
+import time
+
+# How long the result of a round stays up, in seconds.
+RESULT_TIME = 2.0
+LABEL_COLOR = (0, 255, 255)
+MOVE_COLOR = (0, 0, 0)
+RESULT_COLOR = (255, 0, 0)
+
+
+class Session:
+    """
+    The client's state machine: the game on the screen, whether a round's result is up, and
+    which moves may be played.
+
+    It knows nothing of pygame or of windows, so bots, tools and tests can drive a client
+    without loading either. A frame is described to a view, anything with the text and rect
+    methods of render.Renderer, and the GUI client only turns clicks into play calls and
+    presents the view.
+
+    ...
+
+    Attributes
+    ----------
+    connection : network.BackgroundNetwork
+        the connection to the server
+    player : int
+        the player number (0 or 1)
+    result_time : float
+        how long a round's result stays up, in seconds
+    finished : Game
+        the round whose result is up, or None
+    result_until : float
+        when the result is taken down, in time.monotonic seconds
+
+    Methods
+    -------
+    start():
+        Subscribes to the game and returns it.
+    update(now=None):
+        Takes the result down when its time is up, or puts up the next finished round's.
+    play(move):
+        Plays a move, if the player may move now.
+    result(game):
+        Returns what a finished round means for the player, e.g. "You Won!".
+    move_texts(game):
+        Returns the texts shown for the player's and the opponent's moves.
+    describe(view, width, height, buttons=()):
+        Adds everything on the screen to a view.
+    close():
+        Stops the connection's I/O thread and closes the connection.
+    """
+
+    def __init__(self, connection, player, result_time=RESULT_TIME):
+        self.connection = connection
+        self.player = player
+        self.result_time = result_time
+        self.finished = None
+        self.result_until = 0.0
+
+    def start(self):
+        """
+        Subscribes to the game, unless already done, and returns it.
+
+        Returns
+        -------
+        Game
+            The current game, or None if there was an error.
+        """
+        if self.connection.thread is not None:
+            return self.connection.game
+        return self.connection.start()
+
+    @property
+    def error(self):
+        """Why the connection ended, None while it is open."""
+        return self.connection.error
+
+    @property
+    def game(self):
+        """The game on the screen: the finished round while its result is up, else the newest game."""
+        return self.finished if self.finished is not None else self.connection.game
+
+    def update(self, now=None):
+        """
+        Takes the result down when its time is up, or puts up the result of the next finished
+        round and resets the game for the next one.
+
+        Parameters
+        ----------
+        now : float
+            The time.monotonic time, default is now.
+
+        Returns
+        -------
+        Game
+            The game on the screen.
+        """
+        now = time.monotonic() if now is None else now
+        if self.finished is not None and now >= self.result_until:
+            self.finished = None
+        if self.finished is None:
+            self.finished = self.connection.next_round()
+            if self.finished is not None:
+                # The round is reset straight away; its result stays up while the reset is on its way.
+                self.connection.post("reset")
+                self.result_until = now + self.result_time
+        return self.game
+
+    def play(self, move):
+        """
+        Plays a move, if the game has both players, this player has not moved yet and no result
+        is up, so that a reset still on its way can't wipe the move out.
+
+        Parameters
+        ----------
+        move : str
+            The move, e.g. "Rock".
+
+        Returns
+        -------
+        bool
+            Whether the move was sent.
+        """
+        game = self.connection.game
+        if self.finished is not None or game is None or not game.connected():
+            return False
+        if game.p2Went if self.player == 1 else game.p1Went:
+            return False
+        self.connection.post(move)
+        return True
+
+    def result(self, game):
+        """Returns what a finished round means for the player: "You Won!", "Tie Game!" or "You Lost..."."""
+        if game.winner() == self.player:
+            return "You Won!"
+        elif game.winner() == -1:
+            return "Tie Game!"
+        else:
+            return "You Lost..."
+
+    def move_texts(self, game):
+        """
+        Returns the texts shown for the player's move and the opponent's.
+
+        Both moves are shown once both players moved; until then the opponent's move is only
+        "Locked In".
+        """
+        move1 = game.get_player_move(0)
+        move2 = game.get_player_move(1)
+        if game.bothWent():
+            texts = (move1, move2)
+        else:
+            texts = (move1 if game.p1Went and self.player == 0 else "Locked In" if game.p1Went else "Waiting...",
+                     move2 if game.p2Went and self.player == 1 else "Locked In" if game.p2Went else "Waiting...")
+        return texts[::-1] if self.player == 1 else texts
+
+    def describe(self, view, width, height, buttons=()):
+        """
+        Adds everything on the screen to a view.
+
+        Parameters
+        ----------
+        view : render.Renderer
+            Anything with Renderer's text and rect methods.
+        width, height : int
+            The size of the screen.
+        buttons : list of Button
+            The move buttons, shown once the game has both players.
+
+        Returns
+        -------
+        None
+        """
+        game = self.game
+        if not game.connected():
+            view.text("Waiting for Player...", 80, (width / 2, height / 2), RESULT_COLOR)
+            return
+        view.text("Your Move", 60, (80, 200), LABEL_COLOR)
+        view.text("Opponents", 60, (380, 200), LABEL_COLOR)
+        mine, theirs = self.move_texts(game)
+        view.text(mine, 60, (100, 350), MOVE_COLOR)
+        view.text(theirs, 60, (400, 350), MOVE_COLOR)
+        for btn in buttons:
+            btn.add_to(view)
+        if self.finished is not None:
+            view.text(self.result(self.finished), 90, (width / 2, height / 2), RESULT_COLOR, center=True)
+
+    def close(self):
+        """Stops the connection's I/O thread and closes the connection."""
+        self.connection.close()
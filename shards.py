@@ -0,0 +1,428 @@
+import itertools
+import json
+import multiprocessing
+import os
+import select
+import socket
+import threading
+import time
+from _thread import start_new_thread
+from protocol import ProtocolError
+from server import Server
+from logs import get_logger, setup_logging
+from metrics import Metrics, dump_metrics, serve_metrics
+from sockopts import SocketOptions
+
+log = get_logger("shards")
+
+
+class ShardWorker(Server):
+    """
+    A threaded server running as one of several processes that share the same port.
+
+    Every worker listens with SO_REUSEPORT, so the kernel spreads new connections across them,
+    and each worker owns its own game table and GIL. Players can only share a game if they are
+    served by the same worker, so instead of pairing arrivals itself a worker hands each new
+    connection to the Lobby, which passes it back to whichever worker should host it.
+
+    ...
+
+    Attributes
+    ----------
+    control : socket
+        the Unix socket connected to the lobby
+    waiting : int
+        the ID of this worker's game that is waiting for a second player, or None
+    ids : iterator
+        game IDs for this worker, interleaved with the other workers' so they never collide
+
+    Methods
+    -------
+    host(conn):
+        Starts a new game with the connection as player 0.
+    guest(conn):
+        Adds the connection as player 1 of the game waiting for a second player.
+    serve_control():
+        Handles connections placed on this worker by the lobby.
+    report_stats(interval):
+        Periodically sends this worker's stats, and metrics if they are on, to the lobby.
+    """
+
+    def __init__(self, index, shards, control, server="localhost", port=5555, socket_options=None,
+                 metrics=False):
+        """
+        Constructs a worker and binds it to the shared port.
+
+        Parameters
+        ----------
+        index : int
+            The worker's number, from 0 to shards - 1.
+        shards : int
+            The total number of workers.
+        control : socket
+            The Unix socket connected to the lobby.
+        server : str
+            The address to bind to.
+        port : int
+            The port shared by all workers.
+        socket_options : SocketOptions
+            The TCP options of the worker's listening socket and connections, default is SocketOptions().
+        metrics : bool
+            Whether to record latency histograms and counters for the lobby to add up, default is off.
+        """
+        options = socket_options if socket_options is not None else SocketOptions()
+        # Every worker listens on the same port, and the kernel spreads the connections between them.
+        super().__init__(server, port, metrics=metrics, socket_options=options.copy(reuse_port=True))
+        self.control = control
+        self.control_lock = threading.Lock()
+        self.pairing_lock = threading.Lock()
+        self.waiting = None
+        self.ids = itertools.count(index, shards)
+
+    def send_control(self, message, conn=None):
+        """Sends a message to the lobby, passing the connection's file descriptor along if given."""
+        with self.control_lock:
+            if conn is None:
+                self.control.send(message)
+            else:
+                socket.send_fds(self.control, [message], [conn.fileno()])
+
+    def host(self, conn):
+        """
+        Starts a new game with the connection as player 0.
+
+        Parameters
+        ----------
+        conn : socket
+            The client connection placed here by the lobby.
+        """
+        with self.pairing_lock:
+            game_id = next(self.ids)
+            self.create_game(game_id)
+            self.waiting = game_id
+        log.info("game_created", game=game_id)
+        start_new_thread(self.threaded_client, (conn, 0, game_id))
+
+    def guest(self, conn):
+        """
+        Adds the connection as player 1 of the game waiting for a second player.
+
+        If the waiting player left while this one was being handed over, the connection is sent back
+        to the lobby to be placed again.
+
+        Parameters
+        ----------
+        conn : socket
+            The client connection placed here by the lobby.
+        """
+        with self.pairing_lock:
+            game_id, self.waiting = self.waiting, None
+            game = None if game_id is None else self.games.join(game_id)
+        if game is None:
+            self.send_control(b"join", conn)
+            conn.close()
+            return
+        self.notify_joined(game_id)
+        start_new_thread(self.threaded_client, (conn, 1, game_id))
+
+    def cleanup_game(self, channel, game_id, p=None):
+        """
+        Closes a client connection and its game, telling the lobby if it was still waiting for an opponent.
+
+        Parameters
+        ----------
+        channel : SocketChannel
+            The connection of the client that left.
+        game_id : int
+            The unique ID of the client's game.
+        p : int
+            The client's player number.
+        """
+        with self.pairing_lock:
+            abandoned = game_id == self.waiting
+            if abandoned:
+                self.waiting = None
+        if abandoned:
+            self.send_control(b"abandon")
+        super().cleanup_game(channel, game_id, p)
+
+    def open_rooms(self, channel, game_id, p):
+        """
+        Refuses to make a multi-room connection: games are paired by the lobby, which a worker
+        cannot ask for a seat on behalf of a connection it already serves.
+
+        Raises
+        ------
+        ProtocolError
+            Always, so the client is disconnected.
+        """
+        raise ProtocolError("Multi-room connections are not supported in sharded mode")
+
+    def serve_control(self):
+        """
+        Handles connections placed on this worker by the lobby.
+
+        Exits the process when the lobby goes away, since no new player could be paired without it.
+        """
+        while True:
+            message, fds, _, _ = socket.recv_fds(self.control, 64, 1)
+            if not message:
+                os._exit(0)
+            conn = socket.socket(fileno=fds[0])
+            if message == b"host":
+                self.host(conn)
+            else:
+                self.guest(conn)
+
+    def report_stats(self, interval):
+        """
+        Periodically sends this worker's stats, and metrics if they are on, to the lobby.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between reports.
+        """
+        while True:
+            time.sleep(interval)
+            report = {"stats": self.stats()}
+            if self.metrics is not None:
+                report["metrics"] = self.metrics.snapshot()
+            self.send_control(b"stats" + json.dumps(report).encode())
+
+    def run_server(self, stats_interval=1.0):
+        """
+        Accepts connections on the shared port and hands each one to the lobby for pairing.
+
+        Parameters
+        ----------
+        stats_interval : float
+            Seconds between stats reports to the lobby.
+        """
+        start_new_thread(self.serve_control, ())
+        start_new_thread(self.report_stats, (stats_interval,))
+        while True:
+            conn, addr = self.s.accept()
+            self.socket_options.apply(conn)
+            log.info("connected", peer=addr)
+            self.send_control(b"join", conn)
+            conn.close()
+
+
+def _run_worker(index, shards, control, inherited, server, port, stats_interval, log_options, socket_options,
+                metrics):
+    """Entry point of a worker process."""
+    if log_options is not None:
+        # The lobby's log writer thread does not survive the fork, so the worker starts its own.
+        setup_logging(**log_options)
+    for sock in inherited:
+        sock.close()
+    ShardWorker(index, shards, control, server, port, socket_options, metrics).run_server(stats_interval)
+
+
+class Lobby:
+    """
+    Launches the worker processes of a sharded server and pairs players across them.
+
+    Workers send every new connection here. The lobby remembers which worker holds the one player
+    waiting for an opponent, and passes the next arrival's socket to that worker, so both players of
+    a game always end up in the same process. Each handoff is a single file-descriptor pass over a
+    Unix socket; the game traffic itself never goes through the lobby.
+
+    ...
+
+    Attributes
+    ----------
+    server : str
+        the address the workers bind to
+    port : int
+        the port the workers share
+    workers : int
+        the number of worker processes, default is the number of CPUs
+    log_options : dict
+        the arguments each worker passes to logs.setup_logging, or None to leave logging alone
+    socket_options : SocketOptions
+        the TCP options of every worker's listening socket and connections, or None for the defaults
+    metrics : bool
+        whether the workers record latency histograms and counters, default is off
+    waiting : int
+        the index of the worker holding the player waiting for an opponent, or None
+    shard_stats : dict
+        the last stats reported by each worker, with the worker index as the key
+    shard_metrics : dict
+        the last metrics snapshot reported by each worker, with the worker index as the key
+
+    Methods
+    -------
+    start():
+        Reserves the port and starts the worker processes.
+    route(index, message, fds):
+        Handles one control message from a worker.
+    stats():
+        Returns the stats of all workers added together.
+    metrics_text():
+        Returns the metrics of all workers added together, as plain text.
+    start_metrics(port=None, interval=None):
+        Exposes the combined metrics over HTTP, prints them periodically, or both.
+    serve_forever():
+        Handles control messages from the workers until they all exit.
+    run_server():
+        Starts the workers and serves them.
+    """
+
+    def __init__(self, server="localhost", port=5555, workers=None, stats_interval=1.0, log_options=None,
+                 socket_options=None, metrics=False):
+        self.server = server
+        self.port = port
+        self.workers = workers or os.cpu_count()
+        self.stats_interval = stats_interval
+        self.log_options = log_options
+        self.socket_options = socket_options
+        self.metrics = metrics
+        self.waiting = None
+        self.controls = []
+        self.processes = []
+        self.shard_stats = {}
+        self.shard_metrics = {}
+        self.reservation = None
+
+    def start(self):
+        """
+        Reserves the port and starts the worker processes.
+
+        The lobby binds the port itself first without listening, which receives no connections but
+        makes port 0 resolve to a single port that every worker can then join.
+        """
+        self.reservation = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.reservation.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.reservation.bind((self.server, self.port))
+        self.port = self.reservation.getsockname()[1]
+
+        context = multiprocessing.get_context("fork")
+        for index in range(self.workers):
+            control, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            inherited = self.controls + [control, self.reservation]
+            process = context.Process(
+                target=_run_worker,
+                args=(index, self.workers, child, inherited, self.server, self.port, self.stats_interval,
+                      self.log_options, self.socket_options, self.metrics),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self.controls.append(control)
+            self.processes.append(process)
+        log.info("workers_started", workers=self.workers, port=self.port)
+
+    def route(self, index, message, fds):
+        """
+        Handles one control message from a worker.
+
+        Parameters
+        ----------
+        index : int
+            The worker the message came from.
+        message : bytes
+            "join" with a connection to place, "abandon" when the worker's waiting player left,
+            or "stats" followed by the worker's stats and metrics as JSON.
+        fds : list
+            File descriptors passed with the message.
+        """
+        if message == b"join":
+            if self.waiting is None:
+                target, role = index, b"host"
+                self.waiting = index
+            else:
+                target, role = self.waiting, b"guest"
+                self.waiting = None
+            socket.send_fds(self.controls[target], [role], fds)
+            for fd in fds:
+                os.close(fd)
+        elif message == b"abandon":
+            if self.waiting == index:
+                self.waiting = None
+        elif message.startswith(b"stats"):
+            report = json.loads(message[len(b"stats"):])
+            self.shard_stats[index] = report["stats"]
+            if "metrics" in report:
+                self.shard_metrics[index] = report["metrics"]
+
+    def stats(self):
+        """
+        Returns the stats of all workers added together.
+
+        Returns
+        -------
+        dict
+            The summed stats, plus the number of workers that have reported.
+        """
+        totals = {"workers": len(self.shard_stats)}
+        # The metrics endpoint calls this from its own thread, so copy the reports before adding them up.
+        for stats in list(self.shard_stats.values()):
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def metrics_text(self):
+        """
+        Returns the metrics of all workers added together as plain text: the combined stats, then
+        counters and histograms.
+        """
+        metrics = Metrics()
+        for snapshot in list(self.shard_metrics.values()):
+            metrics.add(snapshot)
+        return metrics.render(self.stats())
+
+    def start_metrics(self, port=None, interval=None):
+        """
+        Exposes the combined metrics over HTTP, prints them periodically, or both. Metrics must be on.
+
+        Parameters
+        ----------
+        port : int
+            The local port to serve the metrics on as plain text, default is not to serve them.
+        interval : float
+            Seconds between printing the metrics, default is not to print them.
+
+        Returns
+        -------
+        ThreadingHTTPServer
+            The metrics endpoint, or None if no port was given.
+        """
+        endpoint = None
+        if port is not None:
+            endpoint = serve_metrics(self.metrics_text, self.server, port)
+            log.info("metrics_listening", port=endpoint.server_address[1])
+        if interval is not None:
+            start_new_thread(dump_metrics, (self.metrics_text, interval))
+        return endpoint
+
+    def serve_forever(self):
+        """
+        Handles control messages from the workers until they all exit, logging the aggregate stats
+        whenever they change.
+        """
+        index_of = {control: index for index, control in enumerate(self.controls)}
+        last_logged = None
+        while index_of:
+            readable, _, _ = select.select(list(index_of), [], [], self.stats_interval)
+            for control in readable:
+                # Large enough for a report with every worker's histograms.
+                message, fds, _, _ = socket.recv_fds(control, 65536, 1)
+                if not message:
+                    log.warning("worker_exited", worker=index_of[control])
+                    if self.waiting == index_of.pop(control):
+                        self.waiting = None
+                    continue
+                self.route(index_of[control], message, fds)
+            stats = self.stats()
+            if stats != last_logged:
+                log.info("shard_stats", **stats)
+                last_logged = stats
+
+    def run_server(self):
+        """
+        Starts the workers and serves them.
+        """
+        self.start()
+        self.serve_forever()
@@ -0,0 +1,136 @@
+import socket
+
+
+class SocketOptions:
+    """
+    The TCP options of the server's listening socket, the connections it accepts and the clients'
+    sockets, shared by the server and Network so that both ends are tuned the same way.
+
+    The defaults suit the game's traffic of small request and reply messages: Nagle's algorithm
+    is off, so a message is sent at once instead of waiting for the ACK of the one before, which
+    the peer may delay; the listen backlog absorbs bursts of connections, which would otherwise
+    have their SYNs dropped and retried a second later; and a restarted server can bind its port
+    while connections of the old one are still in TIME_WAIT.
+
+    ...
+
+    Attributes
+    ----------
+    nodelay : bool
+        whether to set TCP_NODELAY, turning Nagle's algorithm off
+    backlog : int
+        the most connections waiting to be accepted; the system may cap it (net.core.somaxconn on Linux)
+    reuse_addr : bool
+        whether to set SO_REUSEADDR on the listening socket
+    reuse_port : bool
+        whether to set SO_REUSEPORT on the listening socket, so several processes can listen on the same port
+    keepalive : float
+        seconds a connection may be idle before the kernel starts probing it, or None to leave
+        TCP keepalive off
+    keepalive_interval : float
+        seconds between keepalive probes, or None for the system default
+    keepalive_count : int
+        unanswered probes before the connection is dropped, or None for the system default
+    sndbuf : int
+        the socket send buffer size in bytes, or None for the system default
+    rcvbuf : int
+        the socket receive buffer size in bytes, or None for the system default
+
+    Methods
+    -------
+    copy(**changes):
+        Returns a copy with some of the options changed.
+    apply(sock):
+        Sets the per-connection options on a socket.
+    socket():
+        Returns a new TCP socket with the per-connection options set, ready to connect.
+    listen(address, port):
+        Returns a TCP socket bound to an address and port and listening.
+    """
+
+    def __init__(self, nodelay=True, backlog=1024, reuse_addr=True, reuse_port=False, keepalive=None,
+                 keepalive_interval=None, keepalive_count=None, sndbuf=None, rcvbuf=None):
+        self.nodelay = nodelay
+        self.backlog = backlog
+        self.reuse_addr = reuse_addr
+        self.reuse_port = reuse_port
+        self.keepalive = keepalive
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+
+    def __repr__(self):
+        return "SocketOptions(" + ", ".join(f"{name}={value!r}" for name, value in vars(self).items()) + ")"
+
+    def copy(self, **changes):
+        """Returns a copy with the options given as keyword arguments changed."""
+        return SocketOptions(**dict(vars(self), **changes))
+
+    def apply(self, sock):
+        """
+        Sets the per-connection options (TCP_NODELAY, keepalive and buffer sizes) on a socket.
+
+        Buffer sizes are best set before connecting or listening, as the TCP window is agreed on
+        when the connection opens. Options the platform lacks are skipped.
+
+        Parameters
+        ----------
+        sock : socket
+            A TCP socket, connected or not.
+
+        Returns
+        -------
+        socket
+            The same socket.
+        """
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.keepalive is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # TCP_KEEPIDLE is called TCP_KEEPALIVE on macOS.
+            timings = ((getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None)), self.keepalive),
+                       (getattr(socket, "TCP_KEEPINTVL", None), self.keepalive_interval),
+                       (getattr(socket, "TCP_KEEPCNT", None), self.keepalive_count))
+            for option, value in timings:
+                if option is not None and value is not None:
+                    sock.setsockopt(socket.IPPROTO_TCP, option, max(1, int(value)))
+        if self.sndbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        if self.rcvbuf is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        return sock
+
+    def socket(self):
+        """Returns a new TCP socket with the per-connection options set, ready to connect."""
+        return self.apply(socket.socket(socket.AF_INET, socket.SOCK_STREAM))
+
+    def listen(self, address, port):
+        """
+        Returns a TCP socket bound to an address and port and listening.
+
+        The per-connection options are set on it too, as some must be in place before the
+        connection opens (see apply), and Linux passes them on to the connections it accepts.
+        Other platforms don't, so the server applies them to every accepted connection as well.
+
+        Parameters
+        ----------
+        address : str
+            The address to bind to.
+        port : int
+            The port to listen on. Port 0 picks a free port.
+
+        Returns
+        -------
+        socket
+            The listening socket.
+        """
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.reuse_addr:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.apply(s)
+        s.bind((address, port))
+        s.listen(self.backlog)
+        return s
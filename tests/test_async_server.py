@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+from async_server import AsyncServer
+from network import Network, RoomNetwork
+
+class TestAsyncServer(unittest.TestCase):
+    def setUp(self):
+        self.server = AsyncServer("localhost", 0)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def connect(self):
+        return Network("localhost", self.server.port)
+
+    def test_players_are_paired(self):
+        n0 = self.connect()
+        self.assertFalse(n0.send("get").connected())
+        n1 = self.connect()
+        self.assertEqual((n0.getP(), n1.getP()), ("0", "1"))
+        self.assertTrue(n0.send("get").connected())
+        n0.client.close()
+        n1.client.close()
+
+    def test_move_and_reset(self):
+        n0 = self.connect()
+        n1 = self.connect()
+        n0.send("Rock")
+        game = n1.send("Scissors")
+        self.assertTrue(game.bothWent())
+        self.assertEqual(game.winner(), 0)
+        game = n0.send("reset")
+        self.assertFalse(game.bothWent())
+        n0.client.close()
+        n1.client.close()
+
+    def test_rooms(self):
+        bot = RoomNetwork("localhost", self.server.port)
+        first, = bot.seats
+        second, _ = bot.join()
+        n1 = self.connect()
+        n2 = self.connect()
+        bot.send(second, "Rock")
+        n2.send("Scissors")
+        self.assertEqual(bot.send(second, "get").wins, [1, 0])
+        self.assertTrue(bot.send(first, "get").connected())
+        bot.leave(first)
+        self.assertIsNone(n1.send("get"))
+        self.assertEqual(n1.closed_reason, "left")
+        bot.client.close()
+        n2.client.close()
+
+    def test_idle_player_is_reclaimed(self):
+        server = AsyncServer("localhost", 0, idle_timeout=0.2)
+        server.timers.tick = 0.02
+        threading.Thread(target=server.run_server, daemon=True).start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        deadline = time.monotonic() + 3
+        while n0.send("get") is not None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(n0.closed_reason, "idle")
+        self.assertEqual(len(server.games), 0)
+        n1.client.close()
+
+if __name__ == '__main__':
+    unittest.main()
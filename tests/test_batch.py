@@ -0,0 +1,72 @@
+import itertools
+import random
+import unittest
+import batch
+from batch import resolve_rounds
+from game import Game
+from move import Move
+
+def expected_winner(m0, m1):
+    game = Game(0)
+    game.play(0, Move.from_code(m0).label)
+    game.play(1, Move.from_code(m1).label)
+    return game.winner()
+
+class BatchTests:
+    use_numpy = None
+
+    def resolve(self, *args, **kwargs):
+        result = resolve_rounds(*args, use_numpy=self.use_numpy, **kwargs)
+        return batch.BatchResult(*(list(map(int, field)) for field in result))
+
+    def test_matches_game_winner_for_every_pair(self):
+        pairs = list(itertools.product([move.code for move in Move], repeat=2))
+        moves0, moves1 = zip(*pairs)
+        result = self.resolve(moves0, moves1)
+        self.assertEqual(result.winners, [expected_winner(m0, m1) for m0, m1 in pairs])
+        self.assertEqual(result.ties, [int(m0 == m1) for m0, m1 in pairs])
+        self.assertEqual(result.wins, [3, 3])
+        self.assertEqual(result.tie_counts, [3, 3])
+
+    def test_tallies_per_player(self):
+        rng = random.Random(7)
+        rounds = 2000
+        moves0 = [rng.randint(1, 3) for _ in range(rounds)]
+        moves1 = [rng.randint(1, 3) for _ in range(rounds)]
+        players0 = [rng.randrange(10) for _ in range(rounds)]
+        players1 = [rng.randrange(10, 20) for _ in range(rounds)]
+        wins = [0] * 20
+        ties = [0] * 20
+        for m0, m1, a, b in zip(moves0, moves1, players0, players1):
+            winner = expected_winner(m0, m1)
+            if winner == -1:
+                ties[a] += 1
+                ties[b] += 1
+            else:
+                wins[(a, b)[winner]] += 1
+        result = self.resolve(moves0, moves1, players0, players1)
+        self.assertEqual(result.wins, wins)
+        self.assertEqual(result.tie_counts, ties)
+
+    def test_empty_batch(self):
+        result = self.resolve([], [])
+        self.assertEqual(result.winners, [])
+        self.assertEqual(result.wins, [0, 0])
+
+    def test_rejects_invalid_codes(self):
+        with self.assertRaises(ValueError):
+            self.resolve([1, 0], [2, 3])
+        with self.assertRaises(ValueError):
+            self.resolve([1], [4])
+        with self.assertRaises(ValueError):
+            self.resolve([1, 2], [3])
+
+class TestPythonBatch(BatchTests, unittest.TestCase):
+    use_numpy = False
+
+@unittest.skipIf(batch.np is None, "NumPy is not installed")
+class TestNumpyBatch(BatchTests, unittest.TestCase):
+    use_numpy = True
+
+if __name__ == '__main__':
+    unittest.main()
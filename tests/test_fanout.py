@@ -0,0 +1,165 @@
+import socket
+import threading
+import time
+import unittest
+from channels import Broadcast, Fanout, SocketChannel, Subscription
+from game import Game
+from metrics import Metrics
+from network import Network, RoomNetwork
+from protocol import FrameBuffer, apply_update, decode_room, encode_game, encode_frame
+from server import Server
+
+class RecordingChannel:
+    def __init__(self):
+        self.subscribed = False
+        self.frames = []
+
+    def send(self, payload):
+        pass
+
+    def push(self, broadcast, replace=False):
+        self.frames.append(broadcast.frame())
+
+class TestBroadcast(unittest.TestCase):
+    def test_frames_are_encoded_once_for_all_subscribers(self):
+        subscription = Subscription()
+        game = Game(3)
+        channels = [RecordingChannel() for _ in range(100)]
+        for channel in channels:
+            subscription.add(channel, game)
+        game.play(0, "Rock")
+        subscription.publish(game)
+        # Each channel was pushed the snapshot it subscribed at, then the published update.
+        first = channels[0].frames[1]
+        self.assertTrue(all(channel.frames[1] is first for channel in channels))
+
+    def test_spectators_are_pushed_to_by_the_fanout_thread(self):
+        fanout = Fanout()
+        fanout.thread = "not started yet"
+        subscription = Subscription(fanout=fanout)
+        game = Game(3)
+        player, spectator = RecordingChannel(), RecordingChannel()
+        subscription.add(player, game)
+        subscription.add(spectator, game, spectator=True)
+        game.play(0, "Rock")
+        subscription.publish(game)
+        game.resetWent()
+        subscription.publish(game)
+        # Both were pushed the snapshot they subscribed at. The player got both updates straight
+        # away; the spectator only gets the newest.
+        self.assertEqual(len(player.frames), 3)
+        self.assertEqual(spectator.frames, [player.frames[0]])
+        threading.Thread(target=fanout.run, daemon=True).start()
+        deadline = time.monotonic() + 5
+        while len(spectator.frames) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(spectator.frames, [player.frames[0], player.frames[-1]])
+
+    def test_tagged_frame(self):
+        broadcast = Broadcast(9, encode_game(Game(9)))
+        self.assertIs(broadcast.tagged_frame(), broadcast.tagged_frame())
+        game_id, update = decode_room(broadcast.tagged_frame()[4:])
+        self.assertEqual((game_id, update), (9, broadcast.payload))
+
+class TestSlowSubscriber(unittest.TestCase):
+    def setUp(self):
+        self.server_end, self.client_end = socket.socketpair()
+        self.server_end.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        self.client_end.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        self.addCleanup(self.client_end.close)
+        self.metrics = Metrics()
+
+    def publish_many(self, channel, count=5000, spectator=False):
+        game = Game(0)
+        subscription = Subscription()
+        subscription.add(channel, game, spectator)
+
+        def publish():
+            for _ in range(count):
+                game.play(0, "Rock")
+                subscription.publish(game)
+                game.resetWent()
+                subscription.publish(game)
+
+        # Nobody reads from the client end, so a blocking push would hang here for good.
+        publisher = threading.Thread(target=publish, daemon=True)
+        publisher.start()
+        publisher.join(10)
+        self.assertFalse(publisher.is_alive())
+        return game
+
+    def read_until(self, version):
+        frames = FrameBuffer()
+        self.client_end.settimeout(5)
+        game = None
+        while game is None or game.version != version:
+            game = apply_update(game, frames.read_frame(self.client_end))
+        return game
+
+    def test_queued_updates_are_coalesced(self):
+        channel = SocketChannel(self.server_end, self.metrics, Fanout(queue_size=8))
+        game = self.publish_many(channel, spectator=True)
+        self.assertLessEqual(len(channel.pending), 2)
+        self.assertGreater(self.metrics.counters["pushes_coalesced"], 0)
+        # Once the client reads, the fanout thread delivers the latest state.
+        self.assertEqual(self.read_until(game.version).version, game.version)
+        channel.close()
+
+    def test_a_players_round_result_is_not_replaced(self):
+        channel = SocketChannel(self.server_end, self.metrics, Fanout(queue_size=1000))
+        game = Game(0)
+        subscription = Subscription()
+        subscription.add(channel, game)
+        while not channel.pending:
+            channel.push_frame(encode_frame(encode_game(game)), None)
+        game.play(0, "Rock")
+        game.play(1, "Paper")
+        subscription.publish(game)
+        game.resetWent()
+        subscription.publish(game)
+        frames = FrameBuffer()
+        self.client_end.settimeout(5)
+        seen = None
+        while seen is None or seen.version != game.version:
+            seen = apply_update(None, frames.read_frame(self.client_end))
+            if seen.bothWent():
+                break
+        self.assertTrue(seen.bothWent())
+        self.assertNotIn("pushes_coalesced", self.metrics.counters)
+        channel.close()
+
+    def test_drop_policy_bounds_the_queue(self):
+        channel = SocketChannel(self.server_end, self.metrics, Fanout(queue_size=8, policy="drop"))
+        self.publish_many(channel)
+        self.assertLessEqual(len(channel.pending), 9)
+        self.assertGreater(self.metrics.counters["pushes_dropped"], 0)
+        channel.close()
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            Fanout(policy="block")
+
+class TestSpectators(unittest.TestCase):
+    def test_every_spectator_sees_the_move(self):
+        server = Server("localhost", 0)
+        threading.Thread(target=server.run_server, daemon=True).start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        game_id = n0.send("get").id
+        spectators = []
+        for _ in range(20):
+            spectator = RoomNetwork("localhost", server.port)
+            for own in list(spectator.seats):
+                spectator.leave(own)
+            spectator.watch(game_id)
+            spectators.append(spectator)
+
+        n1.send("Paper")
+        deadline = time.monotonic() + 5
+        for spectator in spectators:
+            while not spectator.games[game_id].p2Went and time.monotonic() < deadline:
+                spectator.poll()
+            self.assertTrue(spectator.games[game_id].p2Went)
+
+if __name__ == "__main__":
+    unittest.main()
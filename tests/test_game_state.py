@@ -0,0 +1,52 @@
+import pickle
+import unittest
+from game import Game
+from move import Move
+
+class TestCompactGame(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(1)
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.game, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.game.game_rules = {}
+
+    def test_moves_are_stored_as_codes(self):
+        self.game.play(0, "Rock")
+        self.assertEqual(self.game.move_codes, (Move.ROCK.code, 0))
+        self.assertEqual(self.game.moves, ["Rock", None])
+        self.assertEqual(self.game.get_player_move(0), "Rock")
+        self.assertIsNone(self.game.get_player_move(1))
+        self.assertTrue(self.game.p1Went)
+        self.assertFalse(self.game.bothWent())
+
+    def test_winner(self):
+        beats = {"Rock": "Scissors", "Scissors": "Paper", "Paper": "Rock"}
+        for first in beats:
+            for second in beats:
+                self.game.play(0, first)
+                self.game.play(1, second)
+                expected = -1 if first == second else 0 if beats[first] == second else 1
+                self.assertEqual(self.game.winner(), expected, (first, second))
+
+    def test_reset_keeps_moves(self):
+        self.game.play(0, "Paper")
+        self.game.play(1, "Scissors")
+        version = self.game.version
+        self.game.resetWent()
+        self.assertFalse(self.game.p1Went or self.game.p2Went)
+        self.assertEqual(self.game.version, version + 1)
+        self.game.resetWent()
+        self.assertEqual(self.game.version, version + 1)
+
+    def test_pickle_round_trip(self):
+        self.game.set_ready()
+        self.game.play(1, "Scissors")
+        self.game.wins = [2, 5]
+        copy = pickle.loads(pickle.dumps(self.game))
+        self.assertEqual(copy.moves, [None, "Scissors"])
+        self.assertEqual((copy.wins, copy.version, copy.ready, copy.p2Went), ([2, 5], 2, True, True))
+
+if __name__ == '__main__':
+    unittest.main()
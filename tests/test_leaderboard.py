@@ -0,0 +1,71 @@
+import random
+import unittest
+from improvements.leaderboard import Leaderboard, SortedIndex
+
+class TestSortedIndex(unittest.TestCase):
+    def test_matches_a_sorted_list(self):
+        rng = random.Random(3)
+        index = SortedIndex(load=4)
+        expected = []
+        for _ in range(3000):
+            if expected and rng.random() < 0.4:
+                key = expected.pop(rng.randrange(len(expected)))
+                index.remove(key)
+            else:
+                key = rng.randrange(500)
+                expected.append(key)
+                index.add(key)
+            expected.sort()
+            probe = rng.randrange(-1, 502)
+            self.assertEqual(index.bisect_left(probe), sum(1 for k in expected if k < probe))
+        self.assertEqual(len(index), len(expected))
+        self.assertEqual(index.head(len(expected) + 1), expected)
+
+    def test_remove_missing_key(self):
+        index = SortedIndex()
+        index.add(1)
+        with self.assertRaises(ValueError):
+            index.remove(2)
+        with self.assertRaises(ValueError):
+            index.remove(0)
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.leaderboard = Leaderboard()
+        for name, score in [("ann", 3), ("bob", 5), ("cat", 1), ("dan", 5)]:
+            self.leaderboard.add_score(name, score)
+
+    def test_top_scores(self):
+        self.assertEqual(self.leaderboard.get_top_scores(3), [("bob", 5), ("dan", 5), ("ann", 3)])
+        self.assertEqual(len(self.leaderboard.get_top_scores(10)), 4)
+
+    def test_scores_accumulate(self):
+        self.leaderboard.add_score("cat", 10)
+        self.assertEqual(self.leaderboard.get_score("cat"), 11)
+        self.assertEqual(self.leaderboard.get_top_scores(1), [("cat", 11)])
+        self.assertEqual(len(self.leaderboard.index), 4)
+
+    def test_ranks(self):
+        self.assertEqual(self.leaderboard.get_rank("bob"), 1)
+        self.assertEqual(self.leaderboard.get_rank("dan"), 1)
+        self.assertEqual(self.leaderboard.get_rank("ann"), 3)
+        self.assertEqual(self.leaderboard.get_rank("cat"), 4)
+        with self.assertRaises(KeyError):
+            self.leaderboard.get_rank("eve")
+
+    def test_unknown_player_scores_zero(self):
+        self.assertEqual(self.leaderboard.get_score("eve"), 0)
+        self.assertNotIn("eve", self.leaderboard.scores)
+
+    def test_random_updates(self):
+        rng = random.Random(5)
+        leaderboard = Leaderboard()
+        for _ in range(5000):
+            leaderboard.add_score(f"p{rng.randrange(300)}", rng.randrange(1, 4))
+        ordered = sorted(leaderboard.scores.items(), key=lambda item: (-item[1], item[0]))
+        self.assertEqual(leaderboard.get_top_scores(20), ordered[:20])
+        for name, score in ordered[::17]:
+            self.assertEqual(leaderboard.get_rank(name), 1 + sum(1 for _, s in ordered if s > score))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import unittest
+from loadgen import LoadReport, run_load
+from server import Server
+from async_server import AsyncServer
+
+class LoadgenTests:
+    server_class = None
+
+    def setUp(self):
+        self.server = self.server_class("localhost", 0)
+        self.server.s.listen(64)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def test_bots_play_every_round(self):
+        report = asyncio.run(run_load("localhost", self.server.port, players=10, rounds=3, think_time=0.005))
+        self.assertEqual(sum(report.errors.values()), 0)
+        self.assertEqual(report.rounds, 15)
+        summary = report.summary()
+        self.assertEqual(summary["connect"]["requests"], 10)
+        self.assertEqual(summary["move"]["requests"], 30)
+        self.assertEqual(summary["reset"]["requests"], 15)
+        self.assertLessEqual(summary["move"]["p50_ms"], summary["move"]["p99_ms"])
+        self.server.scores.flush()
+        self.assertEqual(len(self.server.scores.top(20)), 10)
+
+class TestLoadgenThreaded(LoadgenTests, unittest.TestCase):
+    server_class = Server
+
+class TestLoadgenAsync(LoadgenTests, unittest.TestCase):
+    server_class = AsyncServer
+
+class TestLoadReport(unittest.TestCase):
+    def test_summary_counts_errors(self):
+        report = LoadReport()
+        report.latencies["get"] = [0.001, 0.002, 0.003, 0.004]
+        report.errors["get"] = 1
+        report.errors["connect"] = 2
+        report.elapsed = 2.0
+        summary = report.summary()
+        self.assertEqual(summary["get"]["requests"], 5)
+        self.assertAlmostEqual(summary["get"]["error_rate"], 0.2)
+        self.assertAlmostEqual(summary["get"]["p50_ms"], 3.0)
+        self.assertIsNone(summary["connect"]["p99_ms"])
+        self.assertNotIn("move", summary)
+        self.assertIn("rounds/s", report.format())
+
+if __name__ == '__main__':
+    unittest.main()
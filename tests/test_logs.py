@@ -0,0 +1,86 @@
+import io
+import json
+import logging
+import queue
+import unittest
+from logs import ROOT, DroppingQueueHandler, JSONFormatter, KeyValueFormatter, RateLimitFilter, get_logger, setup_logging
+
+def make_record(event="client_error", level=logging.WARNING, logger="rps.test", **fields):
+    record = logging.LogRecord(logger, level, __file__, 0, event, None, None)
+    record.fields = fields
+    return record
+
+class TestFormatters(unittest.TestCase):
+    def test_key_value(self):
+        line = KeyValueFormatter().format(make_record(game=3, error="Connection reset by peer", name=""))
+        self.assertRegex(line, r"^ts=\d+\.\d{3} level=warning logger=rps.test event=client_error ")
+        self.assertTrue(line.endswith(' game=3 error="Connection reset by peer" name=""'))
+
+    def test_json(self):
+        entry = json.loads(JSONFormatter().format(make_record(peer=("127.0.0.1", 5000))))
+        self.assertEqual(entry["event"], "client_error")
+        self.assertEqual(entry["level"], "warning")
+        self.assertEqual(entry["peer"], ["127.0.0.1", 5000])
+
+class TestRateLimitFilter(unittest.TestCase):
+    def test_repeated_errors_are_dropped_and_counted(self):
+        limit = RateLimitFilter(burst=3, interval=0.05)
+        passed = [limit.filter(make_record()) for _ in range(10)]
+        self.assertEqual(passed, [True] * 3 + [False] * 7)
+        # Other events and lower levels have their own allowance.
+        self.assertTrue(limit.filter(make_record("unknown_move")))
+        self.assertTrue(all(limit.filter(make_record(level=logging.INFO)) for _ in range(10)))
+
+        limit.windows[("rps.test", "client_error")][0] -= 1  # Move to the next window.
+        record = make_record()
+        self.assertTrue(limit.filter(record))
+        self.assertEqual(record.fields["suppressed"], 7)
+
+class TestQueueHandler(unittest.TestCase):
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(2))
+        for _ in range(5):
+            handler.handle(make_record())
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+class TestSetupLogging(unittest.TestCase):
+    def setUp(self):
+        # setup_logging changes the server's logger for good; later tests must get it back as it was.
+        root = logging.getLogger(ROOT)
+        saved = list(root.handlers), root.level, root.propagate
+        self.addCleanup(self.restore, root, *saved)
+
+    def restore(self, root, handlers, level, propagate):
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+        root.propagate = propagate
+
+    def test_events_are_written_in_the_background(self):
+        stream = io.StringIO()
+        listener = setup_logging("INFO", "json", stream, burst=2)
+        log = get_logger("test")
+        log.debug("hidden")
+        log.info("connected", peer="a")
+        for _ in range(5):
+            log.warning("client_error", error="reset")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.exception("crashed")
+        listener.stop()
+
+        entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([entry["event"] for entry in entries], ["connected", "client_error", "client_error", "crashed"])
+        self.assertEqual(entries[0]["logger"], "rps.test")
+        self.assertIn("ValueError: boom", entries[-1]["exc"])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            setup_logging(fmt="xml")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from matchlog import RECORD, MatchLog, MatchLogReader, names_path
+from network import Network
+from scores import ScoreKeeper
+from server import Server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class MatchLogTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "matches.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+class TestMatchLog(MatchLogTests):
+    def test_append_and_read(self):
+        log = MatchLog(self.path)
+        log.append(7, ("ann", "bob"), (1, 3), 0, timestamp=100.0)
+        log.append(7, ("ann", None), (2, 2), -1, timestamp=101.0)
+        log.close()
+        self.assertEqual(os.path.getsize(self.path), 2 * RECORD.size)
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 2)
+            self.assertEqual(reader[0], (100.0, 7, "ann", "bob", 1, 3, 0))
+            self.assertEqual(reader[-1], (101.0, 7, "ann", None, 2, 2, -1))
+            with self.assertRaises(IndexError):
+                reader[2]
+
+    def test_tally(self):
+        log = MatchLog(self.path)
+        for names, winner in [(("ann", "bob"), 0), (("bob", "ann"), 0), (("bob", "cat"), 1),
+                              (("cat", None), -1), ((None, "dan"), 0)]:
+            log.append(1, names, (1, 2), winner)
+        log.close()
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual(reader.tally(), {"ann": 1, "bob": 1, "cat": 1, "dan": 0})
+            self.assertEqual(reader.tally(win=3, tie=1), {"ann": 3, "bob": 3, "cat": 4, "dan": 0})
+
+    def test_empty_log(self):
+        MatchLog(self.path).close()
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertEqual(reader.tally(), {})
+
+    def test_torn_writes_are_cut_off(self):
+        log = MatchLog(self.path)
+        log.append(1, ("ann", "bob"), (1, 3), 0)
+        log.close()
+        with open(self.path, "ab") as f:
+            f.write(b"\x01" * 10)
+        with open(names_path(self.path), "ab") as f:
+            f.write(b"\x05ab")
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 1)
+            self.assertEqual(reader.names, ["ann", "bob"])
+        log = MatchLog(self.path)
+        log.append(2, ("bob", "eve"), (3, 2), 0)
+        log.close()
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual([record[1:4] for record in (reader[0], reader[1])], [(1, "ann", "bob"), (2, "bob", "eve")])
+
+    def test_names_missing_from_the_names_file_are_skipped(self):
+        log = MatchLog(self.path)
+        log.append(1, ("ann", "bob"), (1, 3), 0)
+        log.append(2, ("cat", "ann"), (1, 3), 1)
+        log.close()
+        with open(names_path(self.path), "r+b") as f:
+            f.truncate(4)
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual(reader.names, ["ann"])
+            self.assertEqual(reader[1][2:4], (None, "ann"))
+            self.assertEqual(reader.tally(), {"ann": 2})
+            self.assertEqual(reader.unknown_names, 2)
+
+class TestRestore(MatchLogTests):
+    def test_restore_after_a_crash(self):
+        # More records than fit the write buffer, so some reach the file before the process dies.
+        code = ("import os, sys; from matchlog import MatchLog; log = MatchLog(sys.argv[1])\n"
+                "for i in range(300): log.append(i, (f'p{i}', 'bob'), (1, 3), 0)\n"
+                "os._exit(0)")
+        subprocess.run([sys.executable, "-c", code, self.path], cwd=ROOT, check=True, timeout=60)
+        self.assertGreater(os.path.getsize(self.path), 0)
+        keeper = ScoreKeeper.restore(self.path)
+        keeper.log.close()
+        with MatchLogReader(self.path) as reader:
+            reader.tally()
+            self.assertEqual(reader.unknown_names, 0)
+            for _, _, name, other, _, _, _ in (reader[i] for i in range(len(reader))):
+                self.assertEqual((name[0], other), ("p", "bob"))
+        self.assertEqual(keeper.top(1)[0][1], 1)
+
+    def test_scores_survive_a_restart(self):
+        keeper = ScoreKeeper.restore(self.path)
+        keeper.record(1, ("ann", "bob"), (1, 3), 0)
+        keeper.record(1, ("ann", "bob"), (3, 1), 1)
+        keeper.record(2, ("cat", "bob"), (2, 1), 0)
+        keeper.flush()
+        keeper.log.close()
+        restored = ScoreKeeper.restore(self.path)
+        self.assertEqual(restored.top(5), keeper.top(5))
+        self.assertEqual(restored.top(5), [("ann", 1), ("bob", 1), ("cat", 1)])
+
+    def test_server_records_rounds(self):
+        server = Server("localhost", 0, match_log=self.path)
+        threading.Thread(target=server.run_server, daemon=True).start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n0.send("name:ann")
+        n0.send("Rock")
+        n1.send("Scissors")
+        server.scores.flush()
+        with MatchLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 1)
+            self.assertEqual(reader[0][2:], ("ann", None, 1, 3, 0))
+
+if __name__ == '__main__':
+    unittest.main()
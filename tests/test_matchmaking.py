@@ -0,0 +1,137 @@
+import itertools
+import sys
+import threading
+import time
+import unittest
+from matchmaking import Matchmaker
+from network import Network
+from server import Server
+
+class TestMatchmaker(unittest.TestCase):
+    def setUp(self):
+        self.matchmaker = Matchmaker(wait_timeout=10)
+
+    def test_pairs_in_arrival_order(self):
+        self.assertEqual(self.matchmaker.join(), (0, 0))
+        self.assertEqual(self.matchmaker.join(), (0, 1))
+        self.assertEqual(self.matchmaker.join(), (1, 0))
+        self.assertEqual(self.matchmaker.join(), (1, 1))
+
+    def test_cancelled_player_is_skipped(self):
+        first, _ = self.matchmaker.join()
+        second, _ = self.matchmaker.join(bucket="other")
+        self.assertTrue(self.matchmaker.cancel(first))
+        self.assertFalse(self.matchmaker.cancel(first))
+        game_id, p = self.matchmaker.join()
+        self.assertEqual(p, 0)
+        self.assertNotEqual(game_id, first)
+        self.assertEqual(self.matchmaker.join(bucket="other"), (second, 1))
+
+    def test_excluded_games_keep_their_place(self):
+        first, _ = self.matchmaker.join()
+        second, _ = self.matchmaker.join(exclude={first})
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.matchmaker.join(exclude={first, second})[1], 0)
+        self.assertEqual(self.matchmaker.join(), (first, 1))
+        self.assertEqual(self.matchmaker.join(), (second, 1))
+
+    def test_game_ids_are_never_reused(self):
+        ids = {self.matchmaker.join()[0] for _ in range(1000)}
+        for game_id in list(ids):
+            self.matchmaker.cancel(game_id)
+        self.assertTrue(ids.isdisjoint(self.matchmaker.join()[0] for _ in range(10)))
+
+    def test_buckets_are_separate(self):
+        beginner, _ = self.matchmaker.join(bucket=0)
+        expert, _ = self.matchmaker.join(bucket=5)
+        self.assertEqual(self.matchmaker.join(bucket=5), (expert, 1))
+        self.assertEqual(self.matchmaker.join(bucket=0), (beginner, 1))
+
+    def test_expire(self):
+        now = time.monotonic()
+        old, _ = self.matchmaker.join()
+        self.assertEqual(self.matchmaker.expire(now + 5), [])
+        self.assertEqual(self.matchmaker.expire(now + 11), [old])
+        self.assertEqual(self.matchmaker.join()[1], 0)
+
+    def test_custom_id_generator(self):
+        matchmaker = Matchmaker(ids=itertools.count(3, 4))
+        self.assertEqual(matchmaker.join(), (3, 0))
+        matchmaker.join()
+        self.assertEqual(matchmaker.join(), (7, 0))
+
+    def test_game_is_created_before_anyone_can_join(self):
+        created = []
+
+        def create(game_id):
+            self.assertNotIn(game_id, self.matchmaker.waiting)
+            created.append(game_id)
+        game_id, _ = self.matchmaker.join(create=create)
+        self.assertEqual(created, [game_id])
+        self.assertEqual(self.matchmaker.join(create=create), (game_id, 1))
+        self.assertEqual(created, [game_id])
+
+    def test_player_is_not_queued_if_create_fails(self):
+        def create(game_id):
+            raise KeyError(game_id)
+        with self.assertRaises(KeyError):
+            self.matchmaker.join(create=create)
+        self.assertEqual(self.matchmaker.waiting, {})
+        self.assertEqual(self.matchmaker.join()[1], 0)
+
+class TestServerMatchmaking(unittest.TestCase):
+    def setUp(self):
+        self.server = Server("localhost", 0, wait_timeout=0.2)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def connect(self):
+        return Network("localhost", self.server.port)
+
+    def test_churn_does_not_strand_players(self):
+        # Leaving used to shift the pairing counter, attaching later arrivals to deleted games.
+        for _ in range(5):
+            lonely = self.connect()
+            lonely.client.close()
+        time.sleep(0.1)
+        n0 = self.connect()
+        n1 = self.connect()
+        self.assertEqual((n0.getP(), n1.getP()), ("0", "1"))
+        self.assertTrue(n0.send("get").connected())
+        self.assertEqual(n0.send("get").id, n1.send("get").id)
+
+    def test_waiting_player_times_out(self):
+        n0 = self.connect()
+        n0.subscribe()
+        time.sleep(1.5)
+        with self.assertRaises(EOFError):
+            n0.poll()
+        self.assertEqual(self.server.stats()["games"], 0)
+
+    def test_concurrent_joins_pair_every_player(self):
+        # Switching threads as often as possible makes joins interleave with creating games.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        results = []
+        start = threading.Barrier(8)
+
+        def join():
+            start.wait()
+            for _ in range(200):
+                results.append(self.server.add_player())
+        threads = [threading.Thread(target=join) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        hosted = {game_id for game_id, p in results if p == 0}
+        joined = [game_id for game_id, p in results if p == 1]
+        self.assertEqual(len(joined), len(set(joined)))
+        self.assertTrue(set(joined) <= hosted)
+        # Every game without a second player still has its player waiting, and only one does.
+        self.assertEqual(hosted - set(joined), set(self.server.matchmaker.waiting))
+        self.assertLessEqual(len(self.server.matchmaker.waiting), 1)
+
+if __name__ == '__main__':
+    unittest.main()
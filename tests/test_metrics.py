@@ -0,0 +1,91 @@
+import json
+import threading
+import unittest
+import urllib.request
+from metrics import Histogram, Metrics
+from network import Network
+from server import Server
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_are_bucket_upper_bounds(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        for _ in range(90):
+            histogram.record(0.000100)  # 100us, in the bucket up to 128us
+        for _ in range(10):
+            histogram.record(0.005)  # 5ms, in the bucket up to 8192us
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.total, 0.059)
+        self.assertEqual(histogram.percentile(0.5), 128e-6)
+        self.assertEqual(histogram.percentile(0.9), 128e-6)
+        self.assertEqual(histogram.percentile(0.95), 8192e-6)
+        self.assertEqual(histogram.percentile(1.0), 8192e-6)
+
+    def test_huge_values_land_in_the_last_bucket(self):
+        histogram = Histogram()
+        histogram.record(1e9)
+        self.assertEqual(histogram.counts[-1], 1)
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        metrics = Metrics()
+        metrics.increment("messages_in")
+        metrics.increment("bytes_in", 10)
+        metrics.observe("handle", 0.000003)
+        text = metrics.render({"games": 2})
+        self.assertIn("rps_games 2\n", text)
+        self.assertIn("rps_messages_in_total 1\n", text)
+        self.assertIn("rps_bytes_in_total 10\n", text)
+        self.assertIn("rps_handle_seconds_count 1\n", text)
+        self.assertIn('rps_handle_seconds{quantile="0.99"} 0.000004\n', text)
+
+    def test_add_snapshot(self):
+        first, second = Metrics(), Metrics()
+        first.increment("messages_in", 2)
+        first.observe("handle", 0.000003)
+        second.increment("messages_in", 3)
+        second.observe("handle", 0.001)
+        merged = Metrics()
+        for metrics in (first, second):
+            merged.add(json.loads(json.dumps(metrics.snapshot())))
+        self.assertEqual(merged.counters["messages_in"], 5)
+        self.assertEqual(merged.histograms["handle"].count, 2)
+        self.assertEqual(merged.histograms["handle"].percentile(0.5), 0.000004)
+        self.assertEqual(merged.histograms["handle"].percentile(1), second.histograms["handle"].percentile(1))
+
+class TestServerMetrics(unittest.TestCase):
+    def start(self, **kwargs):
+        server = Server("localhost", 0, **kwargs)
+        threading.Thread(target=server.run_server, daemon=True).start()
+        return server
+
+    def test_metrics_are_off_by_default(self):
+        self.assertIsNone(self.start().metrics)
+
+    def test_requests_are_counted_and_timed(self):
+        server = self.start(metrics=True)
+        endpoint = server.start_metrics(port=0)
+        self.addCleanup(endpoint.shutdown)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n0.send("Rock")
+        n1.send("Scissors")
+        n0.send("get")
+
+        counters = server.metrics.counters
+        self.assertEqual(counters["connections_opened"], 2)
+        self.assertEqual(counters["messages_in"], 3)
+        self.assertEqual(counters["rounds_resolved"], 1)
+        self.assertGreater(counters["bytes_out"], counters["bytes_in"])
+        for stage in ("recv", "handle", "send", "serialize"):
+            self.assertGreater(server.metrics.histograms[stage].count, 0, stage)
+
+        url = f"http://localhost:{endpoint.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            text = response.read().decode()
+        self.assertIn("rps_connections 2\n", text)
+        self.assertIn("rps_messages_in_total 3\n", text)
+        self.assertIn('rps_handle_seconds{quantile="0.5"}', text)
+
+if __name__ == "__main__":
+    unittest.main()
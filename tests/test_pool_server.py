@@ -0,0 +1,134 @@
+import socket
+import threading
+import time
+import unittest
+from network import Network
+from pool_server import PoolServer, SelectorPoller
+from protocol import encode_frame
+from sockopts import SocketOptions
+
+class BlockingPoolServer(PoolServer):
+    """A pool server whose workers stay busy on "block" until released."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def respond(self, channel, game_id, p, data):
+        if data == "block":
+            self.release.wait(5)
+            data = "get"
+        return super().respond(channel, game_id, p, data)
+
+class TestPoolServer(unittest.TestCase):
+    def start(self, **kwargs):
+        server = BlockingPoolServer("localhost", 0, **kwargs)
+        threading.Thread(target=server.run_server, daemon=True).start()
+        self.addCleanup(server.release.set)
+        return server
+
+    def test_move_and_reset(self):
+        server = self.start(workers=2)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        self.assertEqual((n0.getP(), n1.getP()), ("0", "1"))
+        n0.send("Rock")
+        game = n1.send("Scissors")
+        self.assertTrue(game.bothWent())
+        self.assertEqual(game.winner(), 0)
+        self.assertFalse(n0.send("reset").bothWent())
+        n0.client.close()
+        n1.client.close()
+
+    def test_requests_are_rejected_when_saturated(self):
+        server = self.start(workers=1, queue_size=0, metrics=True)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n0.post("block")
+        time.sleep(0.1)
+        # The only worker is busy, so the request is answered with "overloaded" straight away.
+        self.assertIsNone(n1.send("get"))
+        self.assertEqual(server.metrics.counters["requests_rejected"], 1)
+        server.release.set()
+        self.assertTrue(n0.receive_data().connected())
+        # The rejected client is still connected and served once the worker is free again.
+        game = None
+        deadline = time.monotonic() + 2
+        while game is None and time.monotonic() < deadline:
+            game = n1.send("get")
+        self.assertTrue(game.connected())
+        n0.client.close()
+        n1.client.close()
+
+    def test_connections_beyond_the_limit_are_turned_away(self):
+        server = self.start(max_connections=2)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n2 = Network("localhost", server.port)
+        self.assertIsNone(n2.getP())
+        self.assertTrue(n0.send("get").connected())
+        n0.client.close()
+        n1.client.close()
+        n2.client.close()
+
+    def test_leaving_player_is_cleaned_up(self):
+        server = self.start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n1.send("get")
+        n1.client.close()
+        deadline = time.monotonic() + 2
+        while n0.send("get") is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(n0.closed_reason, "left")
+        while server.clients and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(server.clients, {})
+        self.assertEqual(len(server.games), 0)
+
+    def test_clients_that_stop_reading_do_not_hold_up_workers(self):
+        server = self.start(workers=2, push_queue=4, socket_options=SocketOptions(sndbuf=4096))
+        readers = []
+        for _ in range(2):
+            reader = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            reader.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            reader.connect(("localhost", server.port))
+            reader.settimeout(2)
+            readers.append(reader)
+
+        def flood(reader):
+            try:
+                reader.sendall(encode_frame(b"get") * 20000)
+            except OSError:
+                pass  # Disconnected for falling behind.
+        flooders = [threading.Thread(target=flood, args=(reader,)) for reader in readers]
+        for flooder in flooders:
+            flooder.start()
+        time.sleep(0.5)
+
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n0.client.settimeout(2)
+        n1.client.settimeout(2)
+        self.assertIsNotNone(n0.send("Rock"))
+        self.assertTrue(n1.send("Paper").bothWent())
+        for flooder in flooders:
+            flooder.join()
+        self.assertEqual(len(server.clients), 2)
+        for reader in readers:
+            reader.close()
+        n0.client.close()
+        n1.client.close()
+
+class TestSelectorPoolServer(TestPoolServer):
+    """The same tests, with the selector the pool falls back to where there is no epoll."""
+
+    def start(self, **kwargs):
+        server = BlockingPoolServer("localhost", 0, **kwargs)
+        server.poller = SelectorPoller()
+        threading.Thread(target=server.run_server, daemon=True).start()
+        self.addCleanup(server.release.set)
+        return server
+
+if __name__ == "__main__":
+    unittest.main()
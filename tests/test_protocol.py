@@ -0,0 +1,162 @@
+import socket
+import unittest
+from game import Game
+from rules import LIZARD_SPOCK, RuleSet
+from protocol import (FrameBuffer, GameClosed, ProtocolError, encode_frame, encode_game, decode_game,
+                      game_fields, encode_delta, apply_update, encode_closed, decode_closed,
+                      encode_room, decode_room, encode_joined, decode_joined, CLOSE_REASONS, HEADER, MAX_FRAME_SIZE, NOT_MODIFIED, SNAPSHOT)
+
+class TestFrameBuffer(unittest.TestCase):
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def test_coalesced_frames(self):
+        self.a.sendall(encode_frame(b"get") + encode_frame(b"Rock") + encode_frame(b"reset"))
+        frames = FrameBuffer()
+        self.assertEqual(bytes(frames.read_frame(self.b)), b"get")
+        self.assertEqual(bytes(frames.read_frame(self.b)), b"Rock")
+        self.assertEqual(bytes(frames.read_frame(self.b)), b"reset")
+
+    def test_split_frame(self):
+        data = encode_frame(b"Scissors")
+        frames = FrameBuffer()
+        self.a.sendall(data[:2])
+        frames.fill(self.b)
+        self.assertIsNone(frames.next_frame())
+        self.a.sendall(data[2:])
+        self.assertEqual(bytes(frames.read_frame(self.b)), b"Scissors")
+
+    def test_frame_larger_than_buffer(self):
+        payload = bytes(range(256)) * 64
+        self.a.sendall(encode_frame(payload) + encode_frame(b"after"))
+        frames = FrameBuffer(size=16)
+        self.assertEqual(bytes(frames.read_frame(self.b)), payload)
+        self.assertEqual(bytes(frames.read_frame(self.b)), b"after")
+
+    def test_fed_data(self):
+        payload = bytes(range(256)) * 64
+        data = encode_frame(b"get") + encode_frame(payload) + encode_frame(b"after")
+        frames = FrameBuffer(size=16)
+        received = []
+        for i in range(0, len(data), 7):
+            frames.feed(data[i:i + 7])
+            frame = frames.next_frame()
+            while frame is not None:
+                received.append(bytes(frame))
+                frame = frames.next_frame()
+        self.assertEqual(received, [b"get", payload, b"after"])
+
+    def test_buffer_is_reused(self):
+        frames = FrameBuffer()
+        buf = frames.buf
+        for _ in range(100):
+            self.a.sendall(encode_frame(b"get"))
+            frames.read_frame(self.b)
+        self.assertIs(frames.buf, buf)
+
+    def test_closed_connection(self):
+        self.a.close()
+        self.assertIsNone(FrameBuffer().read_frame(self.b))
+
+    def test_oversized_frame(self):
+        self.a.sendall(HEADER.pack(MAX_FRAME_SIZE + 1))
+        with self.assertRaises(ProtocolError):
+            FrameBuffer().read_frame(self.b)
+
+class TestGameSnapshot(unittest.TestCase):
+    def test_round_trip(self):
+        game = Game(42)
+        game.ready = True
+        game.play(0, "Rock")
+        game.play(1, "Scissors")
+        game.wins = [3, 1]
+        game.ties = 2
+        decoded = decode_game(encode_game(game))
+        self.assertEqual(decoded.id, 42)
+        self.assertTrue(decoded.connected())
+        self.assertTrue(decoded.bothWent())
+        self.assertEqual(decoded.moves, ["Rock", "Scissors"])
+        self.assertEqual(decoded.winner(), game.winner())
+        self.assertEqual((decoded.wins, decoded.ties), ([3, 1], 2))
+        self.assertEqual(decoded.version, game.version)
+
+    def test_fresh_game(self):
+        decoded = decode_game(encode_game(Game(0)))
+        self.assertFalse(decoded.connected())
+        self.assertFalse(decoded.p1Went or decoded.p2Went)
+        self.assertEqual(decoded.moves, [None, None])
+
+    def test_fixed_size(self):
+        self.assertEqual(len(encode_game(Game(7))), SNAPSHOT.size)
+
+    def test_variant_round_trip(self):
+        game = Game(5, LIZARD_SPOCK)
+        game.play(0, "Spock")
+        game.play(1, "Lizard")
+        decoded = decode_game(encode_game(game))
+        self.assertIs(decoded.rules, LIZARD_SPOCK)
+        self.assertEqual(decoded.moves, ["Spock", "Lizard"])
+        self.assertEqual(decoded.winner(), 1)
+        with self.assertRaises(ValueError):
+            encode_game(Game(0, RuleSet.cyclic("custom", ["A", "B", "C"])))
+
+    def test_unknown_version(self):
+        payload = bytearray(encode_game(Game(0)))
+        payload[0] = 99
+        with self.assertRaises(ProtocolError):
+            decode_game(bytes(payload))
+
+class TestGameDelta(unittest.TestCase):
+    def test_delta_round_trip(self):
+        game = Game(3)
+        old = game_fields(game)
+        client_copy = decode_game(encode_game(game))
+        game.set_ready()
+        game.play(1, "Paper")
+        delta = encode_delta(old, game_fields(game))
+        self.assertLess(len(delta), SNAPSHOT.size)
+        updated = apply_update(client_copy, delta)
+        self.assertEqual(game_fields(updated), game_fields(game))
+        self.assertIsNot(updated, client_copy)
+
+    def test_not_modified(self):
+        game = decode_game(encode_game(Game(0)))
+        self.assertIs(apply_update(game, NOT_MODIFIED), game)
+
+    def test_delta_needs_a_game(self):
+        with self.assertRaises(ProtocolError):
+            apply_update(None, NOT_MODIFIED)
+
+class TestGameClosed(unittest.TestCase):
+    def test_round_trip(self):
+        for reason in CLOSE_REASONS:
+            self.assertEqual(decode_closed(encode_closed(reason)), reason)
+        with self.assertRaises(ProtocolError):
+            decode_closed(b"\x83\xff")
+
+    def test_apply_raises(self):
+        with self.assertRaises(GameClosed) as raised:
+            apply_update(Game(0), encode_closed("idle"))
+        self.assertEqual(raised.exception.reason, "idle")
+        self.assertIsInstance(raised.exception, EOFError)
+
+class TestRooms(unittest.TestCase):
+    def test_room_round_trip(self):
+        game = Game(7)
+        game_id, update = decode_room(encode_room(7, encode_game(game)))
+        self.assertEqual(game_id, 7)
+        self.assertEqual(decode_game(update).id, 7)
+        with self.assertRaises(ProtocolError):
+            decode_room(encode_room(7, b""))
+
+    def test_joined_round_trip(self):
+        self.assertEqual(decode_joined(encode_joined(123456, 1)), (123456, 1))
+        with self.assertRaises(ProtocolError):
+            decode_joined(encode_room(1, NOT_MODIFIED))
+
+if __name__ == '__main__':
+    unittest.main()
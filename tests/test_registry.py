@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+from network import Network
+from registry import GameRegistry
+from server import Server
+
+def run_threads(target, count):
+    errors = []
+
+    def wrapper(index):
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=wrapper, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+class TestGameRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = GameRegistry(stripes=8)
+
+    def test_create_get_remove(self):
+        game = self.registry.create(1)
+        self.assertIn(1, self.registry)
+        self.assertIs(self.registry.get(1), game)
+        self.assertRaises(KeyError, self.registry.create, 1)
+        self.assertIs(self.registry.remove(1), game)
+        self.assertIsNone(self.registry.remove(1))
+        self.assertIsNone(self.registry.get(1))
+        self.assertEqual(len(self.registry), 0)
+
+    def test_join(self):
+        self.registry.create(5)
+        self.assertTrue(self.registry.join(5).connected())
+        self.assertIsNone(self.registry.join(6))
+
+    def test_locked_missing_game(self):
+        with self.assertRaises(KeyError):
+            with self.registry.locked(3):
+                pass
+
+    def test_concurrent_create_join_remove(self):
+        def churn(index):
+            for i in range(500):
+                game_id = index * 1000 + i
+                self.registry.create(game_id)
+                self.assertIsNotNone(self.registry.join(game_id))
+                if i % 2:
+                    self.assertIsNotNone(self.registry.remove(game_id))
+
+        self.assertEqual(run_threads(churn, 16), [])
+        self.assertEqual(len(self.registry), 16 * 250)
+
+    def test_concurrent_moves_on_one_game(self):
+        self.registry.create(0)
+
+        def play(player):
+            for _ in range(2000):
+                with self.registry.locked(0) as game:
+                    game.play(player % 2, "Rock")
+
+        self.assertEqual(run_threads(play, 8), [])
+        self.assertEqual(self.registry.get(0).version, 8 * 2000)
+
+class TestServerUnderChurn(unittest.TestCase):
+    def setUp(self):
+        self.server = Server("localhost", 0)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def test_joins_and_disconnects(self):
+        def player(index):
+            for i in range(20):
+                n = Network("localhost", self.server.port)
+                game = n.send("get")
+                if game is not None:
+                    if n.getP() == "1":
+                        self.assertTrue(game.connected())
+                    n.send("Rock")
+                n.client.close()
+
+        self.assertEqual(run_threads(player, 8), [])
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and any(self.server.stats().values()):
+            time.sleep(0.05)
+        self.assertEqual(self.server.stats(), {"connections": 0, "games": 0})
+        self.assertEqual(self.server.matchmaker.waiting, {})
+
+if __name__ == '__main__':
+    unittest.main()
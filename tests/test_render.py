@@ -0,0 +1,70 @@
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+try:
+    import pygame
+    from render import RenderCache, Renderer
+except ImportError:
+    pygame = None
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        pygame.font.init()
+
+    def test_fonts_are_loaded_once(self):
+        cache = RenderCache()
+        self.assertIs(cache.font(40), cache.font(40))
+
+    def test_text_is_rendered_once(self):
+        cache = RenderCache()
+        surface = cache.text("Rock", 40, (255, 255, 255))
+        self.assertIs(cache.text("Rock", 40, (255, 255, 255)), surface)
+        self.assertIsNot(cache.text("Rock", 40, (0, 0, 0)), surface)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_least_recently_used_text_is_evicted(self):
+        cache = RenderCache(capacity=2)
+        cache.text("Rock", 40, (0, 0, 0))
+        cache.text("Paper", 40, (0, 0, 0))
+        cache.text("Rock", 40, (0, 0, 0))
+        cache.text("Scissors", 40, (0, 0, 0))
+        self.assertEqual([key[0] for key in cache.surfaces], ["Rock", "Scissors"])
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        pygame.display.init()
+        pygame.font.init()
+        self.addCleanup(pygame.display.quit)
+        self.win = pygame.display.set_mode((600, 600))
+        self.renderer = Renderer(self.win)
+
+    def frame(self, move):
+        self.renderer.rect((0, 0, 0), (50, 500, 150, 100))
+        self.renderer.text("Your Move", 60, (80, 200), (0, 255, 255))
+        self.renderer.text(move, 60, (100, 350), (0, 0, 0))
+        return self.renderer.present()
+
+    def test_first_frame_updates_the_whole_window(self):
+        self.assertEqual(self.frame("Waiting..."), [self.win.get_rect()])
+
+    def test_unchanged_frame_draws_nothing(self):
+        self.frame("Waiting...")
+        self.assertEqual(self.frame("Waiting..."), [])
+
+    def test_only_the_changed_label_is_updated(self):
+        self.frame("Waiting...")
+        dirty = self.frame("Rock")
+        self.assertEqual(len(dirty), 2)
+        self.assertTrue(all(area.top >= 350 and area.bottom <= 500 for area in dirty))
+        self.assertEqual(self.win.get_at((100, 550))[:3], (0, 0, 0))
+
+    def test_invalidate_redraws_everything(self):
+        self.frame("Waiting...")
+        self.renderer.invalidate()
+        self.assertEqual(self.frame("Waiting..."), [self.win.get_rect()])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import socket
+import threading
+import time
+import unittest
+from network import Network, RoomNetwork
+from protocol import encode_frame
+from server import Server
+from sockopts import SocketOptions
+
+class TestRooms(unittest.TestCase):
+    def start(self, **kwargs):
+        server = Server("localhost", 0, **kwargs)
+        server.timers.tick = 0.02
+        threading.Thread(target=server.run_server, daemon=True).start()
+        return server
+
+    def wait_for_update(self, network, limit=3.0):
+        deadline = time.monotonic() + limit
+        while time.monotonic() < deadline:
+            update = network.poll()
+            if update is not None:
+                return update
+            time.sleep(0.01)
+        self.fail("no update was pushed")
+
+    def test_one_connection_plays_several_games(self):
+        server = self.start()
+        bot = RoomNetwork("localhost", server.port)
+        first, = bot.seats
+        self.assertEqual(bot.seats[first], 0)
+        # The bot is never paired with itself: its second game waits for an opponent too.
+        second, p = bot.join()
+        self.assertEqual(p, 0)
+        self.assertNotEqual(first, second)
+
+        opponents = {first: Network("localhost", server.port), second: Network("localhost", server.port)}
+        bot.send(first, "Rock")
+        bot.send(second, "Paper")
+        opponents[first].send("Scissors")
+        opponents[second].send("Scissors")
+
+        self.assertEqual(bot.send(first, "get").wins, [1, 0])
+        self.assertEqual(bot.send(second, "get").wins, [0, 1])
+        self.assertEqual(len(server.connected), 3)
+
+    def test_subscribed_updates_are_tagged(self):
+        server = self.start()
+        bot = RoomNetwork("localhost", server.port)
+        first, = bot.seats
+        second, _ = bot.join()
+        n1 = Network("localhost", server.port)
+        n2 = Network("localhost", server.port)
+        self.assertTrue(bot.subscribe(first).connected())
+        self.assertTrue(bot.subscribe(second).connected())
+
+        n2.send("Paper")
+        game_id, game = self.wait_for_update(bot)
+        self.assertEqual(game_id, second)
+        self.assertTrue(game.p2Went)
+        self.assertIs(bot.games[second], game)
+        self.assertIsNone(bot.poll())
+
+    def test_spectator_watches_without_playing(self):
+        server = self.start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        game_id = n0.send("get").id
+        dashboard = RoomNetwork("localhost", server.port)
+        own, = dashboard.seats
+        dashboard.leave(own)
+        self.assertEqual(dashboard.closed[own], "left")
+
+        self.assertTrue(dashboard.watch(game_id).connected())
+        # A spectator's moves are not played.
+        self.assertFalse(dashboard.send(game_id, "Rock").p1Went)
+        n0.send("Rock")
+        self.assertEqual(self.wait_for_update(dashboard)[0], game_id)
+        self.assertTrue(dashboard.games[game_id].p1Went)
+        self.assertEqual(dashboard.watch(12345), None)
+        self.assertEqual(dashboard.closed[12345], "left")
+
+        n1.client.close()
+        self.assertEqual(self.wait_for_update(dashboard), (game_id, None))
+        self.assertEqual(dashboard.closed[game_id], "left")
+        self.assertEqual(dashboard.games, {})
+
+    def test_leaving_closes_only_that_game(self):
+        server = self.start()
+        bot = RoomNetwork("localhost", server.port)
+        first, = bot.seats
+        second, _ = bot.join()
+        n1 = Network("localhost", server.port)
+        n2 = Network("localhost", server.port)
+        bot.leave(first)
+        n1.send("get")
+        self.assertEqual(n1.closed_reason, "left")
+        self.assertIsNone(bot.send(first, "Rock"))
+        self.assertTrue(bot.send(second, "get").connected())
+        self.assertEqual(set(server.channels), {(second, 0), (second, 1)})
+
+        bot.client.close()
+        # The server notices the disconnect in its own time, so the opponent may get a reply first.
+        deadline = time.monotonic() + 3
+        while n2.send("get") is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(n2.closed_reason, "left")
+        self.assertEqual(server.channels, {})
+
+    def test_idle_connection_closes_all_its_games(self):
+        server = self.start(idle_timeout=0.2)
+        bot = RoomNetwork("localhost", server.port)
+        first, = bot.seats
+        bot.join()
+        opponents = [Network("localhost", server.port) for _ in range(2)]
+        for _ in range(20):
+            if all(n.send("get") is None for n in opponents):
+                break
+            time.sleep(0.05)
+        self.assertEqual([n.closed_reason for n in opponents], ["idle", "idle"])
+        self.assertEqual(len(server.games), 0)
+
+    def test_malformed_game_ids_are_ignored(self):
+        server = self.start()
+        bot = RoomNetwork("localhost", server.port)
+        first, = bot.seats
+        opponent = Network("localhost", server.port)
+        for data in (b"@abc:get", b"@:Rock", b"@-1:get", b"@99999999999:get", b"watch:xyz", b"watch:",
+                     b"leave:abc", b"leave:-5"):
+            bot.client.sendall(encode_frame(data))
+        # The connection and its game are still there.
+        self.assertTrue(bot.send(first, "get").connected())
+        self.assertTrue(opponent.send("get").connected())
+        self.assertEqual(set(server.channels), {(first, 0), (first, 1)})
+
+    def test_a_spectator_that_stops_reading_does_not_hold_up_players(self):
+        server = self.start(socket_options=SocketOptions(sndbuf=4096))
+        n0, n1 = Network("localhost", server.port), Network("localhost", server.port)
+        watched = n0.send("get").id
+        n2, n3 = Network("localhost", server.port), Network("localhost", server.port)
+        joined = n2.send("get").id
+        spectator = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        spectator.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        spectator.connect(("localhost", server.port))
+        spectator.sendall(encode_frame(b"rooms") + encode_frame(f"watch:{watched}".encode()))
+        # Play until both ends of the spectator's connection are full and an update stays queued for it.
+        channel = None
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            for _ in range(50):
+                n0.send("Rock")
+                n1.send("Paper")
+                n0.send("reset")
+            time.sleep(0.05)
+            channel = next((c for c in list(server.connected) if c.rooms and watched in c.rooms), None)
+            if channel is not None and channel.pending:
+                break
+        self.assertTrue(channel.pending)
+
+        # Watching another game while the spectator still reads nothing must not lock that game up.
+        spectator.sendall(encode_frame(f"watch:{joined}".encode()))
+        time.sleep(0.2)
+        n2.client.settimeout(2)
+        self.assertIsNotNone(n2.send("Rock"))
+        self.assertTrue(n3.send("Paper").bothWent())
+        spectator.close()
+
+if __name__ == "__main__":
+    unittest.main()
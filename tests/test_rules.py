@@ -0,0 +1,96 @@
+import pickle
+import threading
+import unittest
+import rules
+from batch import resolve_rounds
+from game import Game
+from move import Move
+from network import Network
+from rules import CLASSIC, LIZARD_SPOCK, RuleSet
+from server import Server
+
+# Every winning pair of Rock-Paper-Scissors-Lizard-Spock, as the rules are usually stated.
+LIZARD_SPOCK_WINS = {
+    ("Scissors", "Paper"), ("Paper", "Rock"), ("Rock", "Lizard"), ("Lizard", "Spock"), ("Spock", "Scissors"),
+    ("Scissors", "Lizard"), ("Lizard", "Paper"), ("Paper", "Spock"), ("Spock", "Rock"), ("Rock", "Scissors"),
+}
+
+class TestRuleSet(unittest.TestCase):
+    def check_outcomes(self, ruleset, wins):
+        for first in ruleset.moves:
+            for second in ruleset.moves:
+                expected = 0 if (first, second) in wins else 1 if (second, first) in wins else -1
+                outcome = ruleset.outcome(ruleset.code(first), ruleset.code(second))
+                self.assertEqual(outcome, expected, (first, second))
+
+    def test_classic(self):
+        self.check_outcomes(CLASSIC, {("Rock", "Scissors"), ("Scissors", "Paper"), ("Paper", "Rock")})
+
+    def test_lizard_spock(self):
+        self.check_outcomes(LIZARD_SPOCK, LIZARD_SPOCK_WINS)
+        self.assertNotEqual(LIZARD_SPOCK.code("Scissors"), LIZARD_SPOCK.code("spock"))
+
+    def test_no_move_never_wins(self):
+        self.assertEqual(CLASSIC.outcome(0, CLASSIC.code("Rock")), -1)
+        self.assertEqual(CLASSIC.outcome(CLASSIC.code("Rock"), 0), -1)
+        self.assertIsNone(CLASSIC.label(0))
+
+    def test_move_codes_follow_classic_rules(self):
+        for move in Move:
+            self.assertEqual(move.code, CLASSIC.code(move.label))
+            self.assertIs(Move.from_code(move.code), move)
+
+    def test_custom_dominance_graph(self):
+        ruleset = RuleSet("duel", ["Sword", "Shield", "Bow"], {"Sword": ["Bow"], "Bow": ["Shield"]})
+        self.check_outcomes(ruleset, {("Sword", "Bow"), ("Bow", "Shield")})
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            RuleSet.cyclic("even", ["A", "B", "C", "D"])
+        with self.assertRaises(ValueError):
+            RuleSet("loop", ["A", "B"], {"A": ["B"], "B": ["A"]})
+        with self.assertRaises(ValueError):
+            RuleSet("dupe", ["A", "a"], {})
+        with self.assertRaises(KeyError):
+            RuleSet("unknown", ["A"], {"A": ["B"]})
+
+    def test_builtin_variants_pickle_by_name(self):
+        self.assertIs(pickle.loads(pickle.dumps(LIZARD_SPOCK)), LIZARD_SPOCK)
+        self.assertIs(rules.variant("classic"), CLASSIC)
+
+class TestVariantGames(unittest.TestCase):
+    def test_game_uses_its_rules(self):
+        game = Game(1, LIZARD_SPOCK)
+        game.play(0, "Spock")
+        game.play(1, "Scissors")
+        self.assertEqual(game.winner(), 0)
+        self.assertEqual(game.moves, ["Spock", "Scissors"])
+        with self.assertRaises(KeyError):
+            Game(2).play(0, "Spock")
+
+    def test_batch_uses_the_same_rules(self):
+        codes = range(1, len(LIZARD_SPOCK) + 1)
+        moves0 = [a for a in codes for b in codes]
+        moves1 = [b for a in codes for b in codes]
+        result = resolve_rounds(moves0, moves1, rules=LIZARD_SPOCK, use_numpy=False)
+        for m0, m1, winner in zip(moves0, moves1, result.winners):
+            game = Game(0, LIZARD_SPOCK)
+            game.move_codes = (m0, m1)
+            self.assertEqual(winner, game.winner())
+        self.assertEqual(result.wins, [10, 10])
+        with self.assertRaises(ValueError):
+            resolve_rounds([4], [1], use_numpy=False)
+
+    def test_server_plays_a_variant(self):
+        server = Server("localhost", 0, rules=LIZARD_SPOCK)
+        threading.Thread(target=server.run_server, daemon=True).start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n0.send("Spock")
+        game = n1.send("lizard")
+        self.assertIs(game.rules, LIZARD_SPOCK)
+        self.assertEqual(game.moves, ["Spock", "Lizard"])
+        self.assertEqual(game.winner(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+from improvements.leaderboard import Leaderboard
+from network import Network
+from protocol import MAX_TOP, decode_leaderboard, encode_leaderboard
+from scores import ScoreKeeper
+from server import Server
+
+class TestScoreKeeper(unittest.TestCase):
+    def test_results_are_applied_in_the_background(self):
+        keeper = ScoreKeeper()
+        for _ in range(3):
+            keeper.record(1, ("ann", "bob"), (1, 3), 0)
+        keeper.record(1, ("ann", "bob"), (2, 2), -1)
+        keeper.record(2, (None, "cat"), (3, 1), 1)
+        keeper.flush()
+        self.assertEqual(keeper.top(10), [("ann", 3), ("cat", 1), ("bob", 0)])
+
+    def test_updates_are_coalesced_per_player(self):
+        class CountingLeaderboard(Leaderboard):
+            calls = 0
+
+            def add_score(self, player_name, score):
+                CountingLeaderboard.calls += 1
+                super().add_score(player_name, score)
+
+        keeper = ScoreKeeper(CountingLeaderboard())
+        with keeper.lock:
+            # The writer cannot apply anything while the lock is held, so all results queue up.
+            keeper.record(1, ("ann", "bob"), (1, 3), 0)
+            time.sleep(0.05)
+            for _ in range(99):
+                keeper.record(1, ("bob", "ann"), (1, 2), 1)
+        keeper.flush()
+        self.assertEqual(keeper.top(2), [("ann", 100), ("bob", 0)])
+        self.assertLessEqual(CountingLeaderboard.calls, 4)
+
+    def test_a_failed_batch_does_not_stop_the_writer(self):
+        class FailingLog:
+            sync_interval = 0.01
+            failures = 1
+
+            def append(self, *round):
+                if self.failures:
+                    self.failures -= 1
+                    raise OSError("No space left on device")
+
+            def sync(self):
+                pass
+
+        keeper = ScoreKeeper(log=FailingLog())
+        with self.assertLogs("rps.scores", "ERROR"):
+            keeper.record(1, ("ann", "bob"), (1, 3), 0)
+            keeper.flush()
+        keeper.record(2, ("cat", "dan"), (1, 3), 0)
+        keeper.flush()
+        self.assertEqual(keeper.top(10), [("cat", 1), ("dan", 0)])
+
+class TestLeaderboardEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        entries = [("ann", 12), ("Zoë", 3), ("", 0)]
+        self.assertEqual(decode_leaderboard(encode_leaderboard(entries)), entries)
+        self.assertEqual(decode_leaderboard(encode_leaderboard([])), [])
+
+class TestServerScores(unittest.TestCase):
+    def setUp(self):
+        self.server = Server("localhost", 0)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def play_round(self, n0, n1, move0, move1):
+        n0.send(move0)
+        game = n1.send(move1)
+        n0.send("reset")
+        return game
+
+    def test_rounds_update_game_and_leaderboard(self):
+        n0 = Network("localhost", self.server.port)
+        n1 = Network("localhost", self.server.port)
+        n0.send("name:ann")
+        n1.send("name:bob")
+        game = self.play_round(n0, n1, "Rock", "Scissors")
+        self.assertEqual((game.wins, game.ties), ([1, 0], 0))
+        game = self.play_round(n0, n1, "Paper", "Paper")
+        self.assertEqual((game.wins, game.ties), ([1, 0], 1))
+        self.play_round(n0, n1, "Rock", "Paper")
+        # A move made again before the reset is not a new round.
+        n0.send("Rock")
+        n1.send("Paper")
+        game = n1.send("Scissors")
+        self.assertEqual((game.wins, game.ties), ([1, 2], 1))
+        self.server.scores.flush()
+        self.assertEqual(n0.top_scores(5), [("bob", 2), ("ann", 1)])
+        self.assertEqual(n1.top_scores(1), [("bob", 2)])
+
+    def test_top_scores_when_subscribed(self):
+        n0 = Network("localhost", self.server.port)
+        n1 = Network("localhost", self.server.port)
+        n0.subscribe()
+        n1.send("name:cat")
+        n0.post("Rock")
+        game = n1.send("Paper")
+        while not game.bothWent():
+            # The posted move may still be in flight when player 1's reply arrives.
+            game = n1.send("get")
+        self.server.scores.flush()
+        self.assertEqual(n0.top_scores(MAX_TOP + 1), [("cat", 1)])
+        self.assertTrue(n0.game.bothWent())
+
+    def test_arguments_that_are_not_numbers(self):
+        n0 = Network("localhost", self.server.port)
+        n1 = Network("localhost", self.server.port)
+        n1.send("name:dan")
+        n0.send("Rock")
+        n1.send("Paper")
+        self.server.scores.flush()
+        for data in ("top", "top:", "top:abc"):
+            n0.post(data)
+            self.assertEqual(decode_leaderboard(n0.frames.read_frame(n0.client)), [("dan", 1)])
+        # A version that is not a number gets the whole snapshot, and the client stays connected.
+        game = n0.send("get:abc")
+        self.assertEqual(game.wins, [0, 1])
+        self.assertEqual(n0.send("get").wins, [0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from network import BackgroundNetwork, Network
+from server import Server
+from session import Session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class RecordingView:
+    def __init__(self):
+        self.texts = []
+
+    def text(self, text, size, position, color, center=False):
+        self.texts.append(text)
+
+    def rect(self, color, rect):
+        pass
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.server = Server("localhost", 0)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def connect(self, player):
+        network = Network("localhost", self.server.port)
+        connection = BackgroundNetwork(network)
+        self.addCleanup(connection.close)
+        return Session(connection, player, result_time=0.2)
+
+    def wait_until(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Timed out")
+            time.sleep(0.005)
+
+    def describe(self, session):
+        view = RecordingView()
+        session.describe(view, 600, 600)
+        return view.texts
+
+    def test_waiting_for_an_opponent(self):
+        s0 = self.connect(0)
+        s0.start()
+        self.assertFalse(s0.play("Rock"))
+        self.assertEqual(self.describe(s0), ["Waiting for Player..."])
+
+    def test_a_round_is_played_and_its_result_shown(self):
+        s0, s1 = self.connect(0), self.connect(1)
+        s0.start()
+        s1.start()
+        self.wait_until(lambda: s0.update().connected())
+        self.assertTrue(s0.play("Rock"))
+        self.wait_until(lambda: s0.update().p1Went)
+        self.assertFalse(s0.play("Paper"))
+        self.wait_until(lambda: s1.update().p1Went)
+        self.assertEqual(self.describe(s1), ["Your Move", "Opponents", "Waiting...", "Locked In"])
+        self.assertTrue(s1.play("Scissors"))
+
+        self.wait_until(lambda: s0.update() is s0.finished is not None)
+        self.assertEqual(self.describe(s0)[-1], "You Won!")
+        # Moves wait until the result is down, and the game was reset in the meantime.
+        self.assertFalse(s0.play("Rock"))
+        self.wait_until(lambda: not s0.update().bothWent())
+        self.assertTrue(s0.play("Rock"))
+
+    def test_importing_the_client_does_not_load_pygame(self):
+        code = "import sys, client, session; print('pygame' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+        self.assertEqual(output.stdout.strip(), "False")
+
+if __name__ == "__main__":
+    unittest.main()
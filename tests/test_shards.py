@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+import urllib.request
+from network import Network
+from shards import Lobby
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self.lobby = Lobby("localhost", 0, workers=3, stats_interval=0.1)
+        self.lobby.start()
+        threading.Thread(target=self.lobby.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        for process in self.lobby.processes:
+            process.terminate()
+            process.join()
+
+    def connect(self):
+        return Network("localhost", self.lobby.port)
+
+    def test_players_are_paired_in_the_same_worker(self):
+        players = [self.connect() for _ in range(10)]
+        self.assertEqual([n.getP() for n in players], ["0", "1"] * 5)
+        for host, guest in zip(players[::2], players[1::2]):
+            host.send("Rock")
+            game = guest.send("Paper")
+            self.assertTrue(game.connected())
+            self.assertTrue(game.bothWent())
+            self.assertEqual(game.winner(), 1)
+
+    def test_abandoned_waiting_player_is_replaced(self):
+        waiting = self.connect()
+        waiting.client.close()
+        time.sleep(0.2)
+        host = self.connect()
+        guest = self.connect()
+        self.assertEqual((host.getP(), guest.getP()), ("0", "1"))
+        self.assertTrue(host.send("get").connected())
+
+    def test_stats_are_aggregated(self):
+        players = [self.connect() for _ in range(4)]
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            stats = self.lobby.stats()
+            if stats.get("connections") == 4 and stats["workers"] == 3:
+                break
+            time.sleep(0.05)
+        self.assertEqual(stats["connections"], 4)
+        self.assertEqual(stats["games"], 2)
+
+class TestShardMetrics(unittest.TestCase):
+    def setUp(self):
+        self.lobby = Lobby("localhost", 0, workers=2, stats_interval=0.1, metrics=True)
+        self.lobby.start()
+        threading.Thread(target=self.lobby.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        for process in self.lobby.processes:
+            process.terminate()
+            process.join()
+
+    def connect(self):
+        return Network("localhost", self.lobby.port)
+
+    def test_metrics_are_aggregated(self):
+        endpoint = self.lobby.start_metrics(port=0)
+        players = [self.connect() for _ in range(4)]
+        for host, guest in zip(players[::2], players[1::2]):
+            host.send("Rock")
+            guest.send("Paper")
+        url = f"http://localhost:{endpoint.server_address[1]}/metrics"
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            text = urllib.request.urlopen(url).read().decode()
+            if "rps_connections 4\n" in text and "rps_messages_in_total 4\n" in text:
+                break
+            time.sleep(0.05)
+        self.assertIn("rps_workers 2\n", text)
+        self.assertIn("rps_connections 4\n", text)
+        self.assertIn("rps_messages_in_total 4\n", text)
+        self.assertIn("rps_rounds_resolved_total 2\n", text)
+        self.assertIn("rps_handle_seconds_count 4\n", text)
+        endpoint.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import socket
+import threading
+import unittest
+from network import Network
+from server import Server
+from sockopts import SocketOptions
+
+class TestSocketOptions(unittest.TestCase):
+    def test_defaults_turn_nagle_off(self):
+        sock = SocketOptions().socket()
+        self.addCleanup(sock.close)
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertFalse(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+
+    def test_nagle_can_be_left_on(self):
+        sock = SocketOptions(nodelay=False).socket()
+        self.addCleanup(sock.close)
+        self.assertFalse(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+
+    def test_keepalive_and_buffers(self):
+        sock = SocketOptions(keepalive=30, keepalive_interval=5, keepalive_count=3, rcvbuf=65536).socket()
+        self.addCleanup(sock.close)
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            self.assertEqual(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE), 30)
+        # The kernel may round the size up, e.g. Linux doubles it for its own bookkeeping.
+        self.assertGreaterEqual(sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), 65536)
+
+    def test_restarted_server_binds_a_port_in_time_wait(self):
+        first = SocketOptions().listen("localhost", 0)
+        port = first.getsockname()[1]
+        client = socket.create_connection(("localhost", port))
+        conn, _ = first.accept()
+        # The server closing first leaves its end of the connection in TIME_WAIT.
+        conn.close()
+        client.recv(1)
+        client.close()
+        first.close()
+        second = SocketOptions().listen("localhost", port)
+        self.addCleanup(second.close)
+        self.assertEqual(second.getsockname()[1], port)
+
+    def test_server_and_network_use_the_options(self):
+        server = Server("localhost", 0, socket_options=SocketOptions(backlog=512, keepalive=60))
+        threading.Thread(target=server.run_server, daemon=True).start()
+        self.assertTrue(server.s.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR))
+        network = Network("localhost", server.port, SocketOptions(nodelay=False))
+        self.addCleanup(network.client.close)
+        self.assertEqual(network.getP(), "0")
+        self.assertFalse(network.client.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        accepted = server.channels[(network.send("get").id, 0)].conn
+        self.assertTrue(accepted.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertTrue(accepted.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+        self.assertFalse(network.send("get").connected())
+
+if __name__ == "__main__":
+    unittest.main()
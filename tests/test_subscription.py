@@ -0,0 +1,139 @@
+import threading
+import time
+import unittest
+from server import Server
+from async_server import AsyncServer
+from network import BackgroundNetwork, Network
+
+class SubscriptionTests:
+    server_class = None
+
+    def setUp(self):
+        self.server = self.server_class("localhost", 0)
+        threading.Thread(target=self.server.run_server, daemon=True).start()
+
+    def connect(self):
+        return Network("localhost", self.server.port)
+
+    def wait_for_update(self, network, timeout=2):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            game = network.poll()
+            if game is not None:
+                return game
+            time.sleep(0.005)
+        self.fail("No update was pushed")
+
+    def test_opponent_join_is_pushed(self):
+        n0 = self.connect()
+        self.assertFalse(n0.subscribe().connected())
+        self.assertIsNone(n0.poll())
+        n1 = self.connect()
+        self.assertTrue(self.wait_for_update(n0).connected())
+
+    def test_moves_and_reset_are_pushed(self):
+        n0 = self.connect()
+        n1 = self.connect()
+        n0.subscribe()
+        n1.post("Rock")
+        self.assertTrue(self.wait_for_update(n0).p2Went)
+        n0.post("Scissors")
+        game = self.wait_for_update(n0)
+        self.assertTrue(game.bothWent())
+        self.assertEqual(game.winner(), 1)
+        n0.post("reset")
+        self.assertFalse(self.wait_for_update(n0).bothWent())
+
+    def test_unchanged_state_is_not_pushed(self):
+        n0 = self.connect()
+        n1 = self.connect()
+        self.assertTrue(n0.subscribe().connected())
+        n0.post("reset")
+        time.sleep(0.1)
+        self.assertIsNone(n0.poll())
+
+    def test_get_still_answers_when_subscribed(self):
+        n0 = self.connect()
+        n0.subscribe()
+        self.assertFalse(n0.send("get").connected())
+
+    def test_subscriber_is_disconnected_when_game_closes(self):
+        n0 = self.connect()
+        n1 = self.connect()
+        n0.subscribe()
+        n1.client.close()
+        with self.assertRaises(EOFError):
+            self.wait_for_update(n0)
+
+    def test_sync_sends_only_changes(self):
+        n0 = self.connect()
+        n1 = self.connect()
+        game = n0.sync()
+        self.assertTrue(game.connected())
+        self.assertIs(n0.sync(), game)
+        n1.send("Rock")
+        game = n0.sync()
+        self.assertTrue(game.p2Went)
+        self.assertEqual(game.get_player_move(1), "Rock")
+        self.assertEqual(game.version, n1.send("get").version)
+
+    def wait_until(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Timed out")
+            time.sleep(0.005)
+
+    def test_background_network_keeps_finished_rounds(self):
+        background = BackgroundNetwork(self.connect())
+        self.addCleanup(background.close)
+        n1 = self.connect()
+        background.start()
+        self.wait_until(lambda: background.game.connected())
+        n1.post("Rock")
+        background.post("Paper")
+        self.wait_until(lambda: background.game.bothWent())
+        # Once reset, the newest game no longer shows the round, but it was kept.
+        background.post("reset")
+        self.wait_until(lambda: not background.game.bothWent())
+        finished = background.next_round()
+        self.assertEqual(finished.winner(), 0)
+        self.assertIsNone(background.next_round())
+
+    def test_background_network_applies_updates_read_with_the_subscribe_reply(self):
+        n1 = self.connect()
+        test = self
+
+        class OpponentMovesAtOnce(Network):
+            def subscribe(self):
+                # The move is pushed straight after the reply, so both are read in one go.
+                self.post("subscribe")
+                time.sleep(0.1)
+                n1.send("Rock")
+                time.sleep(0.1)
+                game = self.receive_data()
+                test.assertFalse(game.p1Went)
+                return game
+
+        background = BackgroundNetwork(OpponentMovesAtOnce("localhost", self.server.port))
+        self.addCleanup(background.close)
+        background.start()
+        self.wait_until(lambda: background.game.p1Went)
+
+    def test_background_network_reports_closed_game(self):
+        background = BackgroundNetwork(self.connect())
+        self.addCleanup(background.close)
+        n1 = self.connect()
+        background.start()
+        n1.client.close()
+        self.wait_until(lambda: background.error is not None)
+        self.assertIn("left", background.error)
+
+class TestThreadedSubscription(SubscriptionTests, unittest.TestCase):
+    server_class = Server
+
+class TestAsyncSubscription(SubscriptionTests, unittest.TestCase):
+    server_class = AsyncServer
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+from network import BackgroundNetwork, Network
+from server import Server
+from sockopts import SocketOptions
+from timers import TimerWheel
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTimerWheel(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.wheel = TimerWheel(tick=1.0, slots=8, clock=self.clock)
+        self.fired = []
+
+    def advance(self, seconds):
+        self.clock.now += seconds
+        return self.wheel.advance()
+
+    def test_fires_after_delay(self):
+        self.wheel.schedule(3, self.fired.append, "a")
+        self.wheel.schedule(2.5, self.fired.append, "b")
+        self.advance(2)
+        self.assertEqual(self.fired, [])
+        self.assertEqual(self.advance(1), 2)
+        self.assertEqual(sorted(self.fired), ["a", "b"])
+        self.advance(10)
+        self.assertEqual(len(self.fired), 2)
+
+    def test_delays_longer_than_the_wheel(self):
+        self.wheel.schedule(20, self.fired.append, "late")
+        self.advance(19)
+        self.assertEqual(self.fired, [])
+        self.advance(1)
+        self.assertEqual(self.fired, ["late"])
+
+    def test_touch_pushes_the_deadline_back(self):
+        timer = self.wheel.schedule(3, self.fired.append, "idle")
+        for _ in range(5):
+            self.advance(2)
+            self.wheel.touch(timer, 3)
+        self.assertEqual(self.fired, [])
+        self.advance(3)
+        self.assertEqual(self.fired, ["idle"])
+
+    def test_cancel(self):
+        self.wheel.schedule(1, self.fired.append, "kept")
+        self.wheel.schedule(1, self.fired.append, "cancelled").cancel()
+        self.advance(1)
+        self.assertEqual(self.fired, ["kept"])
+
+    def test_failing_callback_does_not_stop_the_others(self):
+        self.wheel.schedule(1, lambda: 1 / 0)
+        self.wheel.schedule(1, self.fired.append, "after")
+        self.advance(1)
+        self.assertEqual(self.fired, ["after"])
+
+class TestServerTimeouts(unittest.TestCase):
+    def start(self, **kwargs):
+        server = Server("localhost", 0, **kwargs)
+        server.timers.tick = 0.02
+        threading.Thread(target=server.run_server, daemon=True).start()
+        return server
+
+    def wait_closed(self, network, limit=3.0):
+        deadline = time.monotonic() + limit
+        while time.monotonic() < deadline:
+            if network.send("get") is None:
+                return network.closed_reason
+            time.sleep(0.02)
+        self.fail("game was not closed")
+
+    def test_idle_player_is_reclaimed_and_opponent_notified(self):
+        server = self.start(idle_timeout=0.2)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n1.send("get")
+        # n0 keeps polling, n1 goes quiet.
+        self.assertEqual(self.wait_closed(n0), "idle")
+        self.assertEqual(len(server.games), 0)
+        self.assertEqual(server.channels, {})
+
+    def test_stalled_game_is_closed(self):
+        server = self.start(move_timeout=0.2)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n0.send("Rock")
+        # Polling alone does not keep the game alive.
+        self.assertEqual(self.wait_closed(n1), "move_timeout")
+        self.assertEqual(n0.send("get"), None)
+        self.assertEqual(n0.closed_reason, "move_timeout")
+
+    def test_moves_keep_the_game_open(self):
+        server = self.start(idle_timeout=0.3, move_timeout=0.3)
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        for _ in range(6):
+            n0.send("Rock")
+            n1.send("Paper")
+            n0.send("reset")
+            n1.send("get")
+            time.sleep(0.1)
+        self.assertEqual(n0.send("get").wins, [0, 6])
+
+    def test_opponent_is_told_when_a_player_leaves(self):
+        server = self.start()
+        n0 = Network("localhost", server.port)
+        n1 = Network("localhost", server.port)
+        n1.send("get")
+        n1.client.close()
+        self.assertEqual(self.wait_closed(n0), "left")
+
+    def test_subscribed_clients_get_heartbeats(self):
+        server = self.start(heartbeat_interval=0.05)
+        n0 = Network("localhost", server.port)
+        game = n0.subscribe()
+        time.sleep(0.3)
+        beats = 0
+        while n0.poll() is not None:
+            beats += 1
+        self.assertGreaterEqual(beats, 2)
+        self.assertEqual(n0.game.version, game.version)
+
+    def test_background_network_keeps_a_waiting_player(self):
+        server = self.start(idle_timeout=0.2)
+        background = BackgroundNetwork(Network("localhost", server.port), keepalive=0.05)
+        self.addCleanup(background.close)
+        background.start()
+        time.sleep(0.6)
+        self.assertIsNone(background.error)
+        self.assertEqual(len(server.games), 1)
+
+    def test_a_client_that_stops_reading_does_not_hold_up_the_timers(self):
+        server = self.start(idle_timeout=1.0, socket_options=SocketOptions(sndbuf=4096))
+        n0 = Network("localhost", server.port, SocketOptions(rcvbuf=4096))
+        n0.subscribe()
+        n1 = Network("localhost", server.port)
+        # Every change is pushed to n0, which never reads, so its socket stays full.
+        deadline = time.monotonic() + 5
+        while n1.send("Rock") is not None and n1.send("reset") is not None:
+            self.assertLess(time.monotonic(), deadline, "game was not closed")
+        self.assertEqual(n1.closed_reason, "idle")
+
+if __name__ == "__main__":
+    unittest.main()
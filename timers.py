@@ -0,0 +1,146 @@
+import math
+import threading
+import time
+from logs import get_logger
+
+log = get_logger("timers")
+
+
+class Timer:
+    """A callback scheduled on a TimerWheel."""
+    __slots__ = ("deadline", "callback", "args", "active")
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.active = True
+
+    def cancel(self):
+        """Stops the timer from firing. Cancelled timers are dropped when their slot comes round."""
+        self.active = False
+
+
+class TimerWheel:
+    """
+    Runs callbacks after a delay, for thousands of timeouts that are mostly pushed back or cancelled.
+
+    Time is counted in ticks of a fixed length, and each timer sits in the slot of the tick it is
+    due on, modulo the number of slots. Scheduling and cancelling are O(1), and each tick only
+    looks at the timers in one slot. Pushing a timer back with touch just moves its deadline: the
+    timer stays where it is and is moved to its new slot when the old one comes round, so an idle
+    timeout touched on every message costs one attribute write per message. Timers further away
+    than one turn of the wheel are likewise passed over until the turn they are due in.
+
+    Timers fire up to one tick late, never early.
+
+    ...
+
+    Attributes
+    ----------
+    tick : float
+        the length of a tick, in seconds
+    slots : list
+        the timers due on each tick, modulo the number of slots
+    ticks : int
+        the number of ticks processed so far
+
+    Methods
+    -------
+    schedule(delay, callback, *args):
+        Calls callback(*args) after delay seconds.
+    touch(timer, delay):
+        Pushes a timer's deadline back to delay seconds from now.
+    advance(now=None):
+        Fires the timers that are due.
+    run():
+        Advances the wheel every tick, forever.
+    """
+
+    def __init__(self, tick=0.1, slots=512, clock=time.monotonic):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.clock = clock
+        self.start = clock()
+        self.ticks = 0
+        self.lock = threading.Lock()
+
+    def _deadline(self, delay):
+        return self.ticks + max(1, math.ceil(delay / self.tick))
+
+    def schedule(self, delay, callback, *args):
+        """
+        Calls callback(*args) after delay seconds.
+
+        Parameters
+        ----------
+        delay : float
+            Seconds to wait, rounded up to whole ticks.
+        callback : callable
+            The function to call. It runs on the thread that advances the wheel; exceptions it
+            raises are logged.
+        *args
+            Arguments for the callback.
+
+        Returns
+        -------
+        Timer
+            The scheduled timer, for touch or cancel.
+        """
+        with self.lock:
+            timer = Timer(self._deadline(delay), callback, args)
+            self.slots[timer.deadline % len(self.slots)].append(timer)
+        return timer
+
+    def touch(self, timer, delay):
+        """
+        Pushes a timer's deadline back to delay seconds from now, without taking the lock.
+
+        The delay must not be shorter than the timer's current one, as the timer is only looked at
+        again when its current slot comes round.
+        """
+        timer.deadline = self._deadline(delay)
+
+    def advance(self, now=None):
+        """
+        Fires the timers that are due.
+
+        Parameters
+        ----------
+        now : float
+            The current clock value, default is to read the clock.
+
+        Returns
+        -------
+        int
+            The number of callbacks run.
+        """
+        target = int(((self.clock() if now is None else now) - self.start) / self.tick)
+        fired = 0
+        while self.ticks < target:
+            with self.lock:
+                self.ticks += 1
+                index = self.ticks % len(self.slots)
+                slot, self.slots[index] = self.slots[index], []
+                due = []
+                for timer in slot:
+                    if not timer.active:
+                        continue
+                    if timer.deadline <= self.ticks:
+                        timer.active = False
+                        due.append(timer)
+                    else:
+                        self.slots[timer.deadline % len(self.slots)].append(timer)
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    log.exception("timer_failed", callback=getattr(timer.callback, "__name__", timer.callback))
+            fired += len(due)
+        return fired
+
+    def run(self):
+        """Advances the wheel every tick, forever. Runs on its own thread."""
+        while True:
+            time.sleep(self.tick)
+            self.advance()